@@ -0,0 +1,234 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import sys
+from array import array
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    List,
+    Iterable,
+    Iterator,
+    Optional,
+    Sequence,
+)
+
+from eventide.utils import jloads, utc_timestamp
+from eventide.message import MessageData
+from eventide.stream_name import StreamName
+from eventide.compression import decompress_data
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+__all__ = [
+    'MessageBatch',
+]
+
+
+class MessageBatch:
+    """A page of messages stored column-by-column instead of row-by-row.
+
+    Positions and global positions are kept in contiguous int64 arrays, times in a
+    float64 array, the ``type`` column holds interned strings and the ``stream_name``
+    column interned StreamName instances, so repeated values share one object. The
+    ``data`` and ``metadata`` columns are kept as the raw JSON strings returned by
+    the message store and are only decoded when accessed.
+
+    When NumPy is installed the numeric columns can be viewed as ndarrays without
+    copying, and the filters are evaluated with vectorized masks.
+    """
+
+    __slots__ = (
+        'ids',
+        'types',
+        'stream_names',
+        'positions',
+        'global_positions',
+        'times',
+        '_raw_data',
+        '_raw_metadata',
+        '_data',
+        '_metadata',
+    )
+
+    def __init__(
+        self,
+        ids: List[Any],
+        types: List[str],
+        stream_names: List[str],
+        positions: array,
+        global_positions: array,
+        times: array,
+        raw_data: List[str],
+        raw_metadata: List[str],
+    ):
+        self.ids = ids
+        self.types = types
+        self.stream_names = stream_names
+        self.positions = positions
+        self.global_positions = global_positions
+        self.times = times
+        self._raw_data = raw_data
+        self._raw_metadata = raw_metadata
+        self._data: Dict[int, Dict] = {}
+        self._metadata: Dict[int, Dict] = {}
+
+    def __repr__(self) -> str:
+        if not self:
+            return 'MessageBatch(size=0)'
+        return 'MessageBatch(size=%d, global_positions=%d..%d)' % (
+            len(self), self.global_positions[0], self.global_positions[-1]
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, idx: int) -> MessageData:
+        if idx < 0:
+            idx += len(self)
+        return MessageData(
+            self.types[idx],
+            self.stream_names[idx],
+            self.data(idx),
+            self.metadata(idx),
+            self.ids[idx],
+            self.positions[idx],
+            self.global_positions[idx],
+            self.times[idx],
+        )
+
+    def __iter__(self) -> Iterator[MessageData]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    @classmethod
+    def from_records(cls, records: Iterable[Any]) -> 'MessageBatch':
+        """Build a new batch from rows returned by the message store functions."""
+        intern = sys.intern
+        ids, types, stream_names, raw_data, raw_metadata = [], [], [], [], []
+        positions, global_positions, times = array('q'), array('q'), array('d')
+        now = datetime.utcnow()
+        for rec in records:
+            ids.append(rec['id'])
+            types.append(intern(rec['type']))
+            stream_names.append(StreamName(rec['stream_name']))
+            positions.append(rec['position'])
+            global_positions.append(rec['global_position'])
+            times.append(utc_timestamp(rec['time'] or now))
+            raw_data.append(rec['data'])
+            raw_metadata.append(rec['metadata'])
+        return cls(
+            ids,
+            types,
+            stream_names,
+            positions,
+            global_positions,
+            times,
+            raw_data,
+            raw_metadata,
+        )
+
+    # ~~~
+
+    def data(self, idx: int) -> Dict:
+        """Returns the decoded ``data`` of a single message, caching the result."""
+        if idx not in self._data:
+            data = jloads(self._raw_data[idx] or '{}')
+            codec = self.metadata(idx).get('compression')
+            self._data[idx] = decompress_data(data, codec) if codec else data
+        return self._data[idx]
+
+    def metadata(self, idx: int) -> Dict:
+        """Returns the decoded ``metadata`` of a single message, caching the result."""
+        if idx not in self._metadata:
+            self._metadata[idx] = jloads(self._raw_metadata[idx] or '{}')
+        return self._metadata[idx]
+
+    def data_column(self) -> List[Dict]:
+        return [self.data(idx) for idx in range(len(self))]
+
+    def metadata_column(self) -> List[Dict]:
+        return [self.metadata(idx) for idx in range(len(self))]
+
+    def column(self, name: str) -> Any:
+        """Returns a numeric column as an ndarray view (NumPy) or an array."""
+        col = getattr(self, name)
+        if np is not None and isinstance(col, array):
+            return np.frombuffer(col, dtype=np.int64 if col.typecode == 'q' else np.float64)
+        return col
+
+    # ~~~
+
+    def take(self, indices: Sequence[int]) -> 'MessageBatch':
+        """Returns a new batch containing only the rows at ``indices``."""
+        batch = self.__class__(
+            [self.ids[i] for i in indices],
+            [self.types[i] for i in indices],
+            [self.stream_names[i] for i in indices],
+            array('q', [self.positions[i] for i in indices]),
+            array('q', [self.global_positions[i] for i in indices]),
+            array('d', [self.times[i] for i in indices]),
+            [self._raw_data[i] for i in indices],
+            [self._raw_metadata[i] for i in indices],
+        )
+        # carry over anything that was already decoded
+        for new_idx, old_idx in enumerate(indices):
+            if old_idx in self._data:
+                batch._data[new_idx] = self._data[old_idx]
+            if old_idx in self._metadata:
+                batch._metadata[new_idx] = self._metadata[old_idx]
+        return batch
+
+    def _between(
+        self,
+        name: str,
+        start: Optional[float],
+        end: Optional[float],
+    ) -> List[int]:
+        col = self.column(name)
+        if np is not None:
+            mask = np.ones(len(col), dtype=bool)
+            if start is not None:
+                mask &= col >= start
+            if end is not None:
+                mask &= col < end
+            return np.flatnonzero(mask).tolist()
+        lo = float('-inf') if start is None else start
+        hi = float('inf') if end is None else end
+        return [i for i, v in enumerate(col) if lo <= v < hi]
+
+    def filter_types(self, *types: str) -> 'MessageBatch':
+        """Keep only the messages whose type is one of ``types``."""
+        wanted = set(types)
+        return self.take([i for i, t in enumerate(self.types) if t in wanted])
+
+    def filter_time(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> 'MessageBatch':
+        """Keep only the messages with ``start <= time < end`` (UNIX timestamps)."""
+        return self.take(self._between('times', start, end))
+
+    def filter_position(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        global_: bool = True,
+    ) -> 'MessageBatch':
+        """Keep only the messages with ``start <= position < end``.
+
+        Compares against the global position by default, or the stream position
+        when ``global_`` is False.
+        """
+        name = 'global_positions' if global_ else 'positions'
+        return self.take(self._between(name, start, end))
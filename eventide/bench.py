@@ -0,0 +1,221 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+"""Load generator for measuring message store throughput and latency.
+
+    $ python -m eventide.bench --dsn postgresql://message_store@localhost/message_store \\
+        --mode write --concurrency 32 --messages 50000 --payload-size 512 --uvloop
+"""
+
+import sys
+import math
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+)
+
+from eventide.message import Message
+from eventide.messagedb import MessageDB
+
+__all__ = [
+    'BenchMessage',
+    'percentile',
+    'run',
+    'main',
+]
+
+MODES = ('write', 'queue', 'read')
+PERCENTILES = (50.0, 95.0, 99.0, 99.9)
+
+
+@dataclass
+class BenchMessage(Message):
+    payload: str = ''
+
+
+def percentile(ordered: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(
+    name: str,
+    latencies: List[float],
+    count: int,
+    elapsed: float,
+) -> Dict[str, Any]:
+    latencies.sort()
+    report = {
+        'name': name,
+        'count': count,
+        'elapsed': elapsed,
+        'throughput': count / elapsed if elapsed else 0.0,
+    }
+    for pct in PERCENTILES:
+        report['p%g' % pct] = percentile(latencies, pct) * 1000.0
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        '%-8s %10d msgs in %8.2fs  %10.1f msg/s  ' % (
+            report['name'], report['count'], report['elapsed'], report['throughput']
+        ) + '  '.join(
+            '%s=%.2fms' % (k, v) for k, v in report.items() if k.startswith('p')
+        )
+    )
+
+
+async def _bench_write(db: MessageDB, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    payload = 'x' * args.payload_size
+    remaining = iter(range(args.messages))
+
+    async def worker():
+        for n in remaining:
+            msg = BenchMessage(payload=payload)
+            stream = '%s-%d' % (args.category, n % args.streams)
+            started = time.perf_counter()
+            await db.write_message(stream, msg)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    return summarize('write', latencies, len(latencies), time.perf_counter() - started)
+
+
+async def _bench_queue(db: MessageDB, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    payload = 'x' * args.payload_size
+    remaining = iter(range(args.messages))
+    written = 0
+    done = asyncio.Event()
+
+    async def producer():
+        for n in remaining:
+            msg = BenchMessage(payload=payload)
+            stream = '%s-%d' % (args.category, n % args.streams)
+            started = time.perf_counter()
+            await db.queue_message(stream, msg)
+            latencies.append(time.perf_counter() - started)
+
+    async def flusher():
+        nonlocal written
+        while not done.is_set() or not db._pending.empty():
+            written += await db.write_pending_messages()
+            await asyncio.sleep(args.flush_interval)
+
+    started = time.perf_counter()
+    flushing = asyncio.ensure_future(flusher())
+    await asyncio.gather(*(producer() for _ in range(args.concurrency)))
+    done.set()
+    await flushing
+    return summarize('queue', latencies, written, time.perf_counter() - started)
+
+
+async def _bench_read(db: MessageDB, args: argparse.Namespace) -> Dict[str, Any]:
+    latencies: List[float] = []
+    count = 0
+
+    async def reader(member: int):
+        nonlocal count
+        pages = db.get_category_batches(
+            args.category,
+            1,
+            args.batch_size,
+            consumer_group_member=member if args.concurrency > 1 else None,
+            consumer_group_size=args.concurrency if args.concurrency > 1 else None,
+        ).__aiter__()
+        while count < args.messages:
+            started = time.perf_counter()
+            try:
+                batch = await pages.__anext__()
+            except StopAsyncIteration:
+                return
+            if args.decode:
+                batch.data_column()
+            latencies.append(time.perf_counter() - started)
+            count += len(batch)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(reader(member) for member in range(args.concurrency)))
+    return summarize('read', latencies, count, time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, loop: Optional[asyncio.AbstractEventLoop] = None) \
+        -> Dict[str, Any]:
+    config = {
+        'dsn': args.dsn,
+        'min_size': args.pool_size,
+        'max_size': args.pool_size,
+    }
+    db = MessageDB(config, max_pending=args.max_pending, loop=loop)
+    await db.setup()
+    try:
+        bench = {
+            'write': _bench_write,
+            'queue': _bench_queue,
+            'read': _bench_read,
+        }[args.mode]
+        return await bench(db, args)
+    finally:
+        await db.shutdown()
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog='python -m eventide.bench',
+        description='Measure message store throughput and latency percentiles.',
+    )
+    parser.add_argument('--dsn', default=MessageDB.DEFAULT_DSN)
+    parser.add_argument('--mode', choices=MODES, default='write')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--messages', type=int, default=10_000)
+    parser.add_argument('--payload-size', type=int, default=256, help='bytes of data')
+    parser.add_argument('--streams', type=int, default=1000, help='distinct streams')
+    parser.add_argument('--category', default='bench%d' % random.randint(0, 1 << 16))
+    parser.add_argument('--batch-size', type=int, default=1000, help='read page size')
+    parser.add_argument('--decode', action='store_true', help='decode data when reading')
+    parser.add_argument('--pool-size', type=int, default=10)
+    parser.add_argument('--max-pending', type=int, default=1024)
+    parser.add_argument('--flush-interval', type=float, default=0.01)
+    parser.add_argument('--uvloop', action='store_true', help='run on the uvloop loop')
+    args = parser.parse_args(argv)
+    args.concurrency = max(1, args.concurrency)
+    args.streams = max(1, args.streams)
+    return args
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = parse_args(argv)
+    if args.uvloop:
+        import uvloop
+        uvloop.install()
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        report = loop.run_until_complete(run(args, loop))
+    finally:
+        loop.close()
+    print_report(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import gzip
+from uuid import UUID
+from datetime import datetime
+from logging import getLogger
+from typing import (
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Iterable,
+    Iterator,
+    Optional,
+    NamedTuple,
+)
+
+from cytoolz.itertoolz import partition_all
+from asyncpg.connection import Connection
+
+from eventide.utils import jdumps, jloads
+from eventide.message import SerializedMessage
+from eventide.messagedb import Procs, MessageDB, ExpectedVersionError
+
+__all__ = [
+    'BulkLoader',
+    'BulkMessage',
+    'read_ndjson',
+]
+
+COPY_COLUMNS = (
+    'id',
+    'stream_name',
+    'type',
+    'position',
+    'data',
+    'metadata',
+    'time',
+)
+
+SQL_NOW = "SELECT now() AT TIME ZONE 'utc';"
+
+
+class BulkMessage(NamedTuple):
+    """A SerializedMessage that keeps the (naive UTC) time it was first written,
+    e.g. when it is loaded from an export."""
+    id: str
+    stream_name: str
+    type: str
+    data: str
+    metadata: Optional[str]
+    expected_version: Optional[int]
+    time: Optional[datetime] = None
+
+
+AnyMessage = Union[SerializedMessage, BulkMessage]
+
+
+def parse_time(value: str) -> datetime:
+    """Parses a ``time`` as exported by ``row_to_json``."""
+    # PostgreSQL trims trailing zeros off the fraction, older fromisoformat()s
+    #  only accept exactly 3 or 6 digits.
+    base, _, fraction = value.partition('.')
+    if fraction:
+        base += '.' + fraction.ljust(6, '0')[:6]
+    return datetime.fromisoformat(base)
+
+
+def read_ndjson(path: Union[str, os.PathLike]) -> Iterator[BulkMessage]:
+    """Yields BulkMessage instances from a (optionally gzipped) NDJSON file, such
+    as the ones written by ``eventide.export.CategoryExporter``."""
+    path = os.fspath(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rb') as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            row = jloads(line)
+            yield BulkMessage(
+                row['id'],
+                row['stream_name'],
+                row['type'],
+                jdumps(row.get('data') or {}),
+                jdumps(row['metadata']) if row.get('metadata') else None,
+                row.get('expected_version'),
+                parse_time(row['time']) if row.get('time') else None,
+            )
+
+
+class BulkLoader:
+    """Loads large amounts of messages into the message store through binary COPY.
+
+    Messages are loaded in transactions of ``batch_size`` rows. Within each
+    transaction the loader takes the same advisory locks ``write_message`` does,
+    reads the current version of every stream in the batch with one query, and
+    assigns consecutive stream positions in the order messages were given.
+
+    A BulkMessage keeps its ``time``; messages without one get the time of the
+    transaction, like ``write_message`` would give them.
+
+    When ``check_versions`` is set, every message that carries an
+    ``expected_version`` is verified against the version its stream will have at
+    that point of the load; a mismatch aborts the transaction with
+    ``ExpectedVersionError`` and nothing from that batch is written.
+    """
+
+    def __init__(
+        self,
+        db: MessageDB,
+        batch_size: int = 50_000,
+        check_versions: bool = True,
+    ):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.check_versions = check_versions
+        self.logger = getLogger('eventide.BulkLoader')
+
+    def __repr__(self) -> str:
+        return 'BulkLoader(batch_size=%d, check_versions=%s)' % (
+            self.batch_size, self.check_versions
+        )
+
+    async def load(self, messages: Iterable[AnyMessage]) -> int:
+        """Write all ``messages``, returning the number of rows loaded."""
+        total = 0
+        for bundle in partition_all(self.batch_size, messages):
+            async with self.db.connection('bulk-load') as con:
+                async with con.transaction():
+                    total += await self._load_bundle(con, bundle)
+            self.db.forget_stream_versions(msg.stream_name for msg in bundle)
+            self.logger.debug('bulk loaded %d messages', total)
+        return total
+
+    async def load_ndjson(self, path: Union[str, os.PathLike]) -> int:
+        return await self.load(read_ndjson(path))
+
+    async def _load_bundle(
+        self,
+        con: Connection,
+        bundle: Tuple[AnyMessage, ...],
+    ) -> int:
+        streams = list({msg.stream_name: None for msg in bundle})
+        await con.execute(Procs.sql_acquire_locks, streams)
+        rows = await con.fetch(Procs.sql_stream_versions, streams)
+        versions: Dict[str, Optional[int]] = {r['stream_name']: r['version'] for r in rows}
+        now = await con.fetchval(SQL_NOW)
+
+        records: List[tuple] = []
+        for msg in bundle:
+            version = versions[msg.stream_name]
+            current = -1 if version is None else version
+            if self.check_versions and msg.expected_version is not None:
+                if msg.expected_version != current:
+                    raise ExpectedVersionError(
+                        msg.stream_name, msg.expected_version, version
+                    )
+            versions[msg.stream_name] = current + 1
+            records.append((
+                UUID(msg.id),
+                msg.stream_name,
+                msg.type,
+                current + 1,
+                msg.data,
+                msg.metadata,
+                getattr(msg, 'time', None) or now,
+            ))
+
+        await con.copy_records_to_table('messages', records=records, columns=COPY_COLUMNS)
+        if self.db.router is not None:
+            self.db.router.observe_write(await con.fetchval(Procs.sql_last_written))
+        return len(records)
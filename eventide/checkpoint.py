@@ -0,0 +1,57 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+from typing import Any, Dict, Union
+
+from eventide.utils import jdumps, jloads
+
+__all__ = [
+    'FileCheckpoint',
+]
+
+
+class FileCheckpoint:
+    """Persists a position, and any extra values needed to resume work, to a small
+    JSON file on disk.
+
+    Writes go to a temporary file first which is then renamed over the original,
+    so a crash never leaves a half-written checkpoint behind.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], position: int = 1):
+        self.path = os.fspath(path)
+        self.default = position
+
+    def __repr__(self) -> str:
+        return 'FileCheckpoint(path=%s, position=%d)' % (self.path, self.position)
+
+    @property
+    def position(self) -> int:
+        return self.load().get('position', self.default)
+
+    def load(self) -> Dict[str, Any]:
+        try:
+            with open(self.path, 'r') as fh:
+                return jloads(fh.read())
+        except FileNotFoundError:
+            return {}
+
+    def save(self, position: int, **extra: Any) -> None:
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as fh:
+            fh.write(jdumps(dict(extra, position=position)))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+    def clear(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,103 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import zlib
+from base64 import b64decode, b64encode
+from typing import (
+    Dict,
+    Tuple,
+    Callable,
+    Optional,
+)
+
+from eventide.utils import jdumps, jloads
+from eventide.errors import EventideError
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:
+    import lz4.frame as lz4
+except ImportError:  # pragma: no cover
+    lz4 = None
+
+__all__ = [
+    'CODECS',
+    'ENVELOPE_KEY',
+    'CompressionError',
+    'compress_data',
+    'decompress_data',
+    'default_compression',
+    'is_compressed',
+    'set_default_compression',
+]
+
+ENVELOPE_KEY = '__compressed__'
+
+Codec = Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]
+
+CODECS: Dict[str, Codec] = {
+    'zlib': (zlib.compress, zlib.decompress),
+}
+
+if zstandard is not None:
+    CODECS['zstd'] = (
+        lambda b: zstandard.ZstdCompressor().compress(b),
+        lambda b: zstandard.ZstdDecompressor().decompress(b),
+    )
+
+if lz4 is not None:
+    CODECS['lz4'] = (lz4.compress, lz4.decompress)
+
+# (codec, threshold) applied to Message classes that do not choose their own
+_default: Tuple[Optional[str], int] = (None, 0)
+
+
+class CompressionError(EventideError):
+    """Raised for unknown or unavailable compression codecs."""
+
+
+def _codec(name: str) -> Codec:
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise CompressionError('compression codec `%s` is not available' % name) from None
+
+
+def set_default_compression(codec: Optional[str], threshold: int = 0) -> None:
+    """Compress the data of every Message whose serialized size is at least
+    ``threshold`` bytes, unless its class sets ``__compression__`` itself.
+    Passing None as the codec turns the default off again."""
+    global _default
+    if codec is not None:
+        _codec(codec)
+    _default = (codec, max(0, threshold))
+
+
+def default_compression() -> Tuple[Optional[str], int]:
+    return _default
+
+
+def compress_data(data: str, codec: str) -> str:
+    """Wrap the serialized ``data`` of a message in a compressed JSON envelope."""
+    compress, _ = _codec(codec)
+    return jdumps({ENVELOPE_KEY: b64encode(compress(data.encode('utf-8'))).decode()})
+
+
+def is_compressed(data: Dict) -> bool:
+    return len(data) == 1 and ENVELOPE_KEY in data
+
+
+def decompress_data(data: Dict, codec: str) -> Dict:
+    """Unwrap an envelope built by ``compress_data`` back into the original data."""
+    if not is_compressed(data):
+        return data
+    _, decompress = _codec(codec)
+    return jloads(decompress(b64decode(data[ENVELOPE_KEY])))
@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import gzip
+from logging import getLogger
+from typing import (
+    Any,
+    List,
+    Union,
+    Optional,
+)
+
+from eventide.errors import EventideError
+from eventide.messagedb import Procs, MessageDB
+from eventide.checkpoint import FileCheckpoint
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pq = None
+
+__all__ = [
+    'ExportError',
+    'CategoryExporter',
+]
+
+# COPY csv output is quoted and escaped using these characters, neither of which
+#  can appear un-escaped inside a JSON document -- so every row is written
+# verbatim, one JSON object per line.
+COPY_QUOTE = '\x01'
+COPY_DELIMITER = '\x02'
+
+PARQUET_COLUMNS = (
+    'id',
+    'stream_name',
+    'type',
+    'position',
+    'global_position',
+    'data',
+    'metadata',
+    'time',
+)
+
+
+class ExportError(EventideError):
+    """Raised when an export cannot be started or resumed."""
+
+
+class CategoryExporter:
+    """Streams a category (or the whole message store) to NDJSON or Parquet files.
+
+    Rows are exported in windows of ``chunk_size`` global positions. After every
+    window the checkpoint records the next global position to export, so a failed
+    export picks up from the last completed window when it is started again.
+
+    NDJSON rows are produced by the database with ``row_to_json`` and streamed
+    through ``COPY ... TO STDOUT`` straight into the output file, without being
+    decoded. Each window is written as its own gzip member, which lets a resumed
+    export truncate whatever a crashed window left behind and append to the file.
+
+    Parquet output requires ``pyarrow``; every non-empty window is written as its
+    own part file inside the ``path`` directory.
+    """
+
+    FORMATS = ('ndjson', 'parquet')
+
+    def __init__(
+        self,
+        db: MessageDB,
+        path: Union[str, os.PathLike],
+        category: Optional[str] = None,
+        fmt: str = 'ndjson',
+        compress: bool = True,
+        chunk_size: int = 100_000,
+        checkpoint: Optional[FileCheckpoint] = None,
+    ):
+        if fmt not in self.FORMATS:
+            raise ExportError('unknown export format `%s`' % fmt)
+        if fmt == 'parquet' and pq is None:
+            raise ExportError('parquet exports require `pyarrow` to be installed')
+
+        self.db = db
+        self.path = os.fspath(path)
+        self.category = category
+        self.fmt = fmt
+        self.compress = compress
+        self.chunk_size = max(1, chunk_size)
+        self.checkpoint = checkpoint or FileCheckpoint(self.path + '.checkpoint')
+        self.logger = getLogger('eventide.CategoryExporter')
+
+    def __repr__(self) -> str:
+        return 'CategoryExporter(category=%s, fmt=%s, path=%s)' % (
+            self.category, self.fmt, self.path
+        )
+
+    def _query(self, select: str) -> str:
+        if self.category is None:
+            return select % ''
+        return select % 'AND category(stream_name) = $3'
+
+    def _args(self, start: int, end: int) -> List[Any]:
+        if self.category is None:
+            return [start, end]
+        return [start, end, self.category]
+
+    async def export(self, start: int = 1, end: Optional[int] = None) -> int:
+        """Export every message with ``start <= global_position <= end``.
+
+        When ``end`` is omitted, the head of the message store at the time the
+        export starts is used. Returns the number of windows that were written.
+        """
+        state = self.checkpoint.load()
+        position = max(start, state.get('position', start))
+        if end is None:
+            async with self.db.connection('export-head') as con:
+                end = (await con.fetchrow(Procs.sql_head_position))[0] or 0
+
+        if self.fmt == 'ndjson':
+            windows = await self._export_ndjson(position, end, state.get('offset'))
+        else:
+            windows = await self._export_parquet(position, end)
+
+        self.logger.info('exported %d windows up to global position %d', windows, end)
+        return windows
+
+    async def _export_ndjson(self, position: int, end: int, offset: Optional[int]) -> int:
+        query = self._query(Procs.sql_export_ndjson)
+        windows = 0
+
+        with open(self.path, 'ab') as raw:
+            # drop anything a previously interrupted window wrote past its checkpoint
+            if offset is not None and raw.tell() > offset:
+                raw.truncate(offset)
+                raw.seek(offset)
+
+            while position <= end:
+                stop = min(position + self.chunk_size, end + 1)
+                out = gzip.GzipFile(fileobj=raw, mode='wb') if self.compress else raw
+
+                async def write(chunk: bytes, out=out) -> None:
+                    await self.db.loop.run_in_executor(None, out.write, chunk)
+
+                async with self.db.connection('export-ndjson') as con:
+                    await con.copy_from_query(
+                        query,
+                        *self._args(position, stop),
+                        output=write,
+                        format='csv',
+                        quote=COPY_QUOTE,
+                        delimiter=COPY_DELIMITER,
+                    )
+                if out is not raw:
+                    out.close()
+                raw.flush()
+                os.fsync(raw.fileno())
+                self.checkpoint.save(stop, offset=raw.tell())
+                position = stop
+                windows += 1
+        return windows
+
+    async def _export_parquet(self, position: int, end: int) -> int:
+        os.makedirs(self.path, exist_ok=True)
+        query = self._query(Procs.sql_export_rows)
+        compression = 'zstd' if self.compress else 'none'
+        windows = 0
+
+        while position <= end:
+            stop = min(position + self.chunk_size, end + 1)
+            async with self.db.connection('export-parquet') as con:
+                rows = await con.fetch(query, *self._args(position, stop))
+            if rows:
+                table = pa.table({
+                    name: [row[name] for row in rows]
+                    for name in PARQUET_COLUMNS
+                })
+                part = os.path.join(self.path, 'part-%020d.parquet' % position)
+                await self.db.loop.run_in_executor(
+                    None,
+                    lambda: pq.write_table(table, part, compression=compression),
+                )
+            self.checkpoint.save(stop)
+            position = stop
+            windows += 1
+        return windows
@@ -0,0 +1,118 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from datetime import datetime
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Union,
+    Optional,
+    Iterable,
+)
+
+from eventide.utils import jdumps, utc_datetime
+from eventide.errors import EventideError
+
+__all__ = [
+    'FilterError',
+    'Where',
+]
+
+Condition = Tuple[str, int]
+Timestamp = Union[float, datetime]
+
+# yapf: disable
+COND_TYPE_IN        = ('type = ANY($%d::varchar[])', 1)
+COND_TIME_FROM      = ('time >= $%d', 1)
+COND_TIME_UNTIL     = ('time < $%d', 1)
+COND_METADATA       = ('metadata @> $%d::jsonb', 1)
+# also what MessageDB's ``correlation`` arguments use; this library writes the
+#  metadata snake_case, other message-db clients camelCase
+COND_CORRELATION    = (
+    "category(coalesce(metadata->>'correlation_stream_name', "
+    "metadata->>'correlationStreamName')) = $%d", 1
+)
+# yapf: enable
+
+
+class FilterError(EventideError):
+    """Raised when a filter is built with values it cannot express."""
+
+
+class Where:
+    """A server-side filter for the stream and category readers of MessageDB.
+
+    Filters are built by chaining, each call returning a new instance, and every
+    condition is AND-ed with the others:
+
+        where = Where().types('Deposited', 'Withdrawn').since(t0).metadata('source', 'api')
+        async for msg in db.get_category_messages('account', where=where):
+            ...
+
+    Values are always sent as query parameters, never spliced into the SQL. The
+    SQL only depends on which conditions were used, in which order (the filter's
+    shape), and is compiled once per shape and reused for every other value.
+    """
+
+    __slots__ = ('conditions', 'args')
+
+    def __init__(self, conditions: Tuple[Condition, ...] = (), args: Tuple[Any, ...] = ()):
+        self.conditions = conditions
+        self.args = args
+
+    def __repr__(self) -> str:
+        shown = (sql.replace('$%d', '?') for sql, _ in self.conditions)
+        return 'Where(%s)' % ' AND '.join(shown)
+
+    def __bool__(self) -> bool:
+        return bool(self.conditions)
+
+    def _and(self, condition: Condition, *args: Any) -> 'Where':
+        return Where(self.conditions + (condition,), self.args + args)
+
+    def types(self, *types: Union[str, Iterable[str]]) -> 'Where':
+        """Only messages whose type is one of ``types``."""
+        names: List[str] = []
+        for value in types:
+            if isinstance(value, str):
+                names.append(value)
+            else:
+                names.extend(value)
+        if not names:
+            raise FilterError('at least one message type is required')
+        return self._and(COND_TYPE_IN, names)
+
+    def since(self, start: Timestamp) -> 'Where':
+        """Only messages written at or after ``start``."""
+        return self._and(COND_TIME_FROM, utc_datetime(start))
+
+    def until(self, end: Timestamp) -> 'Where':
+        """Only messages written before ``end``."""
+        return self._and(COND_TIME_UNTIL, utc_datetime(end))
+
+    def between(self, start: Optional[Timestamp], end: Optional[Timestamp]) -> 'Where':
+        where = self
+        if start is not None:
+            where = where.since(start)
+        if end is not None:
+            where = where.until(end)
+        return where
+
+    def metadata(self, key: str, value: Any) -> 'Where':
+        """Only messages whose metadata ``key`` equals ``value`` (as JSON, so the
+        type has to match too)."""
+        return self._and(COND_METADATA, jdumps({key: value}))
+
+    def correlation(self, category: str) -> 'Where':
+        """Only messages correlated with a stream of ``category``."""
+        return self._and(COND_CORRELATION, category)
+
+    def compile(self) -> Tuple[Tuple[Condition, ...], List[Any]]:
+        """Returns the filter's shape and its query parameters, in order."""
+        return self.conditions, list(self.args)
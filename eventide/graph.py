@@ -0,0 +1,203 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+from collections import deque
+from logging import getLogger
+from typing import (
+    Any,
+    Dict,
+    List,
+    Union,
+    Iterable,
+    Optional,
+    NamedTuple,
+)
+
+import orjson
+
+from eventide.message import MessageData, MessageHeader
+
+__all__ = [
+    'CausationIndex',
+    'Node',
+]
+
+AnyMessage = Union[MessageData, MessageHeader]
+
+
+class Node(NamedTuple):
+    """One indexed message; ``identifier`` is its ``stream_name/position``."""
+    identifier: str
+    type: str
+    global_position: int
+    causation: Optional[str]
+    correlation: Optional[str]
+
+
+def _meta(metadata: Dict, key: str, camel: str) -> Any:
+    # this library writes snake_case metadata, other message-db clients camelCase
+    value = metadata.get(key)
+    return metadata.get(camel) if value is None else value
+
+
+class CausationIndex:
+    """An incrementally maintained graph of which message caused which, and which
+    messages share a correlation stream.
+
+    Feed it the messages (or headers) a consumer reads with ``observe``; every
+    message is linked to the message named by its causation metadata, and filed
+    under its correlation stream name. Answering "how did this message come to
+    be" (``chain``), "what did it lead to" (``descendants``) or "everything in
+    this workflow" (``correlated``) is then a walk over dictionaries instead of
+    a scan of the message store.
+
+    With a ``path`` every observed message is appended to a newline delimited
+    JSON log, which is replayed when the index is opened again; ``position`` is
+    the global position after the newest message indexed, to resume feeding
+    from. The log is buffered, call ``flush`` (or ``close``) to persist it.
+    """
+
+    def __init__(self, path: Optional[Union[str, os.PathLike]] = None):
+        self.path = os.fspath(path) if path is not None else None
+        self.position = 1
+        self.logger = getLogger('eventide.CausationIndex')
+
+        self._nodes: Dict[str, Node] = {}
+        self._children: Dict[str, List[str]] = {}
+        self._correlations: Dict[str, List[str]] = {}
+        self._log = None
+        if self.path:
+            self._replay()
+            self._log = open(self.path, 'ab')
+
+    def __repr__(self) -> str:
+        return 'CausationIndex(nodes=%d, correlations=%d)' % (
+            len(self._nodes), len(self._correlations)
+        )
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, identifier: str) -> bool:
+        return identifier in self._nodes
+
+    def _replay(self) -> None:
+        try:
+            fh = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return
+        with fh:
+            offset = 0
+            for line in fh:
+                try:
+                    node = Node(*orjson.loads(line))
+                except (orjson.JSONDecodeError, TypeError):
+                    if line.endswith(b'\n'):
+                        self.logger.warning('ignoring a corrupt line in %s', self.path)
+                        offset += len(line)
+                        continue
+                    # a torn last line from a crash, everything before it is intact
+                    self.logger.warning(
+                        'truncating a torn line at the end of %s', self.path
+                    )
+                    fh.truncate(offset)
+                    break
+                offset += len(line)
+                self._add(node)
+
+    def _add(self, node: Node) -> bool:
+        if node.identifier in self._nodes:
+            return False
+        self._nodes[node.identifier] = node
+        if node.causation:
+            self._children.setdefault(node.causation, []).append(node.identifier)
+        if node.correlation:
+            self._correlations.setdefault(node.correlation, []).append(node.identifier)
+        self.position = max(self.position, node.global_position + 1)
+        return True
+
+    # ~~~
+
+    def observe(self, message: AnyMessage) -> None:
+        """Add a message to the index; messages already indexed are ignored."""
+        meta = message.metadata or {}
+        causation = None
+        stream = _meta(meta, 'causation_message_stream_name', 'causationMessageStreamName')
+        position = _meta(meta, 'causation_message_position', 'causationMessagePosition')
+        if stream and position is not None:
+            causation = '%s/%d' % (stream, position)
+        node = Node(
+            '%s/%d' % (message.stream_name, message.position),
+            message.type,
+            message.global_position,
+            causation,
+            _meta(meta, 'correlation_stream_name', 'correlationStreamName'),
+        )
+        if self._add(node) and self._log is not None:
+            self._log.write(orjson.dumps(list(node)) + b'\n')
+
+    def observe_all(self, messages: Iterable[AnyMessage]) -> None:
+        for message in messages:
+            self.observe(message)
+
+    def node(self, identifier: str) -> Optional[Node]:
+        return self._nodes.get(identifier)
+
+    def children(self, identifier: str) -> List[Node]:
+        """The messages directly caused by ``identifier``."""
+        return [self._nodes[child] for child in self._children.get(identifier, ())]
+
+    def chain(self, identifier: str) -> List[Node]:
+        """The causal chain leading to ``identifier``, from the first message that
+        is indexed down to the message itself."""
+        chain: List[Node] = []
+        seen = set()
+        node = self._nodes.get(identifier)
+        while node is not None and node.identifier not in seen:
+            seen.add(node.identifier)
+            chain.append(node)
+            node = self._nodes.get(node.causation) if node.causation else None
+        chain.reverse()
+        return chain
+
+    def descendants(self, identifier: str) -> List[Node]:
+        """Every message caused, directly or not, by ``identifier``, breadth first."""
+        found: List[Node] = []
+        seen = {identifier}
+        queue = deque(self._children.get(identifier, ()))
+        while queue:
+            child = queue.popleft()
+            if child in seen:
+                continue
+            seen.add(child)
+            found.append(self._nodes[child])
+            queue.extend(self._children.get(child, ()))
+        return found
+
+    def workflow(self, identifier: str) -> List[Node]:
+        """The whole causal tree ``identifier`` is part of, starting at its root."""
+        chain = self.chain(identifier)
+        if not chain:
+            return []
+        return [chain[0]] + self.descendants(chain[0].identifier)
+
+    def correlated(self, correlation_stream_name: str) -> List[Node]:
+        """The messages correlated with a stream, in the order they were indexed."""
+        return [self._nodes[i] for i in self._correlations.get(correlation_stream_name, ())]
+
+    def flush(self) -> None:
+        if self._log is not None:
+            self._log.flush()
+            os.fsync(self._log.fileno())
+
+    def close(self) -> None:
+        if self._log is not None:
+            self.flush()
+            self._log.close()
+            self._log = None
@@ -0,0 +1,242 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from asyncio import Queue
+from logging import getLogger
+from typing import (
+    Dict,
+    List,
+    Optional,
+    AsyncIterator,
+)
+
+from eventide.batch import MessageBatch
+from eventide.message import MessageData
+from eventide.messagedb import MessageDB
+
+__all__ = [
+    'Subscription',
+    'SubscriptionHub',
+]
+
+
+class Subscription:
+    """One subscriber's view of a category shared through a SubscriptionHub.
+
+    Iterating a subscription yields MessageBatch pages starting at ``position``.
+    While attached, pages come from the hub through a bounded queue. When the
+    queue is full the hub detaches the subscriber instead of waiting for it; a
+    detached subscriber drains what it has queued and then reads pages on its own
+    until it catches up with the hub, at which point it is attached again.
+    """
+
+    def __init__(self, hub: 'SubscriptionHub', category: str, position: int, maxsize: int):
+        self.hub = hub
+        self.category = category
+        self.position = max(1, position)
+        self.attached = False
+        self.closed = False
+        self._queue: Queue = Queue(maxsize=max(1, maxsize))
+
+    def __repr__(self) -> str:
+        return 'Subscription(category=%s, position=%d, attached=%s)' % (
+            self.category, self.position, self.attached
+        )
+
+    def __aiter__(self) -> 'Subscription':
+        return self
+
+    async def __anext__(self) -> MessageBatch:
+        while not self.closed:
+            if self.attached or not self._queue.empty():
+                batch = await self._queue.get()
+            else:
+                batch = await self.hub._read_alone(self)
+            if batch is None:
+                continue
+            if batch.global_positions[-1] < self.position:
+                continue
+            if batch.global_positions[0] < self.position:
+                batch = batch.filter_position(self.position)
+            self.position = batch.global_positions[-1] + 1
+            return batch
+        raise StopAsyncIteration
+
+    def _offer(self, batch: MessageBatch) -> bool:
+        try:
+            self._queue.put_nowait(batch)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def messages(self) -> AsyncIterator[MessageData]:
+        async for batch in self:
+            for msg in batch:
+                yield msg
+
+    def close(self) -> None:
+        self.closed = True
+        self.hub.unsubscribe(self)
+        # wake up a consumer that is waiting on the queue
+        try:
+            self._queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+class SubscriptionHub:
+    """Reads each category once and fans the pages out to in-process subscribers.
+
+    A single reader task per category pages through it with
+    ``get_category_batches`` and hands every page, as the same MessageBatch
+    object, to every attached subscriber; since a batch decodes its columns lazily
+    and caches the result, each message is fetched and decoded once no matter
+    how many subscribers see it.
+
+    Subscribers keep their own position. Ones that start behind the hub, or fall
+    behind and fill their ``queue_size`` pages of buffer, read on their own
+    through ``MessageDB`` until they reach the hub again, so one slow consumer
+    never holds back the others.
+
+    When reading a category fails, the error is logged and the reader retries
+    from the same position after ``retry_interval`` seconds, doubling the wait
+    after every consecutive failure up to ``max_retry_interval``. Subscribers
+    keep waiting meanwhile; a detached subscriber's own reads raise to it.
+    """
+
+    def __init__(
+        self,
+        db: MessageDB,
+        batch_size: int = 1000,
+        queue_size: int = 8,
+        poll_interval: float = 0.5,
+        retry_interval: float = 1.0,
+        max_retry_interval: float = 30.0,
+    ):
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.queue_size = max(1, queue_size)
+        self.poll_interval = max(0.0, poll_interval)
+        self.retry_interval = max(0.0, retry_interval)
+        self.max_retry_interval = max(self.retry_interval, max_retry_interval)
+        self.logger = getLogger('eventide.SubscriptionHub')
+
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._positions: Dict[str, int] = {}
+        self._readers: Dict[str, asyncio.Task] = {}
+        self._wakeup: Dict[str, asyncio.Event] = {}
+
+    def __repr__(self) -> str:
+        return 'SubscriptionHub(categories=%d, subscribers=%d)' % (
+            len(self._subscribers), sum(map(len, self._subscribers.values()))
+        )
+
+    def subscribe(self, category: str, position: int = 1) -> Subscription:
+        sub = Subscription(self, category, position, self.queue_size)
+        self._subscribers.setdefault(category, []).append(sub)
+        if category not in self._readers:
+            self._positions[category] = sub.position
+            self._wakeup[category] = asyncio.Event()
+            self._readers[category] = asyncio.ensure_future(self._read(category))
+        self._attach(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self._subscribers.get(sub.category, [])
+        if sub in subs:
+            subs.remove(sub)
+        if not subs and sub.category in self._readers:
+            self._readers.pop(sub.category).cancel()
+            self._subscribers.pop(sub.category, None)
+            self._positions.pop(sub.category, None)
+            self._wakeup.pop(sub.category, None)
+
+    async def close(self) -> None:
+        tasks = list(self._readers.values())
+        for category in list(self._subscribers):
+            for sub in list(self._subscribers.get(category, [])):
+                sub.close()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    # ~~~
+
+    def _attach(self, sub: Subscription, force: bool = False) -> None:
+        """Attach a subscriber if it is not behind the hub's reader, and wake
+        the reader up."""
+        if force or sub.position >= self._positions.get(sub.category, sub.position):
+            sub.attached = True
+            wakeup = self._wakeup.get(sub.category)
+            if wakeup is not None:
+                wakeup.set()
+
+    async def _read_alone(self, sub: Subscription) -> Optional[MessageBatch]:
+        """Read one page for a detached subscriber, or attach it when caught up."""
+        self._attach(sub)
+        if sub.attached:
+            return None
+        pages = self.db.get_category_batches(sub.category, sub.position, self.batch_size)
+        try:
+            async for batch in pages:
+                return batch
+        finally:
+            await pages.aclose()
+        # nothing new for this subscriber, which can only mean it caught up
+        self._attach(sub, force=True)
+        return None
+
+    async def _read(self, category: str) -> None:
+        wakeup = self._wakeup[category]
+        failures = 0
+        while True:
+            if not any(sub.attached for sub in self._subscribers.get(category, [])):
+                # nobody to deliver to, wait until a subscriber (re)attaches
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+
+            try:
+                read = await self._read_pages(category)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(
+                    self.max_retry_interval, self.retry_interval * 2 ** (failures - 1)
+                )
+                self.logger.warning(
+                    'reading %s failed, retrying in %.1fs: %s', category, delay, e
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            failures = 0
+            if not read:
+                await asyncio.sleep(self.poll_interval)
+
+    async def _read_pages(self, category: str) -> bool:
+        """Deliver pages from the hub's position on, until the category is
+        exhausted or no subscriber is attached. Returns True if anything was read."""
+        read = False
+        pages = self.db.get_category_batches(
+            category, self._positions[category], self.batch_size
+        )
+        async for batch in pages:
+            self._positions[category] = batch.global_positions[-1] + 1
+            read = True
+            for sub in self._subscribers.get(category, []):
+                if sub.attached and not sub._offer(batch):
+                    self.logger.debug('detaching slow subscriber %s', sub)
+                    sub.attached = False
+            if not any(sub.attached for sub in self._subscribers.get(category, [])):
+                break
+        return read
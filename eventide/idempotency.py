@@ -0,0 +1,264 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import dbm
+import math
+import struct
+import asyncio
+from hashlib import md5
+from logging import getLogger
+from typing import (
+    Any,
+    Union,
+    Callable,
+    Optional,
+    Awaitable,
+)
+
+from eventide.errors import EventideError
+from eventide.message import Message, MessageData
+
+__all__ = [
+    'BloomFilter',
+    'IdempotencyError',
+    'IdempotencyGuard',
+]
+
+# header: bits, hashes, count
+BLOOM_HEADER = struct.Struct('<QIQ')
+
+AnyMessage = Union[Message, MessageData]
+KeyFn = Callable[[AnyMessage], Optional[str]]
+
+
+class IdempotencyError(EventideError):
+    """Raised when a message has no idempotency key or a filter file is corrupt."""
+
+
+class BloomFilter:
+    """A fixed size Bloom filter sized for ``capacity`` keys at ``error_rate``.
+
+    ``might_contain`` never returns a false negative; false positives happen at
+    roughly ``error_rate`` as long as no more than ``capacity`` keys were added.
+    """
+
+    __slots__ = ('bits', 'hashes', 'count', '_array')
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.001):
+        capacity = max(1, capacity)
+        error_rate = min(0.5, max(1e-9, error_rate))
+        self.bits = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def __repr__(self) -> str:
+        return 'BloomFilter(bits=%d, hashes=%d, count=%d)' % (
+            self.bits, self.hashes, self.count
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _indexes(self, key: str):
+        digest = md5(key.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key: str) -> None:
+        array = self._array
+        for idx in self._indexes(key):
+            array[idx >> 3] |= 1 << (idx & 7)
+        self.count += 1
+
+    def might_contain(self, key: str) -> bool:
+        array = self._array
+        return all(array[idx >> 3] & (1 << (idx & 7)) for idx in self._indexes(key))
+
+    __contains__ = might_contain
+
+    def to_bytes(self) -> bytes:
+        return BLOOM_HEADER.pack(self.bits, self.hashes, self.count) + bytes(self._array)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> 'BloomFilter':
+        if len(raw) < BLOOM_HEADER.size:
+            raise IdempotencyError('truncated bloom filter')
+        bits, hashes, count = BLOOM_HEADER.unpack_from(raw)
+        array = raw[BLOOM_HEADER.size:]
+        if len(array) != (bits + 7) // 8:
+            raise IdempotencyError('bloom filter size does not match its header')
+        bloom = cls.__new__(cls)
+        bloom.bits, bloom.hashes, bloom.count = bits, hashes, count
+        bloom._array = bytearray(array)
+        return bloom
+
+
+def message_id(message: AnyMessage) -> Optional[str]:
+    return str(message.id)
+
+
+def causation_identifier(message: AnyMessage) -> Optional[str]:
+    """The ``stream_name/position`` of the message that caused this one."""
+    meta = message.metadata
+    if isinstance(meta, dict):
+        stream = meta.get('causation_message_stream_name')
+        position = meta.get('causation_message_position')
+    else:
+        stream = meta.causation_message_stream_name
+        position = meta.causation_message_position
+    if not stream or position is None:
+        return None
+    return '%s/%d' % (stream, position)
+
+
+class IdempotencyGuard:
+    """Remembers which messages were handled, so a redelivered one is skipped.
+
+    Messages are keyed by their id (``key='id'``), by the message that caused
+    them (``key='causation'``, useful when a handler's effect is a new message),
+    or by any function of the message. Lookups go to a Bloom filter first, which
+    answers "never seen" without touching anything else; only a possible hit is
+    confirmed against the exact store.
+
+    With a ``path`` the exact store is a ``dbm`` database on disk, so memory use
+    is bounded by the Bloom filter, and the filter itself is saved next to it
+    (``<path>.bloom``) on ``save``/``close``. A filter that is missing or stale
+    after a crash is rebuilt from the exact store when the guard is opened.
+    Without a path both live in memory only.
+    """
+
+    KEYS = {
+        'id': message_id,
+        'causation': causation_identifier,
+    }
+
+    def __init__(
+        self,
+        path: Optional[Union[str, os.PathLike]] = None,
+        key: Union[str, KeyFn] = 'id',
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+    ):
+        if isinstance(key, str):
+            if key not in self.KEYS:
+                raise IdempotencyError('unknown idempotency key `%s`' % key)
+            key = self.KEYS[key]
+        self.key = key
+        self.path = os.fspath(path) if path is not None else None
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        self.logger = getLogger('eventide.IdempotencyGuard')
+        self.hits = 0
+        self.false_positives = 0
+
+        self._store: Any = dbm.open(self.path, 'c') if self.path else {}
+        self._bloom = self._load_bloom()
+
+    def __repr__(self) -> str:
+        return 'IdempotencyGuard(path=%s, processed=%d)' % (self.path, len(self._bloom))
+
+    def __len__(self) -> int:
+        return len(self._bloom)
+
+    @property
+    def bloom_path(self) -> Optional[str]:
+        return self.path + '.bloom' if self.path else None
+
+    def _load_bloom(self) -> BloomFilter:
+        stored = len(self._store)
+        if self.bloom_path and os.path.exists(self.bloom_path):
+            with open(self.bloom_path, 'rb') as fh:
+                try:
+                    bloom = BloomFilter.from_bytes(fh.read())
+                except IdempotencyError as e:
+                    self.logger.warning('rebuilding %s: %s', self.bloom_path, e)
+                else:
+                    if bloom.count == stored:
+                        return bloom
+                    self.logger.info('rebuilding stale %s', self.bloom_path)
+
+        bloom = BloomFilter(max(self.capacity, stored), self.error_rate)
+        for key in self._store.keys():
+            bloom.add(key.decode('utf-8') if isinstance(key, bytes) else key)
+        return bloom
+
+    def _key(self, message: AnyMessage) -> str:
+        key = self.key(message)
+        if key is None:
+            raise IdempotencyError('message %s has no idempotency key' % message.id)
+        return key
+
+    # ~~~
+
+    def seen(self, message: AnyMessage) -> bool:
+        """True when this message (by its key) was marked as processed."""
+        key = self._key(message)
+        if not self._bloom.might_contain(key):
+            return False
+        if key in self._store:
+            self.hits += 1
+            return True
+        self.false_positives += 1
+        return False
+
+    def mark(self, message: AnyMessage) -> None:
+        """Record that this message was processed."""
+        key = self._key(message)
+        if key in self._bloom and key in self._store:
+            return
+        self._store[key] = b''
+        self._bloom.add(key)
+        if len(self._bloom) == self.capacity + 1:
+            self.logger.warning(
+                'more than %d keys processed, false positives will become more frequent',
+                self.capacity,
+            )
+
+    async def handle(
+        self,
+        message: AnyMessage,
+        handler: Callable[[AnyMessage], Any],
+    ) -> bool:
+        """Run ``handler`` on ``message`` unless it was processed before, and then
+        mark it. Returns whether the handler ran."""
+        if self.seen(message):
+            self.logger.debug('skipping already processed message %s', message.id)
+            return False
+        result = handler(message)
+        if asyncio.iscoroutine(result):
+            await result
+        self.mark(message)
+        return True
+
+    def wrap(self, handler: Callable[[AnyMessage], Any]) \
+            -> Callable[[AnyMessage], Awaitable[bool]]:
+        """Decorate a handler so it only ever sees each message once."""
+        async def guarded(message: AnyMessage) -> bool:
+            return await self.handle(message, handler)
+        return guarded
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        if hasattr(self._store, 'sync'):
+            self._store.sync()
+        tmp = self.bloom_path + '.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(self._bloom.to_bytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.bloom_path)
+
+    def close(self) -> None:
+        self.save()
+        if self.path:
+            self._store.close()
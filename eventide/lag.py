@@ -0,0 +1,217 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import time
+import asyncio
+from logging import getLogger
+from typing import (
+    Dict,
+    Optional,
+    NamedTuple,
+)
+
+from eventide.utils import utc_timestamp
+from eventide.message import MessageData
+from eventide.messagedb import Procs, MessageDB
+
+__all__ = [
+    'Head',
+    'ConsumerLag',
+    'LagMonitor',
+]
+
+
+class Head(NamedTuple):
+    """The newest message of a category at the time it was sampled."""
+    global_position: int
+    time: float
+    sampled_at: float
+
+
+class ConsumerLag(NamedTuple):
+    consumer: str
+    category: str
+    position: int
+    head: int
+    positions_behind: int
+    messages_behind: int
+    seconds: float
+    throughput: float
+
+    def to_dict(self) -> Dict:
+        return self._asdict()
+
+
+class _Progress:
+    __slots__ = (
+        'category', 'position', 'time', 'window_start', 'window_count', 'throughput'
+    )
+
+    def __init__(self, category: str):
+        self.category = category
+        self.position = 1
+        self.time: Optional[float] = None
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.throughput = 0.0
+
+
+class LagMonitor:
+    """Tracks how far consumers are behind the head of the categories they read.
+
+    The head of a category (its newest global position and time) is read with
+    one index-only lookup and cached for ``head_ttl`` seconds; concurrent callers
+    share a single in-flight lookup, so the database sees at most one head query
+    per category per ``head_ttl`` no matter how many consumers are tracked.
+
+    Consumers report their progress with ``observe`` (per handled message) or
+    ``track`` (per checkpoint). Lag is reported in messages, in seconds, as the
+    time between the last handled message and the head message, and as
+    ``positions_behind``, the distance in global positions to the head. Global
+    positions are shared by all categories, so ``positions_behind`` is only an
+    upper bound on ``messages_behind``, which is counted on the category index
+    between the consumer's position and the head. Throughput is an
+    exponentially weighted rate of handled messages per second.
+    """
+
+    def __init__(
+        self,
+        db: MessageDB,
+        head_ttl: float = 1.0,
+        throughput_window: float = 1.0,
+        smoothing: float = 0.3,
+    ):
+        self.db = db
+        self.head_ttl = max(0.0, head_ttl)
+        self.throughput_window = max(0.001, throughput_window)
+        self.smoothing = min(1.0, max(0.0, smoothing))
+        self.logger = getLogger('eventide.LagMonitor')
+
+        self._heads: Dict[str, Head] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._consumers: Dict[str, _Progress] = {}
+
+    def __repr__(self) -> str:
+        return 'LagMonitor(consumers=%d, categories=%d)' % (
+            len(self._consumers), len(self._heads)
+        )
+
+    async def head(self, category: str) -> Head:
+        """Returns the (cached) head of a category."""
+        cached = self._heads.get(category)
+        if cached and time.monotonic() - cached.sampled_at < self.head_ttl:
+            return cached
+        if category in self._inflight:
+            return await asyncio.shield(self._inflight[category])
+
+        future = asyncio.ensure_future(self._sample(category))
+        self._inflight[category] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(category, None)
+
+    async def _sample(self, category: str) -> Head:
+        async with self.db.connection('lag-head') as con:
+            row = await con.fetchrow(Procs.sql_category_head_message, category)
+        if row is None:
+            head = Head(0, 0.0, time.monotonic())
+        else:
+            head = Head(
+                row['global_position'], utc_timestamp(row['time']), time.monotonic()
+            )
+        self._heads[category] = head
+        return head
+
+    async def _count(self, category: str, position: int, head: int) -> int:
+        async with self.db.connection('lag-count') as con:
+            return await con.fetchval(Procs.sql_category_count, category, position, head)
+
+    # ~~~
+
+    def track(
+        self,
+        consumer: str,
+        category: str,
+        position: int,
+        message_time: Optional[float] = None,
+        count: int = 0,
+    ) -> None:
+        """Record that ``consumer`` will read ``category`` next from ``position``,
+        having handled ``count`` messages since it last reported."""
+        progress = self._consumers.get(consumer)
+        if progress is None or progress.category != category:
+            progress = self._consumers[consumer] = _Progress(category)
+        progress.position = max(progress.position, position)
+        if message_time is not None:
+            progress.time = message_time
+
+        progress.window_count += count
+        now = time.monotonic()
+        elapsed = now - progress.window_start
+        if elapsed >= self.throughput_window:
+            rate = progress.window_count / elapsed
+            progress.throughput += self.smoothing * (rate - progress.throughput)
+            progress.window_start = now
+            progress.window_count = 0
+
+    def observe(self, consumer: str, message: MessageData) -> None:
+        """Record that ``consumer`` handled ``message``."""
+        self.track(
+            consumer,
+            message.category,
+            message.global_position + 1,
+            message.time,
+            count=1,
+        )
+
+    def forget(self, consumer: str) -> None:
+        self._consumers.pop(consumer, None)
+
+    async def lag(self, consumer: str) -> Optional[ConsumerLag]:
+        progress = self._consumers.get(consumer)
+        if progress is None:
+            return None
+        head = await self.head(progress.category)
+        behind = max(0, head.global_position - progress.position + 1)
+        messages = 0
+        seconds = 0.0
+        if behind:
+            messages = await self._count(
+                progress.category, progress.position, head.global_position
+            )
+            if progress.time is not None:
+                seconds = max(0.0, head.time - progress.time)
+        return ConsumerLag(
+            consumer,
+            progress.category,
+            progress.position,
+            head.global_position,
+            behind,
+            messages,
+            seconds,
+            progress.throughput,
+        )
+
+    async def snapshot(self) -> Dict[str, ConsumerLag]:
+        """Returns the lag of every tracked consumer."""
+        consumers = list(self._consumers)
+        results = await asyncio.gather(*(self.lag(c) for c in consumers))
+        return {c: lag for c, lag in zip(consumers, results) if lag is not None}
+
+    async def metrics(self, prefix: str = 'eventide_consumer') -> Dict[str, float]:
+        """Flattened lag gauges, keyed ``<prefix>_<metric>{consumer="..."}``."""
+        gauges = {}
+        for consumer, lag in (await self.snapshot()).items():
+            labels = '{consumer="%s",category="%s"}' % (consumer, lag.category)
+            gauges['%s_lag_messages%s' % (prefix, labels)] = lag.messages_behind
+            gauges['%s_lag_positions%s' % (prefix, labels)] = lag.positions_behind
+            gauges['%s_lag_seconds%s' % (prefix, labels)] = lag.seconds
+            gauges['%s_throughput%s' % (prefix, labels)] = lag.throughput
+            gauges['%s_position%s' % (prefix, labels)] = lag.position
+        return gauges
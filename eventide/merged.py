@@ -0,0 +1,204 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import heapq
+import asyncio
+from asyncio import Queue
+from logging import getLogger
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Optional,
+    Sequence,
+    AsyncIterator,
+)
+
+from eventide.batch import MessageBatch
+from eventide.message import MessageData
+from eventide.messagedb import Procs, MessageDB
+from eventide.checkpoint import FileCheckpoint
+
+__all__ = [
+    'MergedReader',
+]
+
+
+class _Source:
+    """Pages through one category in the background, up to global position
+    ``head``, keeping up to ``prefetch`` pages ready."""
+
+    def __init__(
+        self,
+        db: MessageDB,
+        category: str,
+        position: int,
+        head: int,
+        batch_size: int,
+        prefetch: int,
+        kwargs: dict,
+    ):
+        self.category = category
+        self.head = head
+        self._queue: Queue = Queue(maxsize=prefetch)
+        self._batch: Optional[MessageBatch] = None
+        self._index = 0
+        self._task = asyncio.ensure_future(self._fill(db, position, batch_size, kwargs))
+
+    async def _fill(self, db: MessageDB, position: int, batch_size: int, kwargs: dict) \
+            -> None:
+        try:
+            pages = db.get_category_batches(self.category, position, batch_size, **kwargs)
+            async for batch in pages:
+                await self._queue.put(batch)
+                if batch.global_positions[-1] >= self.head:
+                    break
+        except Exception as e:
+            await self._queue.put(e)
+        else:
+            await self._queue.put(None)
+
+    async def next(self) -> Optional[MessageData]:
+        """Returns the next message of the category, or None at its end or head."""
+        while self._batch is None or self._index >= len(self._batch):
+            page = await self._queue.get()
+            if isinstance(page, Exception):
+                raise page
+            if page is None:
+                self._batch = None
+                return None
+            self._batch, self._index = page, 0
+        msg = self._batch[self._index]
+        if msg.global_position > self.head:
+            return None
+        self._index += 1
+        return msg
+
+    def close(self) -> None:
+        self._task.cancel()
+
+
+class MergedReader:
+    """Reads several categories of one message store as a single stream, in
+    global position order.
+
+    Every category is paged concurrently with ``get_category_batches``, each
+    keeping up to ``prefetch`` pages ready, and the pages are k-way merged on the
+    client with a heap. Since global positions are shared by every category,
+    the merged stream needs a single position to resume from: the one after the
+    last message that was handed out and the consumer came back for more. It is
+    saved to ``checkpoint`` every ``checkpoint_every`` messages and when the
+    reader stops.
+
+    Each pass only reads up to the head of the message store (its newest global
+    position) as it was when the pass started. A message committed during the
+    pass, after its own category was read to the end, is then never skipped
+    because another category moved the shared position past it; it is read by
+    the next pass.
+
+    With ``follow`` the reader keeps polling for new messages every
+    ``poll_interval`` seconds once it has caught up, instead of stopping.
+    Extra keyword arguments (a consumer group, a ``Where`` filter, ...) are
+    passed to every ``get_category_batches`` call.
+    """
+
+    def __init__(
+        self,
+        db: MessageDB,
+        categories: Sequence[str],
+        position: int = 1,
+        batch_size: int = 1000,
+        prefetch: int = 2,
+        checkpoint: Optional[FileCheckpoint] = None,
+        checkpoint_every: int = 1000,
+        follow: bool = False,
+        poll_interval: float = 0.5,
+        **kwargs: Any,
+    ):
+        self.db = db
+        self.categories = list(dict.fromkeys(categories))
+        self.batch_size = max(1, batch_size)
+        self.prefetch = max(1, prefetch)
+        self.checkpoint = checkpoint
+        self.checkpoint_every = max(1, checkpoint_every)
+        self.follow = follow
+        self.poll_interval = max(0.0, poll_interval)
+        self.position = checkpoint.position if checkpoint else max(1, position)
+        self.logger = getLogger('eventide.MergedReader')
+
+        self._kwargs = kwargs
+        self._since_saved = 0
+
+    def __repr__(self) -> str:
+        return 'MergedReader(categories=%s, position=%d)' % (self.categories, self.position)
+
+    def __aiter__(self) -> AsyncIterator[MessageData]:
+        return self._read()
+
+    def save(self) -> None:
+        """Persist the current position to the checkpoint, if there is one."""
+        if self.checkpoint is not None and self._since_saved:
+            self.checkpoint.save(self.position)
+            self._since_saved = 0
+
+    def _advance(self, msg: MessageData) -> None:
+        self.position = msg.global_position + 1
+        self._since_saved += 1
+        if self._since_saved >= self.checkpoint_every:
+            self.save()
+
+    async def _read(self) -> AsyncIterator[MessageData]:
+        try:
+            while True:
+                count = 0
+                async for msg in self._merge():
+                    count += 1
+                    yield msg
+                if not self.follow:
+                    break
+                if not count:
+                    await asyncio.sleep(self.poll_interval)
+        finally:
+            self.save()
+
+    async def _merge(self) -> AsyncIterator[MessageData]:
+        """One pass over every category, from the current position to the head."""
+        async with self.db.read_connection('merged-head', self.position) as con:
+            head = await con.fetchval(Procs.sql_head_position) or 0
+        if head < self.position:
+            return
+        sources = [
+            _Source(
+                self.db,
+                category,
+                self.position,
+                head,
+                self.batch_size,
+                self.prefetch,
+                self._kwargs,
+            ) for category in self.categories
+        ]
+        try:
+            firsts = await asyncio.gather(*(src.next() for src in sources))
+            heap: List[Tuple[int, int, MessageData]] = [
+                (msg.global_position, idx, msg)
+                for idx, msg in enumerate(firsts) if msg is not None
+            ]
+            heapq.heapify(heap)
+            while heap:
+                _, idx, msg = heap[0]
+                yield msg
+                self._advance(msg)
+                following = await sources[idx].next()
+                if following is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (following.global_position, idx, following))
+        finally:
+            for src in sources:
+                src.close()
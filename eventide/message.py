@@ -22,7 +22,9 @@ from typing import (
     Dict,
     List,
     Type,
+    Tuple,
     Mapping,
+    ClassVar,
     Callable,
     Optional,
     NamedTuple,
@@ -30,8 +32,16 @@ from typing import (
 
 from pydantic import BaseModel, Field
 
-from eventide.utils import jdumps, jloads, dense_dict
+from eventide.utils import jdumps, jloads, dense_dict, utc_timestamp
 from eventide._types import JSON
+from eventide.compression import (
+    compress_data,
+    is_compressed,
+    decompress_data,
+    default_compression,
+)
+from eventide.upcasting import UpcasterRegistry, upcasters
+from eventide.stream_name import StreamName
 
 f_blank = Field(default=None)
 
@@ -60,6 +70,7 @@ class Metadata(BaseModel):
     reply_stream_name:                  Optional[str] = f_blank
     schema_version:                     Optional[str] = f_blank
     time:                               Optional[float] = f_blank
+    compression:                        Optional[str] = f_blank
     # yapf: enable
 
     def __repr__(self) -> str:
@@ -124,10 +135,11 @@ class MessageData:
     """MessageData is the raw, low-level storage representation of a message.
 
     These instances are READ from the database and should not be created directly.
+    ``time`` is the epoch timestamp of the (UTC) time the message was written.
     """
 
     type: str
-    stream_name: str
+    stream_name: StreamName
     data: JSON
     metadata: JSON
     id: UUID
@@ -139,11 +151,16 @@ class MessageData:
     def from_record(cls, record: Mapping) -> 'MessageData':
         """Build a new instance from a row in the message store."""
         rec = dict(record)
-        rec['data'] = jloads(rec.get('data', '{}'))
-        rec['metadata'] = jloads(rec.get('metadata', '{}'))
-        rec['time'] = rec.get('time', datetime.utcnow()).timestamp()
+        rec['data'] = jloads(rec.get('data') or '{}')
+        rec['metadata'] = jloads(rec.get('metadata') or '{}')
+        if rec['metadata'] and rec['metadata'].get('compression'):
+            rec['data'] = decompress_data(rec['data'], rec['metadata']['compression'])
+        rec['time'] = utc_timestamp(rec.get('time') or datetime.utcnow())
         return cls(**rec)
 
+    def __post_init__(self):
+        object.__setattr__(self, 'stream_name', StreamName(self.stream_name))
+
     def __gt__(self, other: 'MessageData') -> bool:
         return self.global_position > other.global_position
 
@@ -158,29 +175,58 @@ class MessageData:
 
     @property
     def category(self) -> str:
-        return self.stream_name.split('-')[0]
+        return self.stream_name.category
 
     @property
     def is_category(self) -> bool:
-        return '-' not in self.stream_name
+        return self.stream_name.is_category
 
     @property
     def stream_id(self) -> Optional[str]:
-        if '-' not in self.stream_name:
-            return None
-        return self.stream_name.split('-', 1)[1]
+        return self.stream_name.id
 
     @property
     def cardinal_id(self) -> Optional[str]:
-        if '-' not in self.stream_name:
-            return None
-        return self.stream_name.split('-', 1)[1].split('+')[0]
+        return self.stream_name.cardinal_id
 
     @property
     def command(self) -> Optional[str]:
-        if ':' not in self.category:
-            return None
-        return self.category.split(':', 1)[1].split('-')[0]
+        return self.stream_name.command
+
+
+class MessageHeader(NamedTuple):
+    """The envelope of a stored message, everything but its ``data``.
+
+    Returned by the header-only readers of ``MessageDB``, which never transfer or
+    decode message payloads."""
+    id: UUID
+    type: str
+    stream_name: StreamName
+    position: int
+    global_position: int
+    metadata: JSON
+    time: float
+
+    @classmethod
+    def from_record(cls, record: Mapping) -> 'MessageHeader':
+        """Build a new instance from a row selected with ``Procs.sql_*_headers``."""
+        return cls(
+            record['id'],
+            record['type'],
+            StreamName(record['stream_name']),
+            record['position'],
+            record['global_position'],
+            jloads(record['metadata']) if record['metadata'] else {},
+            utc_timestamp(record['time']),
+        )
+
+    @property
+    def category(self) -> str:
+        return self.stream_name.category
+
+    @property
+    def cardinal_id(self) -> Optional[str]:
+        return self.stream_name.cardinal_id
 
 
 class SerializedMessage(NamedTuple):
@@ -204,14 +250,34 @@ class Message:
     class on other structures that are persisted to the database.
     """
 
-    id: UUID            = Field(default_factory=uuid4, alias='_id_')
-    metadata: Metadata  = Field(default_factory=Metadata, alias='_metadata_')
+    id: UUID            = field(default_factory=uuid4)
+    metadata: Metadata  = field(default_factory=Metadata)
+
+    # opt-in payload compression, the codec name and the minimum size (in bytes)
+    #  of the serialized data before it gets compressed.
+    __compression__: ClassVar[Optional[str]] = None
+    __compression_threshold__: ClassVar[int] = 0
 
     @classmethod
-    def from_messagedata(cls, data: 'MessageData', strict: bool = False) -> 'Message':
+    def from_messagedata(
+        cls,
+        data: 'MessageData',
+        strict: bool = False,
+        registry: Optional[UpcasterRegistry] = None,
+    ) -> 'Message':
         if strict:
             if data.type != cls.__name__:
                 raise ValueError('invalid class name, does not match type `%s`' % data.type)
+        # bring the payload up to date
+        # .. decompress it if needed, then run the upcasters registered for this
+        #  type when its schema version is older than the newest known version.
+        payload, metadata = data.data, data.metadata
+        if metadata.get('compression') and is_compressed(payload):
+            payload = decompress_data(payload, metadata['compression'])
+        version = metadata.get('schema_version')
+        target, payload = (registry or upcasters).upcast_data(data.type, version, payload)
+        if target != version:
+            metadata = dict(metadata, schema_version=target)
         # coerce the metadata object
         # .. attempt to assign all the metadata fields and values from the
         #  incoming MessageData instance onto this custom Message instance.
@@ -219,7 +285,7 @@ class Message:
         #  instance is created by decorating the class with @messagecls.
         meta_obj = {}
         meta_fields = cls.__dataclass_fields__['metadata'].metadata or {}
-        for k, v in data.metadata.items():
+        for k, v in metadata.items():
             if k not in meta_fields:
                 if strict:
                     raise ValueError('undefined metadata field name `%s`' % k)
@@ -228,7 +294,7 @@ class Message:
             if k in meta_fields:
                 meta_obj[k] = v
         # create instance
-        msg = cls(**data.data)
+        msg = cls(**payload)
         msg.id = data.id
         msg.metadata = msg.metadata.__class__(**meta_obj)
         # return instance of custom class
@@ -270,23 +336,41 @@ class Message:
     ) -> SerializedMessage:
         """Prepare this instance to be written to the message store.
 
-        Returns a serialized version of this object's data.
+        Returns a serialized version of this object's data. Data is compressed when
+        the class opts in with ``__compression__``, or a default compression was
+        set, and it is at least as large as the threshold; the codec is recorded in
+        the metadata so reads decompress it transparently.
         """
         data = self.attributes()
-        # separate the metadata from the data
-        meta = dense_dict(data.pop('metadata'))
+        # separate the metadata from the data, it is a Metadata model unless the
+        #  class declared a plain dictionary for it
+        meta = data.pop('metadata')
+        meta = dense_dict(meta.dict() if isinstance(meta, BaseModel) else meta)
+        meta.pop('compression', None)
         # remove the UUID, since it has its own column
         del data['id']
+        data = jdumps(data, json_default_fn)
+        # compress the data when it is large enough, the threshold is in bytes
+        codec, threshold = self._compression()
+        if codec and len(data.encode('utf-8')) >= threshold:
+            data = compress_data(data, codec)
+            meta['compression'] = codec
         # build the response instance
         return SerializedMessage(
             str(self.id),
             stream_name,
             self.type,
-            jdumps(data, json_default_fn),
+            data,
             jdumps(meta, json_default_fn),
             expected_version,
         )
 
+    @classmethod
+    def _compression(cls) -> Tuple[Optional[str], int]:
+        if cls.__compression__:
+            return cls.__compression__, cls.__compression_threshold__
+        return default_compression()
+
 
 def messagecls(
     cls_=None,
@@ -6,19 +6,23 @@
 #   LiveViewTech
 # <<
 
+import re
 import math
+import time
 import asyncio
 from asyncio import Queue
-from hashlib import md5
 from logging import getLogger
 from operator import attrgetter
+from functools import lru_cache
 from contextlib import asynccontextmanager
 from typing import (
     Any,
+    Set,
     Dict,
     List,
     Tuple,
     Callable,
+    Iterable,
     Optional,
     AsyncIterable,
 )
@@ -28,18 +32,56 @@ from asyncpg.pool import Pool
 from cytoolz.functoolz import curry
 from cytoolz.itertoolz import groupby, partition_all
 from asyncpg.connection import Connection
-from asyncpg.exceptions import RaiseError, PostgresError
+from asyncpg.exceptions import RaiseError, PostgresError, UniqueViolationError
 
 from eventide.utils import jdumps, jloads
 from eventide._types import JSONFlatTypes, Loop
+from eventide.batch import MessageBatch
 from eventide.errors import EventideError
-from eventide.message import Message, MessageData, SerializedMessage
+from eventide.filters import COND_CORRELATION, Where
+from eventide.message import (
+    Message,
+    MessageData,
+    MessageHeader,
+    SerializedMessage,
+)
+from eventide.replica import ReplicaRouter
+from eventide.spool import Spool
+from eventide.segments import SegmentCache
+from eventide.stream_name import StreamName, hash64
+
+EXPECTED_VERSION_RE = re.compile(
+    r'Wrong expected version: (-?\d+) \(Stream: (.*), Stream Version: (.*)\)'
+)
 
 
 class MessageDBError(EventideError):
     """Base exception thrown for errors that occur in the MessageDB instance."""
 
 
+class ExpectedVersionError(MessageDBError):
+    """Thrown when a stream's version does not match the version a write expected."""
+
+    def __init__(self, stream_name: str, expected: int, actual: Optional[int]):
+        super().__init__(
+            'Wrong expected version: %s (Stream: %s, Stream Version: %s)' %
+            (expected, stream_name, actual)
+        )
+        self.stream_name = stream_name
+        self.expected = expected
+        self.actual = actual
+
+    @classmethod
+    def parse(cls, message: str) -> Optional['ExpectedVersionError']:
+        """Rebuild the error from the message raised by ``write_message``."""
+        match = EXPECTED_VERSION_RE.search(message)
+        if not match:
+            return None
+        expected, stream_name, actual = match.groups()
+        actual = None if not actual.lstrip('-').isdigit() else int(actual)
+        return cls(stream_name, int(expected), actual)
+
+
 # yapf: disable
 class Procs:
     """Known procedure, function and view names for extracting information
@@ -48,10 +90,16 @@ class Procs:
     hash_64                 = 'SELECT hash_64($1);'
     acquire_lock            = 'SELECT acquire_lock($1);'
     write_message           = 'SELECT write_message($1, $2, $3, $4, $5, $6);'
+    write_message_global    = """
+        SELECT position, currval('messages_global_position_seq')
+        FROM (SELECT write_message($1, $2, $3, $4, $5, $6) AS position OFFSET 0) w;
+    """
     get_stream_version      = 'SELECT stream_version($1);'
-    get_stream_messages     = 'SELECT get_stream_messages($1, $2, $3, $4);'
-    get_last_stream_message = 'SELECT get_last_stream_message($1);'
-    get_category_messages   = 'SELECT get_category_messages($1, $2, $3, $4, $5, $6, $7)'
+    get_stream_messages     = 'SELECT * FROM get_stream_messages($1, $2, $3, $4);'
+    get_last_stream_message = 'SELECT * FROM get_last_stream_message($1);'
+    get_category_messages   = (
+        'SELECT * FROM get_category_messages($1, $2, $3, $4, $5, $6, $7);'
+    )
     get_version             = "SELECT message_store_version();"
     sql_last_message = """
         SELECT * 
@@ -59,9 +107,192 @@ class Procs:
         ORDER BY time DESC
         LIMIT 1;
     """
+    sql_head_position = 'SELECT max(global_position) FROM messages;'
+    sql_last_written  = "SELECT currval('messages_global_position_seq');"
+    sql_first_message = """
+        SELECT global_position, time
+        FROM messages
+        ORDER BY global_position
+        LIMIT 1;
+    """
+    sql_head_message = """
+        SELECT global_position, time
+        FROM messages
+        ORDER BY global_position DESC
+        LIMIT 1;
+    """
+    sql_message_at = """
+        SELECT global_position, time
+        FROM messages
+        WHERE global_position >= $1
+        ORDER BY global_position
+        LIMIT 1;
+    """
+    sql_first_since = """
+        SELECT global_position
+        FROM messages
+        WHERE global_position > $1 AND global_position <= $2 AND time >= $3
+        ORDER BY global_position
+        LIMIT 1;
+    """
+    sql_category_head = """
+        SELECT max(global_position)
+        FROM messages
+        WHERE category(stream_name) = $1;
+    """
+    sql_category_count = """
+        SELECT count(*)
+        FROM messages
+        WHERE category(stream_name) = $1 AND global_position >= $2
+            AND global_position <= $3;
+    """
+    sql_category_head_message = """
+        SELECT global_position, time
+        FROM messages
+        WHERE category(stream_name) = $1
+        ORDER BY global_position DESC
+        LIMIT 1;
+    """
+    # no trailing semicolon, COPY (...) TO STDOUT wraps this query
+    sql_export_ndjson = """
+        SELECT row_to_json(m)
+        FROM (
+            SELECT id, stream_name, type, position, global_position, data, metadata, time
+            FROM messages
+            WHERE global_position >= $1 AND global_position < $2 %s
+            ORDER BY global_position
+        ) m
+    """
+    sql_export_rows = """
+        SELECT id::varchar, stream_name, type, position, global_position,
+            data::varchar, metadata::varchar, time
+        FROM messages
+        WHERE global_position >= $1 AND global_position < $2 %s
+        ORDER BY global_position;
+    """
+    sql_relay_rows = """
+        SELECT id, stream_name, type, position, global_position,
+            data::varchar, metadata::varchar, time
+        FROM messages
+        WHERE global_position >= $1 %s
+        ORDER BY global_position
+        LIMIT $2;
+    """
+    sql_relay_stage = """
+        CREATE TEMP TABLE IF NOT EXISTS eventide_relay (
+            id uuid,
+            stream_name varchar,
+            type varchar,
+            position bigint,
+            source_position bigint,
+            data jsonb,
+            metadata jsonb,
+            time timestamp
+        ) ON COMMIT DELETE ROWS;
+    """
+    sql_relay_insert = """
+        WITH written AS (
+            INSERT INTO messages (id, stream_name, type, position, data, metadata, time)
+            SELECT id, stream_name, type, position, data, metadata, time
+            FROM eventide_relay
+            ORDER BY source_position
+            ON CONFLICT (id) DO NOTHING
+            RETURNING global_position
+        )
+        SELECT count(*), max(global_position) FROM written;
+    """
+    # acquire_lock locks the category, so locks are taken once per category in
+    #  the order of their keys; writers doing the same can never deadlock.
+    sql_acquire_locks = """
+        SELECT acquire_lock(s)
+        FROM (
+            SELECT DISTINCT ON (hash_64(category(s))) s
+            FROM unnest($1::varchar[]) AS s
+            ORDER BY hash_64(category(s))
+            OFFSET 0
+        ) streams;
+    """
+    sql_write_messages = """
+        SELECT w.idx,
+            write_message(w.id, w.stream_name, w.type, w.data, w.metadata, w.version)
+        FROM (
+            SELECT *
+            FROM unnest(
+                $1::varchar[], $2::varchar[], $3::varchar[],
+                $4::jsonb[], $5::jsonb[], $6::bigint[]
+            ) WITH ORDINALITY AS t(id, stream_name, type, data, metadata, version, idx)
+            ORDER BY idx
+            OFFSET 0
+        ) w;
+    """
+    sql_stream_versions = """
+        SELECT s AS stream_name,
+            (SELECT max(position) FROM messages WHERE stream_name = s) AS version
+        FROM unnest($1::varchar[]) AS s;
+    """
+    sql_stream_headers = """
+        SELECT id, type, stream_name, position, global_position, metadata::varchar, time
+        FROM messages
+        WHERE stream_name = $1 AND position >= $2 %s
+        ORDER BY position
+        LIMIT $3;
+    """
+    sql_category_headers = """
+        SELECT id, type, stream_name, position, global_position, metadata::varchar, time
+        FROM messages
+        WHERE category(stream_name) = $1 AND global_position >= $2 %s
+        ORDER BY global_position
+        LIMIT $3;
+    """
+    sql_stream_select = """
+        SELECT id, stream_name, type, position, global_position,
+            data::varchar, metadata::varchar, time
+        FROM messages
+        WHERE stream_name = $1 AND position >= $2 %s
+        ORDER BY position
+        LIMIT $3;
+    """
+    sql_category_select = """
+        SELECT id, stream_name, type, position, global_position,
+            data::varchar, metadata::varchar, time
+        FROM messages
+        WHERE category(stream_name) = $1 AND global_position >= $2 %s
+        ORDER BY global_position
+        LIMIT $3;
+    """
+    sql_category_type_counts = """
+        SELECT category(stream_name) AS category, type, count(*) AS message_count,
+            count(*) FILTER (WHERE global_position < $2) AS settled_count
+        FROM messages
+        WHERE global_position >= $1
+        GROUP BY 1, 2;
+    """
+    cond_correlation    = COND_CORRELATION
+    cond_consumer_group = ('@hash_64(cardinal_id(stream_name)) %% $%d = $%d', 2)
 # yapf: enable
 
 
+@lru_cache(maxsize=256)
+def compile_select(
+    template: str,
+    conditions: Tuple[Tuple[str, int], ...] = (),
+    sql_condition: Optional[str] = None,
+) -> str:
+    """Fills the ``%s`` of a SELECT template with AND-ed conditions.
+
+    Each condition is a ``(sql, count)`` pair whose ``$%d`` placeholders are
+    numbered after the template's own three parameters, in order. A raw
+    ``sql_condition`` is appended last, as is. Compiled queries are cached per
+    shape, so the same combination of conditions is only built once."""
+    clauses, number = [], 4
+    for sql, count in conditions:
+        clauses.append('AND ' + sql % tuple(range(number, number + count)))
+        number += count
+    if sql_condition:
+        clauses.append('AND (' + sql_condition + ')')
+    return template % ' '.join(clauses)
+
+
 class MessageDB:
 
     DEFAULT_DSN = 'postgresql://message_store@0.0.0.0/message_store'
@@ -71,6 +302,13 @@ class MessageDB:
         config: Dict[str, Any],
         max_pending: int = 128,
         json_default_fn: Optional[Callable[[Any], JSONFlatTypes]] = None,
+        segment_cache: Optional[SegmentCache] = None,
+        replica_config: Optional[Dict[str, Any]] = None,
+        replica_lag_interval: float = 1.0,
+        spool: Optional[Spool] = None,
+        spill_threshold: Optional[int] = None,
+        summary_ttl: float = 60.0,
+        summary_window: int = 10_000,
         loop: Loop = None,
     ):
         self.loop = loop or asyncio.get_event_loop()
@@ -80,6 +318,20 @@ class MessageDB:
         self._pool: Optional[Pool] = None
         self._pending: Queue = Queue(maxsize=max_pending, loop=self.loop)
         self._jdumps = curry(jdumps)(default=json_default_fn)
+        self._segments = segment_cache
+        self._replica_config = replica_config
+        self._replica_lag_interval = replica_lag_interval
+        self._router: Optional[ReplicaRouter] = None
+        self._spool = spool
+        self._versions: Dict[str, Optional[int]] = {}
+        self._summary_ttl = max(0.0, summary_ttl)
+        self._summary_window = max(1, summary_window)
+        self._summary: Dict[Tuple[str, str], int] = {}
+        self._summary_tail: Dict[Tuple[str, str], int] = {}
+        self._summary_position = 1
+        self._summary_at: Optional[float] = None
+        self._summary_lock: Optional[asyncio.Lock] = None
+        self._spill_threshold = max_pending if spill_threshold is None else spill_threshold
 
     def __repr__(self) -> str:
         return 'MessageDB(connected=%s)' % self.connected
@@ -88,23 +340,60 @@ class MessageDB:
     def connected(self) -> bool:
         return self._pool and not self._pool._closed
 
+    @property
+    def router(self) -> Optional[ReplicaRouter]:
+        return self._router
+
     @asynccontextmanager
-    async def connection(self, action: Optional[str] = None) -> Connection:
+    async def connection(
+        self,
+        action: Optional[str] = None,
+        pool: Optional[Pool] = None,
+    ) -> Connection:
         """Returns an active Connection to the MessageDB database."""
 
-        async with self._pool.acquire() as con:
+        async with (pool or self._pool).acquire() as con:
             try:
                 if action:
                     self.logger.debug('connection action = %s', action)
                 yield con
             except RaiseError as e:
-                raise MessageDBError(e) from None
+                raise (ExpectedVersionError.parse(str(e)) or MessageDBError(e)) from None
             except PostgresError as e:
                 raise e
+            except MessageDBError:
+                raise
             except Exception as e:
                 self.logger.exception(e)
                 raise MessageDBError(*e.args) from e
 
+    @asynccontextmanager
+    async def read_connection(
+        self,
+        action: Optional[str] = None,
+        position: Optional[int] = None,
+    ) -> Connection:
+        """Returns an active Connection for a read-only query.
+
+        When a read replica is configured the connection comes from the replica,
+        unless it lags behind this process' own writes or, for reads starting at
+        a global ``position``, behind that position."""
+
+        pool = self._pool
+        if self._router is not None:
+            pool = await self._router.route(position)
+        async with self.connection(action, pool) as con:
+            yield con
+
+    def _observe_write(self, row: Any) -> int:
+        if self._router is not None:
+            self._router.observe_write(row[1])
+        return row[0]
+
+    @property
+    def _write_proc(self) -> str:
+        return Procs.write_message if self._router is None else Procs.write_message_global
+
     async def setup(self):
         """Setup must be called before interacting with the message store.
         This method is responsible for setting up the database connections and
@@ -115,14 +404,22 @@ class MessageDB:
             dsn = config.pop('dsn', self.DEFAULT_DSN)
             self._pool = await asyncpg.create_pool(dsn, **config, loop=self.loop)
 
+        if self._replica_config is not None and self._router is None:
+            config = dict(self._replica_config)
+            dsn = config.pop('dsn', self.DEFAULT_DSN)
+            replica = await asyncpg.create_pool(dsn, **config, loop=self.loop)
+            self._router = ReplicaRouter(self._pool, replica, self._replica_lag_interval)
+
         # setup json serialization
-        async with self.connection('set json') as conn:
-            await conn.set_type_codec(
-                'json',
-                encoder=self._jdumps,
-                decoder=jloads,
-                schema='pg_catalog',
-            )
+        pools = [self._pool] + ([self._router.replica] if self._router else [])
+        for pool in pools:
+            async with self.connection('set json', pool) as conn:
+                await conn.set_type_codec(
+                    'json',
+                    encoder=self._jdumps,
+                    decoder=jloads,
+                    schema='pg_catalog',
+                )
 
     async def shutdown(self):
         """Shutdown will terminate all open connections and perform other cleanup
@@ -130,13 +427,24 @@ class MessageDB:
 
         if self.connected:
             await self._pool.close()
+        if self._router is not None:
+            await self._router.replica.close()
+            self._router = None
+        if self._spool is not None:
+            self._spool.close()
 
     # ~~~
 
     @classmethod
     def hash64(cls, value: str) -> int:
         """Computes the 64-bit MD5SUM hash of a value locally."""
-        return int(md5(value.encode('utf-8')).hexdigest()[:16], 16)
+        return hash64(value)
+
+    @classmethod
+    def consumer_group_member(cls, stream_name: str, size: int) -> Optional[int]:
+        """Returns which member of a consumer group of ``size`` reads a stream,
+        without asking the database."""
+        return StreamName(stream_name).consumer_group_member(size)
 
     async def get_hash64(self, value: str) -> int:
         """Computes the 64-bit MD5SUM hash of a value on the database."""
@@ -155,26 +463,43 @@ class MessageDB:
     ) -> int:
         """Write a generic message to the database."""
         args = message.serialize(stream_name, expected_version)
-        async with self.connection('write_message') as conn:
-            return (await conn.fetchrow(Procs.write_message, *args))[0]
+        try:
+            async with self.connection('write_message') as conn:
+                position = self._observe_write(await conn.fetchrow(self._write_proc, *args))
+        except ExpectedVersionError:
+            self._versions.pop(stream_name, None)
+            raise
+        if stream_name in self._versions:
+            self._versions[stream_name] = position
+        return position
 
     async def queue_message(
         self,
         stream_name: str,
         message: Message,
     ) -> None:
-        await self._pending.put(message.serialize(stream_name))
+        """Queue a message to be written by ``write_pending_messages``.
+
+        With a spool configured, messages are appended to the spool instead once
+        ``spill_threshold`` messages are waiting in memory, and keep going there
+        until the spool has been drained so they are written in order."""
+        msg = message.serialize(stream_name)
+        if self._spool is not None:
+            if len(self._spool) or self._pending.qsize() >= self._spill_threshold:
+                self._spool.append(msg)
+                return
+        await self._pending.put(msg)
 
     async def write_pending_messages(self) -> int:
         """Flushes the buffer, if there are items in it, to the message store.
 
         The return value is the number of records that were successfully synced.
         """
-        if self._pending.empty():
+        if self._pending.empty() and not self._spool:
             return 0
 
         total = 0
-        split_n = math.ceil(self._pending.maxsize / 4.0)
+        split_n = max(1, math.ceil(self._pending.maxsize / 4.0))
 
         # ensure the queue is empty before returning
         while not self._pending.empty():
@@ -187,15 +512,41 @@ class MessageDB:
             # divide all the pending into like-typed instances
             partitioned = groupby(attrgetter('type'), pending)
             for _, items in partitioned.items():
-                for idx, bundle in partition_all(split_n, items):
+                for idx, bundle in enumerate(partition_all(split_n, items)):
                     async with self.connection('write_pending_messages-%d' % idx) as c:
                         async with c.transaction():
                             for msg in bundle:
-                                await c.fetchrow(Procs.write_message, *msg)
+                                row = await c.fetchrow(self._write_proc, *msg)
+                                self._observe_write(row)
                                 total += 1
+                    self.forget_stream_versions(msg.stream_name for msg in bundle)
         # ~~ no more in pending queue
+
+        # drain the spool, oldest first, once the memory queue is empty
+        while self._spool:
+            bundle = self._spool.read(split_n)
+            await self._write_spooled(bundle)
+            self.forget_stream_versions(msg.stream_name for msg in bundle)
+            self._spool.commit(len(bundle))
+            total += len(bundle)
         return total
 
+    async def _write_spooled(self, bundle: List[SerializedMessage]) -> None:
+        try:
+            async with self.connection('write_spooled_messages') as c:
+                async with c.transaction():
+                    for msg in bundle:
+                        self._observe_write(await c.fetchrow(self._write_proc, *msg))
+        except UniqueViolationError:
+            # the bundle was partly written before the spool could be committed
+            #  (e.g. a crash in between), write whatever is still missing.
+            async with self.connection('write_spooled_messages-retry') as c:
+                for msg in bundle:
+                    try:
+                        self._observe_write(await c.fetchrow(self._write_proc, *msg))
+                    except UniqueViolationError:
+                        self.logger.debug('spooled message %s already written', msg.id)
+
     async def get_version(self) -> Tuple[int, ...]:
         async with self.connection('get_version') as conn:
             res = await conn.fetchrow(Procs.get_version)
@@ -205,12 +556,12 @@ class MessageDB:
 
     async def get_last_global_index(self) -> int:
         res = await self.get_last_message()
-        return res['global_position'] if res else 0
+        return res.global_position if res else 0
 
     async def get_last_message(self) -> Optional[MessageData]:
-        async with self.connection('get_last_message') as conn:
+        async with self.read_connection('get_last_message') as conn:
             res = await conn.fetchrow(Procs.sql_last_message)
-            return MessageData.from_record(res)
+            return MessageData.from_record(res) if res else None
 
     async def get_stream_version(
         self,
@@ -220,39 +571,198 @@ class MessageDB:
         async with self.connection('get_stream_version') as con:
             return (await con.fetchrow(Procs.get_stream_version, stream))[0]
 
+    async def _refresh_summary(self, refresh: bool = False) -> Dict[Tuple[str, str], int]:
+        """Brings the per category and type message counts up to date.
+
+        Counts are cached for ``summary_ttl`` seconds. A refresh recounts only
+        the last ``summary_window`` global positions (and whatever was written
+        since the previous refresh); the counts of older messages are settled
+        and kept. Transactions commit slightly out of order, so a message can
+        appear behind the head after a refresh has counted past it; recounting
+        the trailing window, instead of adding to it, picks those up once. A
+        message committed more than ``summary_window`` positions late is still
+        missed, ``refresh=True`` rescans the whole table to reconcile."""
+        if self._summary_lock is None:
+            self._summary_lock = asyncio.Lock()
+        async with self._summary_lock:
+            now = time.monotonic()
+            if not refresh and self._summary_at is not None \
+                    and now - self._summary_at < self._summary_ttl:
+                return self._summary
+            if refresh:
+                self._summary, self._summary_tail = {}, {}
+                self._summary_position = 1
+            position = self._summary_position
+            async with self.read_connection('summary', position) as con:
+                head = await con.fetchval(Procs.sql_head_position) or 0
+                settle = max(position, head + 1 - self._summary_window)
+                rows = await con.fetch(Procs.sql_category_type_counts, position, settle)
+
+            # the previous tail is part of what was just recounted
+            counts = self._summary
+            for key, count in self._summary_tail.items():
+                counts[key] -= count
+            self._summary_tail = {}
+            for row in rows:
+                key = (row['category'], row['type'])
+                counts[key] = counts.get(key, 0) + row['message_count']
+                tail = row['message_count'] - row['settled_count']
+                if tail:
+                    self._summary_tail[key] = tail
+            self._summary = {key: count for key, count in counts.items() if count}
+            self._summary_position = settle
+            self._summary_at = now
+            return self._summary
+
+    async def category_type_summary(
+        self,
+        refresh: bool = False,
+    ) -> Dict[Tuple[str, str], Dict]:
+        """Message counts, and their share of all messages, per category and type;
+        ``refresh`` recounts every message instead of using the cached counts."""
+        counts = await self._refresh_summary(refresh)
+        total = sum(counts.values()) or 1
+        return {
+            key: {'count': count, 'percent': 100.0 * count / total}
+            for key, count in counts.items()
+        }
+
+    async def type_summary(self, refresh: bool = False) -> Dict[str, Dict]:
+        """Message counts, and their share of all messages, per type."""
+        counts: Dict[str, int] = {}
+        for (_, type_), count in (await self._refresh_summary(refresh)).items():
+            counts[type_] = counts.get(type_, 0) + count
+        total = sum(counts.values()) or 1
+        return {
+            type_: {'count': count, 'percent': 100.0 * count / total}
+            for type_, count in counts.items()
+        }
+
+    async def get_all_categories(self, refresh: bool = False) -> Set[str]:
+        return {category for category, _ in await self._refresh_summary(refresh)}
+
+    async def get_stream_versions(
+        self,
+        streams: Iterable[str],
+        cache: bool = False,
+    ) -> Dict[str, Optional[int]]:
+        """Gets the versions of many streams in a single query.
+
+        Streams that do not exist map to None. With ``cache`` the versions are
+        also kept in a client-side cache, see ``cached_stream_version``."""
+        streams = list(dict.fromkeys(streams))
+        if not streams:
+            return {}
+        async with self.connection('get_stream_versions') as con:
+            rows = await con.fetch(Procs.sql_stream_versions, streams)
+        versions = {row['stream_name']: row['version'] for row in rows}
+        if cache:
+            self._versions.update(versions)
+        return versions
+
+    def cached_stream_version(
+        self,
+        stream: str,
+        default: Optional[int] = None,
+    ) -> Optional[int]:
+        """The version of a stream as last cached by ``get_stream_versions``.
+
+        Writes made with ``write_message`` keep cached versions current; the
+        other write paths of this instance (pending messages, UnitOfWork,
+        BulkLoader, a Relay into it) drop the streams they write from the
+        cache. Writes by other clients are not seen, so a cached version is
+        only a hint (an expected version built from it may still be
+        rejected)."""
+        return self._versions.get(stream, default)
+
+    def forget_stream_versions(self, streams: Optional[Iterable[str]] = None) -> None:
+        """Drop some, or all, streams from the version cache."""
+        if streams is None:
+            self._versions.clear()
+            return
+        for stream in streams:
+            self._versions.pop(stream, None)
+
     async def get_stream_messages(
         self,
         stream: str,
         position: int = 0,
         batch_size: int = 1000,
         sql_condition: Optional[str] = None,
+        where: Optional[Where] = None,
     ) -> AsyncIterable[MessageData]:
         """Get messages from a stream.
 
         Retrieve messages from a single stream, optionally specifying the starting
         position, the number of messages to retrieve, and an additional condition
-        that will be appended to the SQL command's WHERE clause."""
+        that will be appended to the SQL command's WHERE clause.
+
+        A ``Where`` filter is evaluated by the database with parameterized SQL,
+        selecting from the messages table directly.
+
+        When a segment cache is configured, unconditional reads are served from it
+        as far as the stream is cached, and only the remainder is read from the
+        database (and then added to the cache)."""
+        if where:
+            conditions, args = where.compile()
+            query = compile_select(Procs.sql_stream_select, conditions, sql_condition)
+            async with self.read_connection('get_stream_messages') as con:
+                rows = await con.fetch(
+                    query, stream, max(0, position), max(1, batch_size), *args
+                )
+            for res in rows:
+                yield MessageData.from_record(res)
+            return
+
+        if self._segments is not None and sql_condition is None:
+            async for msg in self._get_cached_stream_messages(stream, position, batch_size):
+                yield msg
+            return
+
         args = (
             stream,
             max(0, position),
             max(1, batch_size),
             sql_condition,
         )
-        async with self.connection('get_stream_messages') as con:
+        async with self.read_connection('get_stream_messages') as con:
             async with con.transaction():
                 async for res in con.cursor(Procs.get_stream_messages, *args):
                     yield MessageData.from_record(res)
 
+    async def _get_cached_stream_messages(
+        self,
+        stream: str,
+        position: int,
+        batch_size: int,
+    ) -> AsyncIterable[MessageData]:
+        position = max(0, position)
+        batch_size = max(1, batch_size)
+
+        cached = self._segments.read(stream, position, batch_size)
+        for rec in cached:
+            yield MessageData.from_record(rec)
+        if len(cached) >= batch_size:
+            return
+
+        position += len(cached)
+        args = (stream, position, batch_size - len(cached), None)
+        async with self.read_connection('get_stream_messages') as con:
+            rows = await con.fetch(Procs.get_stream_messages, *args)
+        self._segments.append(stream, rows)
+        for res in rows:
+            yield MessageData.from_record(res)
+
     async def get_last_stream_message(
         self,
         stream: str,
     ) -> Optional[MessageData]:
         """Get the last message from a stream."""
-        async with self.connection('get_stream_last_message') as con:
+        async with self.read_connection('get_stream_last_message') as con:
             res = await con.fetchrow(Procs.get_last_stream_message, stream)
-            if not res or len(res) == 0:
+            if not res:
                 return None
-            return MessageData.from_record(res[0])
+            return MessageData.from_record(res)
 
     async def get_category_messages(
         self,
@@ -263,8 +773,30 @@ class MessageDB:
         consumer_group_member: Optional[int] = None,
         consumer_group_size: Optional[int] = None,
         sql_condition: Optional[str] = None,
+        where: Optional[Where] = None,
     ) -> AsyncIterable[MessageData]:
-        """Get messages from a category."""
+        """Get messages from a category.
+
+        A ``Where`` filter is evaluated by the database with parameterized SQL,
+        selecting from the messages table directly. So is a ``correlation``, the
+        message-db function only knows the camelCase correlation metadata key
+        and ``Where.correlation`` matches the snake_case one as well."""
+        if where or correlation is not None:
+            query, args = self._category_select(
+                Procs.sql_category_select,
+                correlation,
+                consumer_group_member,
+                consumer_group_size,
+                sql_condition,
+                where,
+            )
+            position = max(0, position)
+            async with self.read_connection('get_category_messages', position) as con:
+                rows = await con.fetch(query, category, position, max(1, batch_size), *args)
+            for res in rows:
+                yield MessageData.from_record(res)
+            return
+
         args = (
             category,
             max(0, position),
@@ -274,7 +806,128 @@ class MessageDB:
             consumer_group_size,
             sql_condition,
         )
-        async with self.connection('get_category_messages') as con:
+        async with self.read_connection('get_category_messages', position) as con:
             async with con.transaction():
                 async for res in con.cursor(Procs.get_category_messages, *args):
                     yield MessageData.from_record(res)
+
+    async def get_stream_headers(
+        self,
+        stream: str,
+        position: int = 0,
+        batch_size: int = 1000,
+        sql_condition: Optional[str] = None,
+        where: Optional[Where] = None,
+    ) -> AsyncIterable[MessageHeader]:
+        """Get the headers of messages from a stream, like ``get_stream_messages``
+        but without transferring or decoding their data."""
+        conditions, args = where.compile() if where else ((), [])
+        query = compile_select(Procs.sql_stream_headers, conditions, sql_condition)
+        async with self.read_connection('get_stream_headers') as con:
+            rows = await con.fetch(
+                query, stream, max(0, position), max(1, batch_size), *args
+            )
+        for row in rows:
+            yield MessageHeader.from_record(row)
+
+    async def get_category_headers(
+        self,
+        category: str,
+        position: int = 1,
+        batch_size: int = 1000,
+        correlation: Optional[str] = None,
+        consumer_group_member: Optional[int] = None,
+        consumer_group_size: Optional[int] = None,
+        sql_condition: Optional[str] = None,
+        where: Optional[Where] = None,
+    ) -> AsyncIterable[MessageHeader]:
+        """Get the headers of messages from a category, like
+        ``get_category_messages`` but without transferring or decoding their data."""
+        query, args = self._category_select(
+            Procs.sql_category_headers,
+            correlation,
+            consumer_group_member,
+            consumer_group_size,
+            sql_condition,
+            where,
+        )
+        position = max(0, position)
+        async with self.read_connection('get_category_headers', position) as con:
+            rows = await con.fetch(query, category, position, max(1, batch_size), *args)
+        for row in rows:
+            yield MessageHeader.from_record(row)
+
+    @staticmethod
+    def _category_select(
+        template: str,
+        correlation: Optional[str],
+        consumer_group_member: Optional[int],
+        consumer_group_size: Optional[int],
+        sql_condition: Optional[str],
+        where: Optional[Where],
+    ) -> Tuple[str, List[Any]]:
+        """Compiles a category SELECT with the same conditions the message-db
+        ``get_category_messages`` function supports, plus a ``Where`` filter."""
+        conditions, args = [], []
+        if correlation is not None:
+            conditions.append(Procs.cond_correlation)
+            args.append(correlation)
+        if consumer_group_member is not None or consumer_group_size is not None:
+            if consumer_group_member is None or consumer_group_size is None:
+                raise MessageDBError(
+                    'consumer group member and size must be given together'
+                )
+            if not 0 <= consumer_group_member < consumer_group_size:
+                raise MessageDBError(
+                    'consumer group member %d is not in a group of size %d' % (
+                        consumer_group_member, consumer_group_size
+                    )
+                )
+            conditions.append(Procs.cond_consumer_group)
+            args.extend((consumer_group_size, consumer_group_member))
+        if where:
+            shape, values = where.compile()
+            conditions.extend(shape)
+            args.extend(values)
+        return compile_select(template, tuple(conditions), sql_condition), args
+
+    async def get_category_batches(
+        self,
+        category: str,
+        position: int = 1,
+        batch_size: int = 1000,
+        correlation: Optional[str] = None,
+        consumer_group_member: Optional[int] = None,
+        consumer_group_size: Optional[int] = None,
+        sql_condition: Optional[str] = None,
+        where: Optional[Where] = None,
+    ) -> AsyncIterable[MessageBatch]:
+        """Get messages from a category as columnar pages.
+
+        Unlike ``get_category_messages`` this keeps reading, page after page, until
+        the end of the category is reached. A connection is only held while a page
+        is being fetched, never while the caller is processing it."""
+        position = max(0, position)
+        batch_size = max(1, batch_size)
+        if where or correlation is not None:
+            query, extra = self._category_select(
+                Procs.sql_category_select,
+                correlation,
+                consumer_group_member,
+                consumer_group_size,
+                sql_condition,
+                where,
+            )
+        else:
+            query = Procs.get_category_messages
+            extra = [correlation, consumer_group_member, consumer_group_size, sql_condition]
+        while True:
+            async with self.read_connection('get_category_batches', position) as con:
+                rows = await con.fetch(query, category, position, batch_size, *extra)
+            if not rows:
+                break
+            batch = MessageBatch.from_records(rows)
+            yield batch
+            if len(rows) < batch_size:
+                break
+            position = batch.global_positions[-1] + 1
@@ -0,0 +1,406 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import math
+import asyncio
+from asyncio import Queue
+from collections import deque
+from logging import getLogger
+from operator import attrgetter
+from concurrent.futures import Executor
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Callable,
+    Optional,
+    Awaitable,
+    NamedTuple,
+    AsyncIterable,
+    AsyncIterator,
+)
+
+from eventide.errors import EventideError
+from eventide.messagedb import MessageDB
+
+__all__ = [
+    'Pipeline',
+    'PipelineError',
+    'Window',
+]
+
+Stage = Callable[['_Channel', '_Channel'], Awaitable[None]]
+KeyFn = Union[str, Callable[[Any], Any]]
+
+_END = object()
+_TIMEOUT = object()
+
+
+class PipelineError(EventideError):
+    """Raised when a pipeline is misused, e.g. iterated twice."""
+
+
+class Window(NamedTuple):
+    """Messages whose time falls in ``[start, end)``."""
+    start: float
+    end: float
+    items: Any
+
+
+class _Failure:
+    __slots__ = ('exc',)
+
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+class _Channel:
+    """A bounded queue between two stages; a full channel makes the upstream
+    stage wait, which is how backpressure travels back to the source."""
+
+    def __init__(self, maxsize: int):
+        self._queue: Queue = Queue(maxsize=maxsize)
+
+    async def put(self, item: Any) -> None:
+        await self._queue.put(item)
+
+    async def get(self, timeout: Optional[float] = None) -> Any:
+        """Returns the next item, ``_END``, or ``_TIMEOUT`` if ``timeout`` passed."""
+        if timeout is None:
+            item = await self._queue.get()
+        else:
+            try:
+                item = await asyncio.wait_for(self._queue.get(), max(0.0, timeout))
+            except asyncio.TimeoutError:
+                return _TIMEOUT
+        if isinstance(item, _Failure):
+            raise item.exc
+        return item
+
+    def __aiter__(self) -> '_Channel':
+        return self
+
+    async def __anext__(self) -> Any:
+        item = await self.get()
+        if item is _END:
+            raise StopAsyncIteration
+        return item
+
+
+def _key_fn(key: KeyFn) -> Callable[[Any], Any]:
+    return attrgetter(key) if isinstance(key, str) else key
+
+
+def _invoke(fn: Callable, item: Any, executor: Optional[Executor]) -> asyncio.Future:
+    loop = asyncio.get_event_loop()
+    if executor is not None:
+        return loop.run_in_executor(executor, fn, item)
+    result = fn(item)
+    if asyncio.iscoroutine(result) or asyncio.isfuture(result):
+        return asyncio.ensure_future(result)
+    future = loop.create_future()
+    future.set_result(result)
+    return future
+
+
+def _apply(
+    fn: Callable,
+    executor: Optional[Executor],
+    concurrency: int,
+    predicate: bool,
+) -> Stage:
+    async def stage(inp: _Channel, out: _Channel) -> None:
+        pending: deque = deque()
+
+        async def emit() -> None:
+            item, future = pending.popleft()
+            result = await future
+            if not predicate:
+                await out.put(result)
+            elif result:
+                await out.put(item)
+
+        try:
+            async for item in inp:
+                pending.append((item, _invoke(fn, item, executor)))
+                if len(pending) >= concurrency:
+                    await emit()
+            while pending:
+                await emit()
+        finally:
+            for _, future in pending:
+                future.cancel()
+    return stage
+
+
+def _batch(size: int, timeout: Optional[float]) -> Stage:
+    async def stage(inp: _Channel, out: _Channel) -> None:
+        loop = asyncio.get_event_loop()
+        batch: List[Any] = []
+        deadline = 0.0
+        while True:
+            wait = None if not batch or timeout is None else deadline - loop.time()
+            item = await inp.get(wait)
+            if item is _END:
+                break
+            if item is not _TIMEOUT:
+                if not batch and timeout is not None:
+                    deadline = loop.time() + timeout
+                batch.append(item)
+                if len(batch) < size:
+                    continue
+            await out.put(batch)
+            batch = []
+        if batch:
+            await out.put(batch)
+    return stage
+
+
+def _windows(size: float, step: float, time_of: Callable[[Any], float]) -> Stage:
+    async def stage(inp: _Channel, out: _Channel) -> None:
+        logger = getLogger('eventide.Pipeline')
+        open_windows: Dict[float, List[Any]] = {}
+        # the newest time seen, every window ending at or before it is closed
+        watermark = -math.inf
+
+        async for item in inp:
+            t = time_of(item)
+            watermark = max(watermark, t)
+            # emit every window that ends at or before the watermark, oldest first
+            for start in sorted(s for s in open_windows if s + size <= watermark):
+                await out.put(Window(start, start + size, open_windows.pop(start)))
+
+            start = math.floor(t / step) * step
+            placed = False
+            while start > t - size:
+                if start + size > watermark:
+                    open_windows.setdefault(start, []).append(item)
+                    placed = True
+                start -= step
+            if not placed:
+                logger.debug(
+                    'dropping late item at %f, windows closed until %f', t, watermark
+                )
+
+        for start in sorted(open_windows):
+            await out.put(Window(start, start + size, open_windows[start]))
+    return stage
+
+
+def _group_by(key: Callable[[Any], Any]) -> Stage:
+    def group(items: Any) -> Dict[Any, List[Any]]:
+        groups: Dict[Any, List[Any]] = {}
+        for item in items:
+            groups.setdefault(key(item), []).append(item)
+        return groups
+
+    async def stage(inp: _Channel, out: _Channel) -> None:
+        async for items in inp:
+            if isinstance(items, Window):
+                await out.put(items._replace(items=group(items.items)))
+            else:
+                await out.put(group(items))
+    return stage
+
+
+class Pipeline:
+    """A chain of streaming stages over an async source of messages.
+
+    Stages are added by chaining; each call returns a new pipeline and nothing
+    runs until it is iterated:
+
+        pipeline = (
+            Pipeline.from_category(db, 'account')
+            .filter(lambda m: m.type == 'Deposited')
+            .tumbling(60.0)
+            .group_by('stream_name')
+        )
+        async for window in pipeline:
+            ...
+
+    While iterating, every stage runs in its own task and hands its output to
+    the next through a queue of at most ``buffer_size`` items, so a slow stage
+    makes the ones before it wait instead of letting buffers grow. ``map`` and
+    ``filter`` can run their function in an ``executor`` (a thread or process
+    pool) for CPU heavy work, with up to ``concurrency`` calls in flight; the
+    order of items is always preserved.
+
+    Time windows use the message ``time`` (or the ``time`` function given), so
+    they depend on the messages, not on when the pipeline happens to run.
+    """
+
+    def __init__(
+        self,
+        source: AsyncIterable,
+        stages: Tuple[Tuple[str, Stage], ...] = (),
+        buffer_size: int = 256,
+    ):
+        self.source = source
+        self.stages = stages
+        self.buffer_size = max(1, buffer_size)
+        self._tasks: List[asyncio.Task] = []
+        self._output: Optional[_Channel] = None
+
+    def __repr__(self) -> str:
+        return 'Pipeline(%s)' % ' -> '.join(['source'] + [name for name, _ in self.stages])
+
+    @classmethod
+    def from_category(
+        cls,
+        db: MessageDB,
+        category: str,
+        position: int = 1,
+        batch_size: int = 1000,
+        buffer_size: int = 256,
+        **kwargs: Any,
+    ) -> 'Pipeline':
+        """Messages of a category, from ``position`` to the end of the category;
+        ``kwargs`` are passed to ``MessageDB.get_category_batches``."""
+        async def source():
+            pages = db.get_category_batches(category, position, batch_size, **kwargs)
+            async for batch in pages:
+                for msg in batch:
+                    yield msg
+        return cls(source(), buffer_size=buffer_size)
+
+    @classmethod
+    def from_stream(
+        cls,
+        db: MessageDB,
+        stream: str,
+        position: int = 0,
+        batch_size: int = 1000,
+        buffer_size: int = 256,
+        **kwargs: Any,
+    ) -> 'Pipeline':
+        """Messages of a stream, from ``position`` to the end of the stream;
+        ``kwargs`` are passed to ``MessageDB.get_stream_messages``."""
+        async def source():
+            start = position
+            while True:
+                count = 0
+                page = db.get_stream_messages(stream, start, batch_size, **kwargs)
+                async for msg in page:
+                    count += 1
+                    start = msg.position + 1
+                    yield msg
+                if count < batch_size:
+                    break
+        return cls(source(), buffer_size=buffer_size)
+
+    def _then(self, name: str, stage: Stage) -> 'Pipeline':
+        return Pipeline(self.source, self.stages + ((name, stage),), self.buffer_size)
+
+    # ~~~
+
+    def map(
+        self,
+        fn: Callable[[Any], Any],
+        executor: Optional[Executor] = None,
+        concurrency: int = 1,
+    ) -> 'Pipeline':
+        """Replace every item with ``fn(item)``; ``fn`` may be a coroutine function
+        unless an ``executor`` is given."""
+        return self._then('map', _apply(fn, executor, max(1, concurrency), False))
+
+    def filter(
+        self,
+        fn: Callable[[Any], Any],
+        executor: Optional[Executor] = None,
+        concurrency: int = 1,
+    ) -> 'Pipeline':
+        """Keep the items for which ``fn(item)`` is true."""
+        return self._then('filter', _apply(fn, executor, max(1, concurrency), True))
+
+    def batch(self, size: int, timeout: Optional[float] = None) -> 'Pipeline':
+        """Group items into lists of ``size``, or fewer when ``timeout`` seconds
+        pass after the first item of a list arrived."""
+        return self._then('batch', _batch(max(1, size), timeout))
+
+    def tumbling(self, seconds: float, time: KeyFn = 'time') -> 'Pipeline':
+        """Group items into consecutive, non-overlapping Windows of ``seconds``."""
+        if seconds <= 0:
+            raise PipelineError('window size must be positive')
+        return self._then('tumbling', _windows(seconds, seconds, _key_fn(time)))
+
+    def sliding(self, seconds: float, step: float, time: KeyFn = 'time') -> 'Pipeline':
+        """Group items into Windows of ``seconds`` starting every ``step`` seconds;
+        an item belongs to every window that covers its time."""
+        if seconds <= 0 or step <= 0:
+            raise PipelineError('window size and step must be positive')
+        return self._then('sliding', _windows(seconds, step, _key_fn(time)))
+
+    def group_by(self, key: KeyFn) -> 'Pipeline':
+        """Split every batch or window into a dict of lists keyed by ``key``, an
+        attribute name or a function of the item."""
+        return self._then('group_by', _group_by(_key_fn(key)))
+
+    # ~~~
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        if self._output is not None:
+            raise PipelineError('a pipeline can only be iterated once')
+        self._output = self._start()
+        return self._iterate()
+
+    def _start(self) -> _Channel:
+        async def pump_source(out: _Channel) -> None:
+            try:
+                async for item in self.source:
+                    await out.put(item)
+            except Exception as e:
+                await out.put(_Failure(e))
+            else:
+                await out.put(_END)
+
+        async def pump(stage: Stage, inp: _Channel, out: _Channel) -> None:
+            try:
+                await stage(inp, out)
+            except Exception as e:
+                await out.put(_Failure(e))
+            else:
+                await out.put(_END)
+
+        channel = _Channel(self.buffer_size)
+        self._tasks.append(asyncio.ensure_future(pump_source(channel)))
+        for _, stage in self.stages:
+            out = _Channel(self.buffer_size)
+            self._tasks.append(asyncio.ensure_future(pump(stage, channel, out)))
+            channel = out
+        return channel
+
+    async def _iterate(self) -> AsyncIterator[Any]:
+        try:
+            async for item in self._output:
+                yield item
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Stop every stage, e.g. after breaking out of the iteration early."""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def collect(self) -> List[Any]:
+        return [item async for item in self]
+
+    async def run(self, sink: Optional[Callable[[Any], Any]] = None) -> int:
+        """Drive the pipeline to the end, passing every output to ``sink`` (which
+        may be a coroutine function). Returns the number of outputs."""
+        count = 0
+        async for item in self:
+            if sink is not None:
+                result = sink(item)
+                if asyncio.iscoroutine(result):
+                    await result
+            count += 1
+        return count
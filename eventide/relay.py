@@ -0,0 +1,156 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from logging import getLogger
+from typing import (
+    Any,
+    List,
+    Tuple,
+    Optional,
+    Sequence,
+)
+
+from asyncpg import Record
+
+from eventide.checkpoint import FileCheckpoint
+from eventide.messagedb import Procs, MessageDB
+
+__all__ = [
+    'Relay',
+]
+
+# column order of ``Procs.sql_relay_rows``
+STAGE_COLUMNS = (
+    'id',
+    'stream_name',
+    'type',
+    'position',
+    'source_position',
+    'data',
+    'metadata',
+    'time',
+)
+
+
+class Relay:
+    """Mirrors messages from one message store to another without decoding them.
+
+    Rows are read from ``source`` in global position order with their payloads
+    cast to text, so neither ``data`` nor ``metadata`` is parsed on the way
+    through. Each batch is copied into a temporary table on ``target`` and moved
+    into ``messages`` with one ``INSERT ... ON CONFLICT (id) DO NOTHING``, keeping
+    the original ids, types, stream positions, metadata and times. Messages the
+    target already has are skipped, so a relay that is restarted from an older
+    checkpoint, or two relays covering overlapping filters, are harmless.
+
+    Reading the next batch overlaps with writing the current one. After every
+    batch the next source position is saved to ``checkpoint``, if one is given.
+    ``types`` and ``streams`` narrow what is mirrored; both are applied by the
+    source database.
+    """
+
+    def __init__(
+        self,
+        source: MessageDB,
+        target: MessageDB,
+        category: Optional[str] = None,
+        types: Optional[Sequence[str]] = None,
+        streams: Optional[Sequence[str]] = None,
+        batch_size: int = 10_000,
+        checkpoint: Optional[FileCheckpoint] = None,
+        poll_interval: float = 0.5,
+        position: int = 1,
+    ):
+        self.source = source
+        self.target = target
+        self.category = category
+        self.types = list(types) if types else None
+        self.streams = list(streams) if streams else None
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = checkpoint
+        self.poll_interval = max(0.0, poll_interval)
+        self.position = checkpoint.position if checkpoint else max(1, position)
+        self.relayed = 0
+        self.logger = getLogger('eventide.Relay')
+
+        self._query, self._filters = self._build_query()
+        self._stopped = False
+
+    def __repr__(self) -> str:
+        return 'Relay(category=%s, position=%d, relayed=%d)' % (
+            self.category, self.position, self.relayed
+        )
+
+    def _build_query(self) -> Tuple[str, List[Any]]:
+        clauses, args = [], []
+        for clause, value in (
+            ('category(stream_name) = $%d', self.category),
+            ('type = ANY($%d::varchar[])', self.types),
+            ('stream_name = ANY($%d::varchar[])', self.streams),
+        ):
+            if value is not None:
+                args.append(value)
+                clauses.append('AND ' + clause % (len(args) + 2))
+        return Procs.sql_relay_rows % ' '.join(clauses), args
+
+    async def _read(self, position: int) -> List[Record]:
+        async with self.source.read_connection('relay-read', position) as con:
+            return await con.fetch(self._query, position, self.batch_size, *self._filters)
+
+    async def _write(self, rows: List[Record]) -> int:
+        async with self.target.connection('relay-write') as con:
+            async with con.transaction():
+                await con.execute(Procs.sql_relay_stage)
+                await con.copy_records_to_table(
+                    'eventide_relay', records=rows, columns=STAGE_COLUMNS
+                )
+                written, last = await con.fetchrow(Procs.sql_relay_insert)
+        if last is not None and self.target.router is not None:
+            self.target.router.observe_write(last)
+        self.target.forget_stream_versions(row['stream_name'] for row in rows)
+        if written < len(rows):
+            self.logger.debug(
+                'skipped %d messages already in the target', len(rows) - written
+            )
+        return written
+
+    async def run(self, until_caught_up: bool = False) -> int:
+        """Relay messages until ``stop`` is called, or, with ``until_caught_up``,
+        until the source has nothing newer. Returns the number of messages that
+        were written to the target."""
+        self._stopped = False
+        written = 0
+        reading = asyncio.ensure_future(self._read(self.position))
+        try:
+            while not self._stopped:
+                rows = await reading
+                if not rows:
+                    if until_caught_up:
+                        break
+                    await asyncio.sleep(self.poll_interval)
+                    reading = asyncio.ensure_future(self._read(self.position))
+                    continue
+
+                position = rows[-1]['global_position'] + 1
+                reading = asyncio.ensure_future(self._read(position))
+                written += await self._write(rows)
+                self.position = position
+                self.relayed += len(rows)
+                if self.checkpoint is not None:
+                    self.checkpoint.save(position)
+        finally:
+            if not reading.done():
+                reading.cancel()
+        self.logger.info(
+            'relayed %d messages up to global position %d', written, self.position
+        )
+        return written
+
+    def stop(self) -> None:
+        self._stopped = True
@@ -0,0 +1,260 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import glob
+import asyncio
+import inspect
+from logging import getLogger
+from concurrent.futures import ProcessPoolExecutor
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Callable,
+    Optional,
+    AsyncIterable,
+)
+
+from eventide.errors import EventideError
+from eventide.message import MessageData
+from eventide.messagedb import Procs, MessageDB
+from eventide.checkpoint import FileCheckpoint
+
+__all__ = [
+    'ReplayError',
+    'ReplayEngine',
+]
+
+Handler = Callable[[MessageData], Any]
+
+
+class ReplayError(EventideError):
+    """Raised when a replay cannot be split or one of its workers fails."""
+
+
+def _replay_worker(
+    config: Dict[str, Any],
+    category: str,
+    handler: Handler,
+    checkpoint_path: str,
+    start: int,
+    end: int,
+    batch_size: int,
+    member: Optional[int],
+    size: Optional[int],
+) -> int:
+    """Entry point of a worker process; replays one slice of a category."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(
+            _replay(
+                MessageDB(config, loop=loop),
+                category,
+                handler,
+                FileCheckpoint(checkpoint_path, start),
+                end,
+                batch_size,
+                member,
+                size,
+            )
+        )
+    finally:
+        loop.close()
+
+
+async def _replay(
+    db: MessageDB,
+    category: str,
+    handler: Handler,
+    checkpoint: FileCheckpoint,
+    end: int,
+    batch_size: int,
+    member: Optional[int],
+    size: Optional[int],
+) -> int:
+    total = 0
+    await db.setup()
+    try:
+        position = checkpoint.position
+        if position > end:
+            return 0
+        async for batch in db.get_category_batches(
+            category,
+            position,
+            batch_size,
+            consumer_group_member=member,
+            consumer_group_size=size,
+        ):
+            for msg in batch:
+                if msg.global_position > end:
+                    break
+                result = handler(msg)
+                if inspect.isawaitable(result):
+                    await result
+                total += 1
+            last = batch.global_positions[-1]
+            checkpoint.save(min(last, end) + 1)
+            if last >= end:
+                break
+        checkpoint.save(end + 1)
+    finally:
+        await db.shutdown()
+    return total
+
+
+class ReplayEngine:
+    """Rebuilds a read model by replaying a category in parallel worker processes.
+
+    The category is split into ``workers`` slices, either by consumer group member
+    (``split='member'``, which keeps every stream's messages in order within one
+    worker) or by equal ranges of global positions (``split='range'``, for
+    handlers that do not depend on per-stream ordering).
+
+    Each worker opens its own MessageDB from ``config``, decodes and applies its
+    slice with ``handler`` and checkpoints its progress after every page, so a
+    crashed rebuild resumes where each worker left off. ``handler`` runs inside
+    the worker processes and must be picklable, e.g. a module-level function;
+    it may be a coroutine function.
+
+    Slice checkpoints are named after the head of the category the rebuild was
+    started with, and removed once the rebuild completes; the next rebuild starts
+    over with fresh slices.
+
+    Once ``rebuild`` returns, every slice has been applied up to the head of the
+    category as it was when the rebuild started, and ``live`` continues from
+    there in the current process.
+    """
+
+    SPLITS = ('member', 'range')
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        category: str,
+        handler: Handler,
+        workers: int = os.cpu_count() or 1,
+        split: str = 'member',
+        checkpoint_dir: str = '.',
+        batch_size: int = 1000,
+    ):
+        if split not in self.SPLITS:
+            raise ReplayError('unknown split strategy `%s`' % split)
+
+        self.config = config
+        self.category = category
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.split = split
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = max(1, batch_size)
+        self.checkpoint = FileCheckpoint(self._checkpoint_path('head'))
+        self.logger = getLogger('eventide.ReplayEngine')
+
+    def __repr__(self) -> str:
+        return 'ReplayEngine(category=%s, workers=%d, split=%s)' % (
+            self.category, self.workers, self.split
+        )
+
+    @property
+    def _checkpoint_prefix(self) -> str:
+        name = '%s.replay-%s.' % (self.category, self.split)
+        return os.path.join(self.checkpoint_dir, name)
+
+    def _checkpoint_path(self, name: str) -> str:
+        return self._checkpoint_prefix + name + '.json'
+
+    def _slice_checkpoint_path(self, head: int, idx: int, n: int) -> str:
+        return self._checkpoint_path('%d.%d-%d' % (head, idx, n))
+
+    def _clear_slice_checkpoints(self) -> None:
+        for path in glob.glob(glob.escape(self._checkpoint_prefix) + '*.json'):
+            if path != self.checkpoint.path:
+                FileCheckpoint(path).clear()
+
+    def _slices(self, head: int) -> List[Tuple[int, int, Optional[int], Optional[int]]]:
+        """Returns ``(start, end, member, size)`` for each worker."""
+        n = self.workers
+        if self.split == 'member':
+            return [(1, head, member, n) for member in range(n)]
+        step = max(1, -(-head // n))
+        return [
+            (start, min(start + step - 1, head), None, None)
+            for start in range(1, head + 1, step)
+        ]
+
+    async def rebuild(self, db: MessageDB) -> int:
+        """Replay the category up to its current head in the worker processes.
+
+        Returns the global position live consumption should continue from."""
+        state = self.checkpoint.load()
+        if 'rebuilding' in state:
+            # resume an interrupted rebuild with the same head, so every worker
+            #  finds the slice (and checkpoint) it was working on before.
+            head = state['rebuilding']
+        else:
+            # slices left behind by a rebuild that never recorded its head
+            self._clear_slice_checkpoints()
+            async with db.connection('replay-head') as con:
+                head = (await con.fetchrow(Procs.sql_category_head, self.category))[0] or 0
+            self.checkpoint.save(state.get('position', 1), rebuilding=head)
+
+        slices = self._slices(head)
+        self.logger.info(
+            'replaying %s up to %d across %d workers', self.category, head, len(slices)
+        )
+        with ProcessPoolExecutor(max_workers=len(slices) or 1) as pool:
+            futures = [
+                db.loop.run_in_executor(
+                    pool,
+                    _replay_worker,
+                    self.config,
+                    self.category,
+                    self.handler,
+                    self._slice_checkpoint_path(head, idx, len(slices)),
+                    start,
+                    end,
+                    self.batch_size,
+                    member,
+                    size,
+                ) for idx, (start, end, member, size) in enumerate(slices)
+            ]
+            try:
+                counts = await asyncio.gather(*futures)
+            except Exception as e:
+                raise ReplayError('replay worker failed: %s' % e) from e
+
+        self.logger.info('replayed %d messages from %s', sum(counts), self.category)
+        position = max(state.get('position', 1), head + 1)
+        self.checkpoint.save(position)
+        self._clear_slice_checkpoints()
+        return position
+
+    async def live(
+        self,
+        db: MessageDB,
+        position: Optional[int] = None,
+        poll_interval: float = 1.0,
+    ) -> AsyncIterable[MessageData]:
+        """Yields new messages from where the rebuild finished, polling forever.
+
+        The engine's checkpoint is advanced after every page has been consumed."""
+        position = position or self.checkpoint.position
+        while True:
+            read = False
+            pages = db.get_category_batches(self.category, position, self.batch_size)
+            async for batch in pages:
+                for msg in batch:
+                    yield msg
+                position = batch.global_positions[-1] + 1
+                self.checkpoint.save(position)
+                read = True
+            if not read:
+                await asyncio.sleep(poll_interval)
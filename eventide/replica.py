@@ -0,0 +1,119 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import time
+import asyncio
+from logging import getLogger
+from typing import Dict, Optional
+
+from asyncpg.pool import Pool
+
+__all__ = [
+    'ReplicaRouter',
+]
+
+SQL_HEAD = 'SELECT max(global_position) FROM messages;'
+
+
+class ReplicaRouter:
+    """Decides whether a read can be served by a read replica.
+
+    The router keeps a sample of the head global position on the replica and on
+    the primary, refreshed at most every ``lag_interval`` seconds, and a fence:
+    the highest global position this process has written itself. A read goes to
+    the replica only when the replica has caught up with the fence (so callers
+    always read their own writes) and, for position-based reads, when the replica
+    already has the requested global position (or everything the primary had at
+    the last sample, for readers at the head). Otherwise it goes to the primary.
+
+    When the replica falls short the head is re-sampled immediately, but no more
+    often than every ``resample_interval`` seconds, so a lagging replica never
+    adds a query to every read.
+    """
+
+    def __init__(
+        self,
+        primary: Pool,
+        replica: Pool,
+        lag_interval: float = 1.0,
+        resample_interval: float = 0.05,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.lag_interval = max(0.0, lag_interval)
+        self.resample_interval = max(0.0, resample_interval)
+        self.logger = getLogger('eventide.ReplicaRouter')
+
+        self.fence = 0
+        self.replica_head = 0
+        self.primary_head = 0
+        self.sampled_at = 0.0
+        self._inflight: Optional[asyncio.Future] = None
+
+    def __repr__(self) -> str:
+        return 'ReplicaRouter(lag=%d, fence=%d)' % (self.lag, self.fence)
+
+    @property
+    def lag(self) -> int:
+        """Number of global positions the replica was behind at the last sample."""
+        return max(0, self.primary_head - self.replica_head)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'lag': self.lag,
+            'fence': self.fence,
+            'replica_head': self.replica_head,
+            'primary_head': self.primary_head,
+            'sampled_at': self.sampled_at,
+        }
+
+    def observe_write(self, global_position: int) -> None:
+        """Record a global position written by this process."""
+        self.fence = max(self.fence, global_position)
+        self.primary_head = max(self.primary_head, global_position)
+
+    def _covers(self, position: Optional[int]) -> bool:
+        need = self.fence
+        if position is not None:
+            # a reader tailing the head only needs what the primary had last time
+            need = max(need, min(position, self.primary_head))
+        return self.replica_head >= need
+
+    async def sample(self) -> None:
+        """Refresh the replica and primary heads; concurrent callers share a
+        single in-flight sample."""
+        if self._inflight is not None:
+            return await asyncio.shield(self._inflight)
+
+        future = asyncio.ensure_future(self._sample())
+        self._inflight = future
+        try:
+            await asyncio.shield(future)
+        finally:
+            self._inflight = None
+
+    async def _sample(self) -> None:
+        async with self.replica.acquire() as con:
+            replica_head = (await con.fetchval(SQL_HEAD)) or 0
+        async with self.primary.acquire() as con:
+            primary_head = (await con.fetchval(SQL_HEAD)) or 0
+        self.replica_head = replica_head
+        self.primary_head = max(self.primary_head, primary_head)
+        self.sampled_at = time.monotonic()
+
+    async def route(self, position: Optional[int] = None) -> Pool:
+        """Returns the pool a read starting at global ``position`` should use."""
+        age = time.monotonic() - self.sampled_at
+        if age >= self.lag_interval or (not self._covers(position) and
+                                        age >= self.resample_interval):
+            try:
+                await self.sample()
+            except Exception as e:
+                self.logger.warning('could not sample replica lag: %s', e)
+                return self.primary
+        return self.replica if self._covers(position) else self.primary
@@ -0,0 +1,220 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import mmap
+import shutil
+import struct
+from hashlib import md5
+from logging import getLogger
+from collections import OrderedDict
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+)
+
+import orjson
+
+from eventide.utils import utc_datetime, utc_timestamp
+
+__all__ = [
+    'SegmentCache',
+]
+
+HEADER = struct.Struct('<I')
+
+RECORD_FIELDS = (
+    'id',
+    'stream_name',
+    'type',
+    'position',
+    'global_position',
+    'data',
+    'metadata',
+    'time',
+)
+
+
+class _Segment:
+    __slots__ = ('path', 'first', 'offsets', 'size')
+
+    def __init__(self, path: str, first: int, offsets: List[int], size: int):
+        self.path = path
+        self.first = first
+        self.offsets = offsets
+        self.size = size
+
+    @property
+    def last(self) -> int:
+        return self.first + len(self.offsets) - 1
+
+
+class SegmentCache:
+    """Keeps pages of stream messages on local disk, in memory-mapped segment files.
+
+    Messages are immutable once written, so any contiguous run of a stream that
+    has been read from the database can be served from disk afterwards. Every
+    stream keeps a contiguous prefix of its history, starting at position 0, made
+    of one segment file per page that was fetched. Reads inside the prefix come
+    from the segments; only positions beyond the cached tail need the database.
+
+    Segments hold the raw records the message store returned (``data`` and
+    ``metadata`` are still JSON strings) so nothing is decoded twice. When the
+    total size on disk grows past ``max_bytes``, whole streams are evicted in
+    least-recently-used order.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        self.directory = directory
+        self.max_bytes = max(0, max_bytes)
+        self.logger = getLogger('eventide.SegmentCache')
+
+        self._streams: 'OrderedDict[str, List[_Segment]]' = OrderedDict()
+        self._size = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def __repr__(self) -> str:
+        return 'SegmentCache(streams=%d, size=%d, max_bytes=%d)' % (
+            len(self._streams), self._size, self.max_bytes
+        )
+
+    def _stream_dir(self, stream: str) -> str:
+        return os.path.join(self.directory, md5(stream.encode('utf-8')).hexdigest())
+
+    def _load(self) -> None:
+        """Rebuild the in-memory index from the segment files already on disk."""
+        for entry in sorted(os.scandir(self.directory), key=lambda e: e.stat().st_mtime):
+            if not entry.is_dir():
+                continue
+            segments = []
+            for name in sorted(os.listdir(entry.path)):
+                if not name.endswith('.seg'):
+                    continue
+                path = os.path.join(entry.path, name)
+                segment = self._scan(path, int(name[:-4]))
+                # keep only the contiguous prefix, a gap means the rest is unusable
+                expected = segments[-1].last + 1 if segments else 0
+                if segment is None or segment.first != expected:
+                    break
+                segments.append(segment)
+            if not segments:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            with open(os.path.join(entry.path, 'stream'), 'r') as fh:
+                self._streams[fh.read()] = segments
+            self._size += sum(s.size for s in segments)
+
+    @staticmethod
+    def _scan(path: str, first: int) -> Optional[_Segment]:
+        offsets = []
+        size = os.path.getsize(path)
+        if size == 0:
+            return None
+        with open(path, 'rb') as fh, \
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = 0
+            while offset < size:
+                offsets.append(offset)
+                offset += HEADER.size + HEADER.unpack_from(mm, offset)[0]
+        return _Segment(path, first, offsets, size)
+
+    # ~~~
+
+    def tail(self, stream: str) -> int:
+        """Returns the last cached position of a stream, or -1 if nothing is cached."""
+        segments = self._streams.get(stream)
+        return segments[-1].last if segments else -1
+
+    def read(self, stream: str, position: int, limit: int) -> List[Dict[str, Any]]:
+        """Returns up to ``limit`` cached records starting at ``position``."""
+        segments = self._streams.get(stream)
+        if not segments or position > segments[-1].last:
+            return []
+        self._streams.move_to_end(stream)
+
+        records = []
+        for segment in segments:
+            if segment.last < position:
+                continue
+            with open(segment.path, 'rb') as fh, \
+                    mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                for idx in range(max(0, position - segment.first), len(segment.offsets)):
+                    offset = segment.offsets[idx]
+                    length = HEADER.unpack_from(mm, offset)[0]
+                    start = offset + HEADER.size
+                    values = orjson.loads(mm[start:start + length])
+                    record = dict(zip(RECORD_FIELDS, values))
+                    record['time'] = utc_datetime(record['time'])
+                    records.append(record)
+                    if len(records) >= limit:
+                        return records
+        return records
+
+    def append(self, stream: str, records: List[Mapping]) -> bool:
+        """Adds a page of records to the stream's cached prefix.
+
+        Pages that do not start right after the cached tail are ignored, since
+        they would leave a gap. Returns True if the page was cached."""
+        if not records or records[0]['position'] != self.tail(stream) + 1:
+            return False
+
+        directory = self._stream_dir(stream)
+        if stream not in self._streams:
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, 'stream'), 'w') as fh:
+                fh.write(stream)
+            self._streams[stream] = []
+
+        first = records[0]['position']
+        path = os.path.join(directory, '%020d.seg' % first)
+        offsets, buffer = [], bytearray()
+        for rec in records:
+            payload = orjson.dumps([
+                rec['id'],
+                rec['stream_name'],
+                rec['type'],
+                rec['position'],
+                rec['global_position'],
+                rec['data'],
+                rec['metadata'],
+                utc_timestamp(rec['time']),
+            ])
+            offsets.append(len(buffer))
+            buffer += HEADER.pack(len(payload))
+            buffer += payload
+
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(buffer)
+        os.replace(tmp, path)
+
+        self._streams[stream].append(_Segment(path, first, offsets, len(buffer)))
+        self._streams.move_to_end(stream)
+        self._size += len(buffer)
+        self._evict(keep=stream)
+        return True
+
+    def evict(self, stream: str) -> None:
+        segments = self._streams.pop(stream, None)
+        if segments:
+            self._size -= sum(s.size for s in segments)
+            shutil.rmtree(self._stream_dir(stream), ignore_errors=True)
+
+    def _evict(self, keep: str) -> None:
+        while self._size > self.max_bytes and len(self._streams) > 1:
+            stream = next(iter(self._streams))
+            if stream == keep:
+                self._streams.move_to_end(stream)
+                continue
+            self.logger.debug('evicting cached stream %s', stream)
+            self.evict(stream)
@@ -0,0 +1,283 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import heapq
+import asyncio
+from logging import getLogger
+from typing import (
+    Any,
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Iterable,
+    Optional,
+    Sequence,
+    AsyncIterable,
+)
+
+from eventide.errors import EventideError
+from eventide.message import Message, MessageData, MessageHeader
+from eventide.messagedb import MessageDB
+from eventide.stream_name import StreamName
+
+__all__ = [
+    'ShardingError',
+    'ShardedMessageDB',
+]
+
+
+class ShardingError(EventideError):
+    """Raised when a stream cannot be routed to a shard."""
+
+
+class ShardedMessageDB:
+    """Spreads streams over several message-db instances by category.
+
+    Every stream is routed to exactly one shard, picked from ``category_map`` when
+    its category is listed there, or else by the stable 64-bit hash of the
+    category (``MessageDB.hash64``) modulo the number of shards. Since all the
+    streams of a category live together, per-stream ordering, ``expected_version``
+    checks and category reads behave exactly as they do on a single MessageDB.
+
+    Global positions are only meaningful within one shard. Consumers that span
+    categories on different shards can use ``get_merged_messages``, which orders
+    messages by time and tracks a position per category. For the same reason
+    there is no single last global index, ``get_last_global_index`` raises and
+    ``get_last_global_indexes`` returns one per shard.
+    """
+
+    def __init__(
+        self,
+        shards: Sequence[MessageDB],
+        category_map: Optional[Dict[str, int]] = None,
+    ):
+        if not shards:
+            raise ShardingError('at least one shard is required')
+        self.shards = list(shards)
+        self.category_map = dict(category_map or {})
+        self.logger = getLogger('eventide.ShardedMessageDB')
+
+        for category, idx in self.category_map.items():
+            if not 0 <= idx < len(self.shards):
+                raise ShardingError(
+                    'category `%s` mapped to unknown shard %d' % (category, idx)
+                )
+
+    def __repr__(self) -> str:
+        return 'ShardedMessageDB(shards=%d, connected=%s)' % (
+            len(self.shards), self.connected
+        )
+
+    @property
+    def connected(self) -> bool:
+        return all(shard.connected for shard in self.shards)
+
+    async def setup(self):
+        await asyncio.gather(*(shard.setup() for shard in self.shards))
+
+    async def shutdown(self):
+        await asyncio.gather(*(shard.shutdown() for shard in self.shards))
+
+    # ~~~
+
+    hash64 = MessageDB.hash64
+    consumer_group_member = MessageDB.consumer_group_member
+
+    def shard_index(self, stream_name: str) -> int:
+        """Returns the index of the shard a stream (or category) belongs to."""
+        category = StreamName(stream_name).category
+        idx = self.category_map.get(category)
+        if idx is None:
+            idx = self.hash64(category) % len(self.shards)
+        return idx
+
+    def shard(self, stream_name: str) -> MessageDB:
+        return self.shards[self.shard_index(stream_name)]
+
+    async def get_hash64(self, value: str) -> int:
+        return await self.shards[0].get_hash64(value)
+
+    async def get_version(self) -> Tuple[int, ...]:
+        return await self.shards[0].get_version()
+
+    async def acquire_lock(self, stream: str) -> int:
+        return await self.shard(stream).acquire_lock(stream)
+
+    async def write_message(
+        self,
+        stream_name: str,
+        message: Message,
+        expected_version: Optional[int] = None,
+    ) -> int:
+        return await self.shard(stream_name).write_message(
+            stream_name, message, expected_version
+        )
+
+    async def queue_message(self, stream_name: str, message: Message) -> None:
+        await self.shard(stream_name).queue_message(stream_name, message)
+
+    async def write_pending_messages(self) -> int:
+        counts = await asyncio.gather(*(s.write_pending_messages() for s in self.shards))
+        return sum(counts)
+
+    async def get_last_global_index(self) -> int:
+        raise ShardingError(
+            'global positions are per shard, use get_last_global_indexes() instead'
+        )
+
+    async def get_last_global_indexes(self) -> List[int]:
+        """Returns the last global index of every shard, in shard order."""
+        return list(await asyncio.gather(*(s.get_last_global_index() for s in self.shards)))
+
+    async def get_last_message(self) -> Optional[MessageData]:
+        """Returns the most recent message, by time, across all shards."""
+        found = await asyncio.gather(*(s.get_last_message() for s in self.shards))
+        found = [msg for msg in found if msg is not None]
+        return max(found, key=lambda m: m.time) if found else None
+
+    async def get_stream_version(self, stream: str) -> int:
+        return await self.shard(stream).get_stream_version(stream)
+
+    async def get_stream_versions(
+        self,
+        streams: Sequence[str],
+        cache: bool = False,
+    ) -> Dict[str, Optional[int]]:
+        """Gets the versions of many streams, one query per shard involved."""
+        by_shard: Dict[int, List[str]] = {}
+        for stream in streams:
+            by_shard.setdefault(self.shard_index(stream), []).append(stream)
+        found = await asyncio.gather(*(
+            self.shards[idx].get_stream_versions(names, cache)
+            for idx, names in by_shard.items()
+        ))
+        versions: Dict[str, Optional[int]] = {}
+        for part in found:
+            versions.update(part)
+        return versions
+
+    def cached_stream_version(self, stream: str, default: Optional[int] = None) \
+            -> Optional[int]:
+        return self.shard(stream).cached_stream_version(stream, default)
+
+    def forget_stream_versions(self, streams: Optional[Iterable[str]] = None) -> None:
+        if streams is None:
+            for shard in self.shards:
+                shard.forget_stream_versions()
+            return
+        for stream in streams:
+            self.shard(stream).forget_stream_versions((stream,))
+
+    async def category_type_summary(self, refresh: bool = False) \
+            -> Dict[Tuple[str, str], Dict]:
+        """Message counts, and their share of all messages, per category and type,
+        over every shard."""
+        counts: Dict[Tuple[str, str], int] = {}
+        for summary in await asyncio.gather(*(
+            shard.category_type_summary(refresh) for shard in self.shards
+        )):
+            for key, value in summary.items():
+                counts[key] = counts.get(key, 0) + value['count']
+        total = sum(counts.values()) or 1
+        return {
+            key: {'count': count, 'percent': 100.0 * count / total}
+            for key, count in counts.items()
+        }
+
+    async def type_summary(self, refresh: bool = False) -> Dict[str, Dict]:
+        """Message counts, and their share of all messages, per type, over every
+        shard."""
+        counts: Dict[str, int] = {}
+        for (_, type_), value in (await self.category_type_summary(refresh)).items():
+            counts[type_] = counts.get(type_, 0) + value['count']
+        total = sum(counts.values()) or 1
+        return {
+            type_: {'count': count, 'percent': 100.0 * count / total}
+            for type_, count in counts.items()
+        }
+
+    async def get_all_categories(self, refresh: bool = False) -> Set[str]:
+        found = await asyncio.gather(*(s.get_all_categories(refresh) for s in self.shards))
+        return set().union(*found)
+
+    async def get_last_stream_message(self, stream: str) -> Optional[MessageData]:
+        return await self.shard(stream).get_last_stream_message(stream)
+
+    def get_stream_messages(self, stream: str, *args: Any, **kwargs: Any) \
+            -> AsyncIterable[MessageData]:
+        return self.shard(stream).get_stream_messages(stream, *args, **kwargs)
+
+    def get_category_messages(self, category: str, *args: Any, **kwargs: Any) \
+            -> AsyncIterable[MessageData]:
+        return self.shard(category).get_category_messages(category, *args, **kwargs)
+
+    def get_category_batches(self, category: str, *args: Any, **kwargs: Any) \
+            -> AsyncIterable[Any]:
+        return self.shard(category).get_category_batches(category, *args, **kwargs)
+
+    def get_stream_headers(self, stream: str, *args: Any, **kwargs: Any) \
+            -> AsyncIterable[MessageHeader]:
+        return self.shard(stream).get_stream_headers(stream, *args, **kwargs)
+
+    def get_category_headers(self, category: str, *args: Any, **kwargs: Any) \
+            -> AsyncIterable[MessageHeader]:
+        return self.shard(category).get_category_headers(category, *args, **kwargs)
+
+    async def get_merged_messages(
+        self,
+        categories: Sequence[str],
+        positions: Optional[Dict[str, int]] = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterable[MessageData]:
+        """Read several categories, possibly on different shards, merged by time.
+
+        ``positions`` maps each category to the global position (on its own
+        shard) to start from; the mapping is updated in place as messages are
+        yielded, so it can be persisted as the consumer's checkpoint.
+
+        A message's time is its transaction's start, so within a category it does
+        not always grow with the global position. Each category is ordered by
+        the latest time seen in it so far, which keeps its own messages in
+        global position order (the checkpoint never passes one not yet
+        yielded) and only uses time to pick between categories."""
+        positions = positions if positions is not None else {}
+        readers = {
+            category: self.get_category_batches(
+                category, positions.get(category, 1), batch_size
+            ).__aiter__()
+            for category in categories
+        }
+        clocks: Dict[str, float] = {}
+        heap: List[Tuple[float, int, int, str, MessageData]] = []
+
+        async def fill(category: str) -> None:
+            try:
+                batch = await readers[category].__anext__()
+            except StopAsyncIteration:
+                return
+            shard = self.shard_index(category)
+            clock = clocks.get(category, float('-inf'))
+            for msg in batch:
+                clock = max(clock, msg.time)
+                heapq.heappush(heap, (clock, shard, msg.global_position, category, msg))
+            clocks[category] = clock
+            # sentinel: the source must be read again once this page runs out
+            last = batch[-1]
+            heapq.heappush(
+                heap, (clock, len(self.shards), last.global_position, category, None)
+            )
+
+        await asyncio.gather(*(fill(category) for category in categories))
+        while heap:
+            _, _, _, category, msg = heapq.heappop(heap)
+            if msg is None:
+                await fill(category)
+                continue
+            positions[category] = msg.global_position + 1
+            yield msg
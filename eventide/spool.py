@@ -0,0 +1,197 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+import mmap
+import time
+import shutil
+import struct
+from logging import getLogger
+from typing import List, Union
+
+import orjson
+
+from eventide.errors import EventideError
+from eventide.message import SerializedMessage
+
+__all__ = [
+    'Spool',
+    'SpoolError',
+]
+
+# header: magic, read offset
+HEADER = struct.Struct('<8sQ')
+MAGIC = b'EVSPOOL1'
+LENGTH = struct.Struct('<I')
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class SpoolError(EventideError):
+    """Raised when a spool file cannot be opened or is corrupt."""
+
+
+class Spool:
+    """An append-only, on-disk log of messages waiting to be written.
+
+    Records are appended to the end of the file and read back, in order, through
+    a memory map. The offset of the first unread record is kept in the file
+    header, so messages that were spooled but not yet written survive a crash;
+    a torn record at the end of the file is discarded when it is reopened. Once
+    every record has been read the file is truncated back to its header.
+
+    Under constant back-pressure the spool may never be drained, so the file is
+    also compacted, the unread records copied to a new file that replaces it,
+    once the consumed records take up at least ``compact_bytes`` and at least
+    as much as the unread ones (so each byte is copied a bounded number of
+    times).
+
+    ``fsync`` controls durability: ``always`` syncs after every append and
+    commit, ``interval`` at most once every ``fsync_interval`` seconds, and
+    ``never`` leaves it to the operating system.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, os.PathLike],
+        fsync: str = 'interval',
+        fsync_interval: float = 1.0,
+        compact_bytes: int = 16 * 1024 * 1024,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise SpoolError('unknown fsync policy `%s`' % fsync)
+
+        self.path = os.fspath(path)
+        self.fsync = fsync
+        self.fsync_interval = max(0.0, fsync_interval)
+        self.compact_bytes = max(1, compact_bytes)
+        self.logger = getLogger('eventide.Spool')
+
+        self._synced_at = 0.0
+        self._fh = open(self.path, 'r+b' if os.path.exists(self.path) else 'w+b')
+        self._read_offset, self._count = self._open()
+
+    def __repr__(self) -> str:
+        return 'Spool(path=%s, pending=%d)' % (self.path, self._count)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _open(self):
+        fh = self._fh
+        size = os.fstat(fh.fileno()).st_size
+        if size < HEADER.size:
+            fh.truncate(0)
+            self._write_header(HEADER.size)
+            return HEADER.size, 0
+
+        fh.seek(0)
+        magic, offset = HEADER.unpack(fh.read(HEADER.size))
+        if magic != MAGIC or offset < HEADER.size:
+            raise SpoolError('`%s` is not a spool file' % self.path)
+
+        # count the pending records, dropping a partially written one at the end
+        count, end = 0, offset
+        fh.seek(offset)
+        while end < size:
+            raw = fh.read(LENGTH.size)
+            if len(raw) < LENGTH.size:
+                break
+            length = LENGTH.unpack(raw)[0]
+            if end + LENGTH.size + length > size:
+                break
+            fh.seek(length, os.SEEK_CUR)
+            end += LENGTH.size + length
+            count += 1
+        if end < size:
+            self.logger.warning('discarding %d bytes of a torn record', size - end)
+            fh.truncate(end)
+        return offset, count
+
+    def _write_header(self, offset: int) -> None:
+        os.pwrite(self._fh.fileno(), HEADER.pack(MAGIC, offset), 0)
+
+    def _sync(self, force: bool = False) -> None:
+        if self.fsync == 'never' and not force:
+            return
+        now = time.monotonic()
+        if force or self.fsync == 'always' or now - self._synced_at >= self.fsync_interval:
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self._synced_at = now
+
+    def _compact(self, offset: int) -> int:
+        """Replace the file with a copy holding only the records from ``offset``
+        on, returning the new read offset."""
+        tmp = self.path + '.tmp'
+        self._fh.flush()
+        self._fh.seek(offset)
+        with open(tmp, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, HEADER.size))
+            shutil.copyfileobj(self._fh, out)
+            out.flush()
+            os.fsync(out.fileno())
+        self._fh.close()
+        os.replace(tmp, self.path)
+        self._fh = open(self.path, 'r+b')
+        self.logger.debug('compacted %d consumed bytes', offset - HEADER.size)
+        return HEADER.size
+
+    # ~~~
+
+    def append(self, message: SerializedMessage) -> None:
+        payload = orjson.dumps(list(message))
+        self._fh.seek(0, os.SEEK_END)
+        self._fh.write(LENGTH.pack(len(payload)) + payload)
+        self._count += 1
+        self._sync()
+
+    def read(self, limit: int) -> List[SerializedMessage]:
+        """Returns up to ``limit`` of the oldest records without consuming them."""
+        if not self._count:
+            return []
+        self._fh.flush()
+        records = []
+        with mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = self._read_offset
+            while len(records) < min(limit, self._count):
+                length = LENGTH.unpack_from(mm, offset)[0]
+                start = offset + LENGTH.size
+                records.append(SerializedMessage(*orjson.loads(mm[start:start + length])))
+                offset = start + length
+        return records
+
+    def commit(self, count: int) -> None:
+        """Consume the ``count`` oldest records, once they have been written."""
+        count = min(count, self._count)
+        if not count:
+            return
+        self._fh.flush()
+        with mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = self._read_offset
+            for _ in range(count):
+                offset += LENGTH.size + LENGTH.unpack_from(mm, offset)[0]
+        self._count -= count
+        consumed = offset - HEADER.size
+        if self._count == 0:
+            # everything was drained, start over with an empty file
+            offset = HEADER.size
+            self._write_header(offset)
+            self._fh.truncate(offset)
+        elif consumed >= self.compact_bytes \
+                and consumed >= os.fstat(self._fh.fileno()).st_size - offset:
+            offset = self._compact(offset)
+        else:
+            self._write_header(offset)
+        self._read_offset = offset
+        self._sync()
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._sync(force=self.fsync != 'never')
+            self._fh.close()
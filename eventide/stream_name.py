@@ -0,0 +1,84 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from hashlib import md5
+from functools import lru_cache
+from typing import Optional
+
+__all__ = [
+    'StreamName',
+    'hash64',
+]
+
+CATEGORY_DELIM = '-'
+COMPOUND_DELIM = '+'
+TYPE_DELIM = ':'
+
+# number of distinct stream names kept interned
+CACHE_SIZE = 65_536
+
+
+def hash64(value: str) -> int:
+    """Computes the (unsigned) 64-bit MD5SUM hash of a value locally."""
+    return int(md5(value.encode('utf-8')).hexdigest()[:16], 16)
+
+
+class StreamName(str):
+    """A stream name that has been split into its parts once.
+
+    ``StreamName('account:command-123+456')`` has the category
+    ``account:command``, the id ``123+456``, the cardinal id ``123`` and the
+    command type ``command``, following message-db's own ``category``, ``id``
+    and ``cardinal_id`` functions.
+
+    Instances are interned: constructing a StreamName from a name that was seen
+    recently returns the same object, and constructing one from a StreamName
+    returns it unchanged, so passing them around costs nothing. Being a ``str``,
+    a StreamName can be used anywhere a plain stream name is expected.
+    """
+
+    category: str
+    id: Optional[str]
+    cardinal_id: Optional[str]
+    command: Optional[str]
+
+    def __new__(cls, value: str) -> 'StreamName':
+        if type(value) is StreamName:
+            return value
+        return _parse(str(value))
+
+    def __reduce__(self):
+        return StreamName, (str(self),)
+
+    @property
+    def is_category(self) -> bool:
+        return self.id is None
+
+    def consumer_group_member(self, size: int) -> Optional[int]:
+        """The consumer group member that reads this stream in a group of ``size``,
+        the same as message-db's ``@hash_64(cardinal_id(stream_name)) % size``."""
+        if self._cardinal_hash is None:
+            if self.cardinal_id is None:
+                return None
+            # message-db hashes to a signed bigint and takes its absolute value
+            unsigned = hash64(self.cardinal_id)
+            signed = unsigned - (1 << 64) if unsigned >= 1 << 63 else unsigned
+            self._cardinal_hash = abs(signed)
+        return self._cardinal_hash % size
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(value: str) -> StreamName:
+    name = str.__new__(StreamName, value)
+    category, delim, stream_id = value.partition(CATEGORY_DELIM)
+    name.category = category
+    name.id = stream_id if delim else None
+    name.cardinal_id = stream_id.partition(COMPOUND_DELIM)[0] if delim else None
+    name.command = category.partition(TYPE_DELIM)[2] or None
+    name._cardinal_hash = None
+    return name
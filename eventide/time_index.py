@@ -0,0 +1,181 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+from bisect import bisect_left
+from datetime import datetime
+from logging import getLogger
+from typing import (
+    List,
+    Tuple,
+    Union,
+    Optional,
+)
+
+import orjson
+from asyncpg.connection import Connection
+
+from eventide.utils import utc_datetime, utc_timestamp
+from eventide.message import MessageData
+from eventide.messagedb import Procs, MessageDB
+
+__all__ = [
+    'TimeIndex',
+]
+
+Timestamp = Union[float, datetime]
+
+
+class TimeIndex:
+    """Finds the global position where the messages written at a given time start.
+
+    The index keeps a sparse, sorted list of ``(global_position, time)`` samples.
+    A lookup brackets the time between the two closest samples and then binary
+    searches the database between them, one indexed single-row query per step,
+    until the remaining range is at most ``scan_window`` positions wide, which
+    is finished with one range query. Every probe becomes a new sample, so the
+    index gets denser where it is used and later lookups nearby take only a
+    query or two.
+
+    Samples can also be fed from consumer reads with ``observe``, one every
+    ``sample_every`` global positions. With a ``path`` the samples are loaded
+    from and saved to a local file.
+
+    Global positions grow with time, but transactions can commit slightly out
+    of order; the position found is the first one in its final range whose time
+    is at or after the one asked for.
+    """
+
+    def __init__(
+        self,
+        db: MessageDB,
+        path: Optional[Union[str, os.PathLike]] = None,
+        sample_every: int = 10_000,
+        scan_window: int = 10_000,
+        max_samples: int = 100_000,
+    ):
+        self.db = db
+        self.path = os.fspath(path) if path is not None else None
+        self.sample_every = max(1, sample_every)
+        self.scan_window = max(1, scan_window)
+        self.max_samples = max(2, max_samples)
+        self.logger = getLogger('eventide.TimeIndex')
+
+        self._positions: List[int] = []
+        self._times: List[float] = []
+        self._dirty = False
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'rb') as fh:
+                for position, time in orjson.loads(fh.read()):
+                    self.add(position, time)
+            self._dirty = False
+
+    def __repr__(self) -> str:
+        return 'TimeIndex(samples=%d)' % len(self)
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, global_position: int, time: float) -> None:
+        """Add a sample; ``time`` is an epoch timestamp."""
+        idx = bisect_left(self._positions, global_position)
+        if idx < len(self._positions) and self._positions[idx] == global_position:
+            return
+        self._positions.insert(idx, global_position)
+        self._times.insert(idx, time)
+        self._dirty = True
+        if len(self._positions) > self.max_samples:
+            # thin out evenly, keeping the oldest and newest samples
+            self._positions = self._positions[:-1:2] + self._positions[-1:]
+            self._times = self._times[:-1:2] + self._times[-1:]
+
+    def observe(self, message: MessageData) -> None:
+        """Sample a message read by a consumer, if it is far enough from the
+        nearest sample before it."""
+        idx = bisect_left(self._positions, message.global_position)
+        if idx and message.global_position - self._positions[idx - 1] < self.sample_every:
+            return
+        self.add(message.global_position, message.time)
+
+    def _bracket(self, target: float) -> Tuple[Optional[int], Optional[int]]:
+        """The sample positions just before, and at or after, ``target``."""
+        hi = next((i for i, t in enumerate(self._times) if t >= target), None)
+        if hi is None:
+            return (self._positions[-1] if self._positions else None), None
+        lo = next((i for i in range(hi - 1, -1, -1) if self._times[i] < target), None)
+        return (None if lo is None else self._positions[lo]), self._positions[hi]
+
+    async def _probe(
+        self,
+        con: Connection,
+        query: str,
+        *args,
+    ) -> Optional[Tuple[int, float]]:
+        row = await con.fetchrow(query, *args)
+        if row is None:
+            return None
+        position, time = row['global_position'], utc_timestamp(row['time'])
+        self.add(position, time)
+        return position, time
+
+    # ~~~
+
+    async def position_at(self, when: Timestamp) -> int:
+        """The global position of the first message written at or after ``when``;
+        if there is none yet, the position after the newest message."""
+        moment = utc_datetime(when)
+        target = utc_timestamp(moment)
+        lo, hi = self._bracket(target)
+        queries = 0
+
+        async with self.db.read_connection('time-index') as con:
+            if hi is None:
+                head = await self._probe(con, Procs.sql_head_message)
+                queries += 1
+                if head is None:
+                    return 1
+                if head[1] < target:
+                    return head[0] + 1
+                hi = head[0]
+                lo, _ = self._bracket(target)
+            if lo is None:
+                first = await self._probe(con, Procs.sql_first_message)
+                queries += 1
+                if first[1] >= target:
+                    return first[0]
+                lo = first[0]
+
+            # the answer is hi, or a position in (lo, upper]
+            upper = hi
+            while upper - lo > self.scan_window:
+                mid = (lo + upper) // 2
+                position, time = await self._probe(con, Procs.sql_message_at, mid)
+                queries += 1
+                if position >= upper:
+                    upper = mid - 1
+                elif time >= target:
+                    hi = upper = position
+                else:
+                    lo = position
+
+            found = await con.fetchval(Procs.sql_first_since, lo, upper, moment)
+            queries += 1
+
+        self.logger.debug('found %s in %d queries', when, queries)
+        return hi if found is None else found
+
+    def save(self) -> None:
+        if not self.path or not self._dirty:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as fh:
+            fh.write(orjson.dumps(list(zip(self._positions, self._times))))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+        self._dirty = False
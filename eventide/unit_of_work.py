@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from logging import getLogger
+from typing import List, Optional
+
+from eventide.message import Message, SerializedMessage
+from eventide.messagedb import Procs, MessageDB
+
+__all__ = [
+    'UnitOfWork',
+]
+
+
+class UnitOfWork:
+    """Stages writes to any number of streams and commits them atomically.
+
+    Every staged message may carry its own ``expected_version``. ``commit`` sends
+    all of them to the database as arrays in a single statement, which calls
+    ``write_message`` once per message in the order they were added. The
+    transaction first takes the lock of every category involved, in a fixed
+    order, so units of work touching the same categories in a different order
+    do not deadlock. Either every message is written or none is. A version
+    conflict raises ``ExpectedVersionError`` naming the stream, the expected
+    version and the actual version.
+
+    Can be used as an async context manager, which commits on a clean exit:
+
+        async with UnitOfWork(db) as uow:
+            uow.add('account-123', Withdrawn(amount=10), expected_version=4)
+            uow.add('account-456', Deposited(amount=10))
+    """
+
+    def __init__(self, db: MessageDB):
+        self.db = db
+        self.positions: Optional[List[int]] = None
+        self._staged: List[SerializedMessage] = []
+        self.logger = getLogger('eventide.UnitOfWork')
+
+    def __repr__(self) -> str:
+        return 'UnitOfWork(staged=%d, committed=%s)' % (len(self), self.committed)
+
+    def __len__(self) -> int:
+        return len(self._staged)
+
+    async def __aenter__(self) -> 'UnitOfWork':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None and not self.committed:
+            await self.commit()
+
+    @property
+    def committed(self) -> bool:
+        return self.positions is not None
+
+    def add(
+        self,
+        stream_name: str,
+        message: Message,
+        expected_version: Optional[int] = None,
+    ) -> 'UnitOfWork':
+        """Stage a message to be written to ``stream_name``."""
+        self._staged.append(message.serialize(stream_name, expected_version))
+        return self
+
+    def clear(self) -> None:
+        self._staged.clear()
+        self.positions = None
+
+    async def commit(self) -> List[int]:
+        """Write every staged message, returning their stream positions in the
+        order they were added."""
+        if not self._staged:
+            self.positions = []
+            return self.positions
+
+        columns = list(zip(*self._staged))
+        async with self.db.connection('unit_of_work') as con:
+            async with con.transaction():
+                await con.execute(Procs.sql_acquire_locks, list(columns[1]))
+                rows = await con.fetch(Procs.sql_write_messages, *columns)
+            if self.db.router is not None:
+                self.db.router.observe_write(await con.fetchval(Procs.sql_last_written))
+        self.db.forget_stream_versions(columns[1])
+
+        positions = [0] * len(rows)
+        for row in rows:
+            positions[row[0] - 1] = row[1]
+        self.positions = positions
+        self.logger.debug('committed %d messages', len(positions))
+        return positions
@@ -0,0 +1,142 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from dataclasses import replace
+from typing import (
+    Any,
+    Dict,
+    Tuple,
+    Callable,
+    Optional,
+)
+
+from eventide._types import JSON
+from eventide.errors import EventideError
+
+__all__ = [
+    'UpcastError',
+    'UpcasterRegistry',
+    'upcasters',
+]
+
+Upcaster = Callable[[JSON], JSON]
+Version = Optional[str]
+
+
+class UpcastError(EventideError):
+    """Raised when upcasters are registered inconsistently."""
+
+
+def _compose(steps: Tuple[Upcaster, ...]) -> Upcaster:
+    if len(steps) == 1:
+        return steps[0]
+
+    def chain(data: JSON) -> JSON:
+        for step in steps:
+            data = step(data)
+        return data
+
+    return chain
+
+
+class UpcasterRegistry:
+    """Maps ``(type, from_version)`` to a transform that turns the ``data`` of an
+    old message into the shape of the next schema version.
+
+    The first time a ``(type, version)`` pair is seen the registry walks the steps
+    to the newest known version, composes them into a single function and caches
+    it, so every later message of that pair is upcast with one call. Messages of
+    types without upcasters, or already at the newest version, are returned as-is.
+
+    A ``from_version`` of None upcasts messages that were written without any
+    ``schema_version`` in their metadata.
+    """
+
+    def __init__(self):
+        self._steps: Dict[str, Dict[Version, Tuple[Upcaster, str]]] = {}
+        self._chains: Dict[Tuple[str, Version], Tuple[Optional[Upcaster], Version]] = {}
+
+    def __repr__(self) -> str:
+        return 'UpcasterRegistry(types=%d)' % len(self._steps)
+
+    def __contains__(self, type_: str) -> bool:
+        return type_ in self._steps
+
+    def register(
+        self,
+        type_: str,
+        from_version: Version,
+        to_version: str,
+        fn: Upcaster,
+    ) -> None:
+        steps = self._steps.setdefault(type_, {})
+        if from_version in steps:
+            raise UpcastError(
+                'upcaster for `%s` from version `%s` already registered' %
+                (type_, from_version)
+            )
+        if from_version == to_version:
+            raise UpcastError('upcaster for `%s` must change the version' % type_)
+        steps[from_version] = (fn, to_version)
+        # any cached chain of this type may now be shorter than it should be
+        self._chains = {k: v for k, v in self._chains.items() if k[0] != type_}
+
+    def upcaster(
+        self,
+        type_: str,
+        from_version: Version,
+        to_version: str,
+    ) -> Callable[[Upcaster], Upcaster]:
+        """Decorator form of ``register``."""
+
+        def wrap(fn: Upcaster) -> Upcaster:
+            self.register(type_, from_version, to_version, fn)
+            return fn
+
+        return wrap
+
+    def _chain(self, type_: str, version: Version) -> Tuple[Optional[Upcaster], Version]:
+        key = (type_, version)
+        if key not in self._chains:
+            steps, chain, seen = self._steps[type_], [], {version}
+            while version in steps:
+                fn, version = steps[version]
+                if version in seen:
+                    raise UpcastError('upcasters for `%s` contain a cycle' % type_)
+                seen.add(version)
+                chain.append(fn)
+            self._chains[key] = (_compose(tuple(chain)) if chain else None, version)
+        return self._chains[key]
+
+    def upcast_data(self, type_: str, version: Version, data: JSON) -> Tuple[Version, JSON]:
+        """Returns the newest ``(version, data)`` for a message's payload."""
+        if type_ not in self._steps:
+            return version, data
+        fn, target = self._chain(type_, version)
+        if fn is None:
+            return version, data
+        return target, fn(data)
+
+    def upcast(self, message: Any) -> Any:
+        """Returns a copy of a MessageData instance upgraded to the newest schema
+        version, or the same instance when there is nothing to do."""
+        if message.type not in self._steps:
+            return message
+        version = message.metadata.get('schema_version')
+        target, data = self.upcast_data(message.type, version, message.data)
+        if target == version:
+            return message
+        return replace(
+            message,
+            data=data,
+            metadata=dict(message.metadata, schema_version=target),
+        )
+
+
+# default registry consulted by Message.from_messagedata
+upcasters = UpcasterRegistry()
@@ -6,9 +6,11 @@
 #   LiveViewTech
 # <<
 
+from datetime import datetime, timezone
 from typing import (
     Any,
     Dict,
+    Union,
     Callable,
     Optional, Tuple,
 )
@@ -19,6 +21,8 @@ __all__ = [
     'jdumps',
     'jloads',
     'dense_dict',
+    'utc_datetime',
+    'utc_timestamp',
 ]
 
 # yapf: disable
@@ -39,6 +43,21 @@ def jloads(value: str) -> Dict:
     return orjson.loads(value)
 
 
+def utc_datetime(value: Union[float, datetime]) -> datetime:
+    """A naive UTC datetime, as stored in the message store's ``time`` column,
+    from an epoch timestamp or a datetime (naive ones are taken to be UTC)."""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    return datetime.utcfromtimestamp(value)
+
+
+def utc_timestamp(value: datetime) -> float:
+    """The epoch timestamp of a naive UTC datetime read from the message store."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
 def dense_dict(dictionary: Dict, removables: Tuple = (None,)) -> Dict:
     """Return a dictionary ignoring keys with None values, recursively."""
     return {
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+from uuid import uuid4
+from typing import Dict, Optional
+from contextlib import asynccontextmanager
+
+import pytest
+
+from eventide.utils import jdumps
+from eventide.messagedb import Procs, MessageDB
+
+# tests that need a message store run against this database and are skipped when
+#  it is not set, e.g. postgresql://message_store@localhost/message_store
+TEST_DSN = os.environ.get('EVENTIDE_TEST_DSN')
+
+
+@pytest.fixture
+def dsn() -> str:
+    if not TEST_DSN:
+        pytest.skip('EVENTIDE_TEST_DSN is not set')
+    return TEST_DSN
+
+
+@pytest.fixture
+def message_db(dsn):
+    """Returns a factory for connected MessageDB instances, which are shut down
+    when the ``async with`` block exits."""
+
+    @asynccontextmanager
+    async def connect(**kwargs):
+        db = MessageDB({'dsn': dsn, 'min_size': 1, 'max_size': 4}, **kwargs)
+        await db.setup()
+        try:
+            yield db
+        finally:
+            await db.shutdown()
+
+    return connect
+
+
+@pytest.fixture
+def category() -> str:
+    """A category name no other test writes to."""
+    return 'test' + uuid4().hex[:12]
+
+
+@pytest.fixture
+def other_category() -> str:
+    return 'test' + uuid4().hex[:12]
+
+
+@pytest.fixture
+def write():
+    """Returns a coroutine function writing one raw message, which returns its
+    stream position."""
+
+    async def write_message(
+        db: MessageDB,
+        stream_name: str,
+        type_: str = 'Tested',
+        data: Optional[Dict] = None,
+        metadata: Optional[Dict] = None,
+        expected_version: Optional[int] = None,
+    ) -> int:
+        async with db.connection('test-write') as con:
+            return await con.fetchval(
+                Procs.write_message,
+                str(uuid4()),
+                stream_name,
+                type_,
+                jdumps(data or {}),
+                jdumps(metadata or {}),
+                expected_version,
+            )
+
+    return write_message
@@ -0,0 +1,133 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+import pytest
+
+from eventide import batch as batch_module
+from eventide.utils import jdumps
+from eventide.batch import MessageBatch
+from eventide.compression import compress_data
+
+T0 = datetime(2020, 10, 1, 12, 0, 0)
+
+
+def record(n, stream_name='account-1', type_='Deposited', data=None, metadata=None):
+    return {
+        'id': str(uuid4()),
+        'stream_name': stream_name,
+        'type': type_,
+        'position': n,
+        'global_position': 100 + n,
+        'data': jdumps(data if data is not None else {'n': n}),
+        'metadata': jdumps(metadata) if metadata is not None else None,
+        'time': T0 + timedelta(seconds=n),
+    }
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def columns(request, monkeypatch):
+    if request.param == 'numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(batch_module, 'np', None)
+    return request.param
+
+
+def test_from_records_columns():
+    batch = MessageBatch.from_records([
+        record(0, 'account-1'),
+        record(1, 'account-2', 'Withdrawn'),
+        record(2, 'account-1'),
+    ])
+    assert len(batch) == 3
+    assert list(batch.positions) == [0, 1, 2]
+    assert list(batch.global_positions) == [100, 101, 102]
+    assert batch.times[1] - batch.times[0] == 1.0
+    # repeated values share one object
+    assert batch.stream_names[0] is batch.stream_names[2]
+    assert batch.types[0] is batch.types[2]
+    assert 'global_positions=100..102' in repr(batch)
+
+
+def test_lazy_decoding():
+    batch = MessageBatch.from_records([
+        record(0),
+        record(1, metadata={'schema_version': '2'}),
+    ])
+    assert batch._data == {}
+    assert batch.data(1) == {'n': 1}
+    assert list(batch._data) == [1]
+    assert batch.metadata(0) == {}
+    assert batch.metadata_column() == [{}, {'schema_version': '2'}]
+
+
+def test_compressed_data():
+    payload = {'text': 'x' * 1024}
+    rec = record(0, data={})
+    rec['data'] = compress_data(jdumps(payload), 'zlib')
+    rec['metadata'] = jdumps({'compression': 'zlib'})
+    assert MessageBatch.from_records([rec]).data(0) == payload
+
+
+def test_rows():
+    batch = MessageBatch.from_records([record(n) for n in range(3)])
+    last = batch[-1]
+    assert last.global_position == 102
+    assert last.data == {'n': 2}
+    assert last.category == 'account'
+    assert [msg.position for msg in batch] == [0, 1, 2]
+
+
+def test_filters(columns):
+    batch = MessageBatch.from_records([
+        record(n, type_='Deposited' if n % 2 else 'Withdrawn') for n in range(6)
+    ])
+    batch.data(4)
+    assert list(batch.filter_types('Deposited').positions) == [1, 3, 5]
+    assert list(batch.filter_position(102, 104).global_positions) == [102, 103]
+    assert list(batch.filter_position(4, global_=False).positions) == [4, 5]
+    assert list(batch.filter_time(batch.times[2], batch.times[4]).positions) == [2, 3]
+    # decoded values are carried over
+    assert batch.filter_position(start=104)._data == {0: {'n': 4}}
+    assert len(batch.filter_types('Missing')) == 0
+    assert repr(batch.filter_types('Missing')) == 'MessageBatch(size=0)'
+
+
+def test_numpy_column():
+    np = pytest.importorskip('numpy')
+    batch = MessageBatch.from_records([record(n) for n in range(3)])
+    column = batch.column('global_positions')
+    assert isinstance(column, np.ndarray)
+    assert column.tolist() == [100, 101, 102]
+
+
+@pytest.mark.asyncio
+async def test_get_category_batches(message_db, category, other_category, write):
+    async with message_db() as db:
+        for n in range(7):
+            await write(db, '%s-%d' % (category, n % 3), data={'n': n})
+            await write(db, '%s-%d' % (other_category, n), data={'n': n})
+
+        pages = [page async for page in db.get_category_batches(category, batch_size=3)]
+        assert [len(page) for page in pages] == [3, 3, 1]
+        assert [msg.data['n'] for page in pages for msg in page] == list(range(7))
+        positions = [p for page in pages for p in page.global_positions]
+        assert positions == sorted(positions)
+
+        seen = 0
+        for member in range(2):
+            async for page in db.get_category_batches(
+                category, consumer_group_member=member, consumer_group_size=2
+            ):
+                seen += len(page)
+                assert {db.consumer_group_member(name, 2) for name in page.stream_names} \
+                    == {member}
+        assert seen == 7
@@ -0,0 +1,49 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import orjson
+import pytest
+
+from eventide.bench import BenchMessage, run, parse_args, percentile
+
+
+def test_percentile():
+    ordered = [float(n) for n in range(1, 101)]
+    assert percentile(ordered, 50.0) == 50.0
+    assert percentile(ordered, 99.9) == 100.0
+    assert percentile([], 50.0) == 0.0
+
+
+def test_bench_message_serialize():
+    first, second = BenchMessage(payload='xx'), BenchMessage(payload='xx')
+    serialized = first.serialize('bench-1', 4)
+    assert serialized.id == str(first.id) != str(second.id)
+    assert serialized.type == 'BenchMessage'
+    assert orjson.loads(serialized.data) == {'payload': 'xx'}
+    assert serialized.expected_version == 4
+    assert orjson.loads(serialized.metadata) == {}
+
+    # the library's own path, Metadata model and all
+    first.metadata.correlation_stream_name = 'bench'
+    assert orjson.loads(first.serialize('bench-1').metadata) == {
+        'correlation_stream_name': 'bench'
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('mode', ['write', 'queue', 'read'])
+async def test_run(dsn, category, mode):
+    args = parse_args([
+        '--dsn', dsn, '--mode', mode, '--category', category,
+        '--messages', '40', '--concurrency', '4', '--streams', '3', '--pool-size', '4',
+    ])
+    if mode == 'read':
+        await run(parse_args(['--dsn', dsn, '--category', category, '--messages', '40']))
+    report = await run(args)
+    assert report['count'] == 40
+    assert report['p50'] <= report['p99']
@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import gzip
+from uuid import uuid4
+from datetime import datetime
+
+import orjson
+import pytest
+
+from eventide.utils import utc_timestamp
+from eventide.message import SerializedMessage
+from eventide.messagedb import ExpectedVersionError
+from eventide.bulk import BulkLoader, BulkMessage, parse_time, read_ndjson
+from eventide.export import CategoryExporter
+
+T0 = datetime(2020, 10, 1, 12, 30, 15, 120000)
+
+
+def message(stream_name, n, expected_version=None, time=None):
+    return BulkMessage(
+        str(uuid4()), stream_name, 'Loaded', '{"n": %d}' % n, None, expected_version, time
+    )
+
+
+def test_parse_time():
+    assert parse_time('2020-10-01T12:30:15.12') == T0
+    assert parse_time('2020-10-01T12:30:15') == T0.replace(microsecond=0)
+    assert parse_time('2020-10-01T12:30:15.123456') == T0.replace(microsecond=123456)
+
+
+def test_read_ndjson(tmp_path):
+    path = tmp_path / 'rows.ndjson.gz'
+    rows = [
+        {'id': str(uuid4()), 'stream_name': 'a-1', 'type': 'T', 'data': {'n': 1},
+         'metadata': None, 'time': '2020-10-01T12:30:15.12'},
+        {'id': str(uuid4()), 'stream_name': 'a-1', 'type': 'T', 'data': {'n': 2},
+         'metadata': {'k': 'v'}},
+    ]
+    with gzip.open(path, 'wb') as fh:
+        fh.write(b'\n'.join(orjson.dumps(row) for row in rows) + b'\n\n')
+    first, second = read_ndjson(path)
+    assert first.time == T0 and first.metadata is None
+    assert orjson.loads(first.data) == {'n': 1}
+    assert second.time is None and orjson.loads(second.metadata) == {'k': 'v'}
+
+
+@pytest.mark.asyncio
+async def test_load(message_db, category, write):
+    stream = category + '-1'
+    async with message_db() as db:
+        await write(db, stream)
+        loader = BulkLoader(db, batch_size=2)
+        loaded = await loader.load([
+            message(stream, 0, expected_version=0, time=T0),
+            message(stream, 1),
+            SerializedMessage(str(uuid4()), category + '-2', 'Loaded', '{}', None, None),
+        ])
+        assert loaded == 3
+        messages = [msg async for msg in db.get_category_messages(category)]
+        assert [(m.stream_name, m.position) for m in messages] == [
+            (stream, 0), (stream, 1), (stream, 2), (category + '-2', 0)
+        ]
+        assert messages[1].time == utc_timestamp(T0)
+        assert abs(messages[2].time - messages[0].time) < 60
+
+
+@pytest.mark.asyncio
+async def test_load_expected_version(message_db, category):
+    stream = category + '-1'
+    async with message_db() as db:
+        loader = BulkLoader(db)
+        with pytest.raises(ExpectedVersionError) as exc:
+            await loader.load([message(stream, 0), message(stream, 1, expected_version=5)])
+        assert exc.value.expected == 5 and exc.value.actual == 0
+        # nothing from the failed batch was written
+        assert await db.get_stream_version(stream) is None
+
+        unchecked = BulkLoader(db, check_versions=False)
+        assert await unchecked.load([message(stream, 0, expected_version=5)]) == 1
+
+
+@pytest.mark.asyncio
+async def test_load_exported_ndjson(
+    message_db, category, other_category, write, tmp_path
+):
+    async with message_db() as db:
+        for n in range(4):
+            await write(db, '%s-%d' % (category, n % 2), data={'n': n})
+        exported = tmp_path / 'export.ndjson.gz'
+        await CategoryExporter(db, exported, category).export()
+
+        # load a copy of the export into another category
+        copy = tmp_path / 'copy.ndjson.gz'
+        with gzip.open(exported, 'rb') as src, gzip.open(copy, 'wb') as dst:
+            for line in src:
+                row = orjson.loads(line)
+                row['id'] = str(uuid4())
+                row['stream_name'] = row['stream_name'].replace(category, other_category)
+                dst.write(orjson.dumps(row) + b'\n')
+        assert await BulkLoader(db).load_ndjson(copy) == 4
+
+        original = [msg async for msg in db.get_category_messages(category)]
+        loaded = [msg async for msg in db.get_category_messages(other_category)]
+        assert [m.data for m in loaded] == [m.data for m in original]
+        assert [m.time for m in loaded] == [m.time for m in original]
+        assert [m.position for m in loaded] == [m.position for m in original]
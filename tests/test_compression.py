@@ -0,0 +1,122 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import UUID, uuid4
+from dataclasses import field, dataclass
+from typing import Dict
+
+import orjson
+import pytest
+
+from eventide.message import Message, MessageData
+from eventide.compression import (
+    CODECS,
+    ENVELOPE_KEY,
+    CompressionError,
+    compress_data,
+    is_compressed,
+    decompress_data,
+    default_compression,
+    set_default_compression,
+)
+
+
+@dataclass
+class Report(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+    body: str = ''
+
+    __compression__ = 'zlib'
+    __compression_threshold__ = 256
+
+
+@dataclass
+class Note(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+    body: str = ''
+
+
+@pytest.fixture
+def no_default():
+    yield
+    set_default_compression(None)
+
+
+@pytest.mark.parametrize('codec', sorted(CODECS))
+def test_round_trip(codec):
+    data = orjson.dumps({'body': 'x' * 4096}).decode()
+    envelope = orjson.loads(compress_data(data, codec))
+    assert is_compressed(envelope)
+    assert len(envelope[ENVELOPE_KEY]) < len(data)
+    assert decompress_data(envelope, codec) == {'body': 'x' * 4096}
+    # data that is not an envelope is returned as-is
+    assert decompress_data({'body': 'x'}, codec) == {'body': 'x'}
+
+
+def test_unknown_codec(no_default):
+    with pytest.raises(CompressionError):
+        compress_data('{}', 'brotli')
+    with pytest.raises(CompressionError):
+        set_default_compression('brotli')
+    assert default_compression() == (None, 0)
+
+
+def test_serialize_threshold():
+    small = Report(body='x').serialize('report-1')
+    assert orjson.loads(small.data) == {'body': 'x'}
+    assert 'compression' not in orjson.loads(small.metadata)
+
+    large = Report(body='x' * 1024).serialize('report-1')
+    assert orjson.loads(large.metadata) == {'compression': 'zlib'}
+    assert is_compressed(orjson.loads(large.data))
+
+    # 113 characters, but over 300 bytes of UTF-8
+    wide = Report(body='\u20ac' * 100).serialize('report-1')
+    assert orjson.loads(wide.metadata) == {'compression': 'zlib'}
+
+
+def test_default_compression(no_default):
+    assert Note(body='x' * 1024).serialize('note-1').metadata == '{}'
+    set_default_compression('zlib', threshold=100)
+    assert default_compression() == ('zlib', 100)
+    assert Note(body='x' * 10).serialize('note-1').metadata == '{}'
+    assert orjson.loads(Note(body='x' * 1024).serialize('note-1').metadata) == {
+        'compression': 'zlib'
+    }
+
+
+def test_transparent_reads():
+    msg = Report(body='y' * 1024)
+    serialized = msg.serialize('report-1')
+    data = MessageData.from_record({
+        'id': msg.id,
+        'stream_name': 'report-1',
+        'type': 'Report',
+        'position': 0,
+        'global_position': 1,
+        'data': serialized.data,
+        'metadata': serialized.metadata,
+    })
+    assert data.data == {'body': 'y' * 1024}
+    assert Report.from_messagedata(data).body == 'y' * 1024
+
+
+@pytest.mark.asyncio
+async def test_written_compressed(message_db, category):
+    stream = category + '-1'
+    async with message_db() as db:
+        await db.write_message(stream, Report(body='z' * 2048))
+        async with db.connection() as con:
+            stored = await con.fetchval(
+                'SELECT data::varchar FROM messages WHERE stream_name = $1', stream
+            )
+        assert is_compressed(orjson.loads(stored))
+        read = [msg async for msg in db.get_stream_messages(stream)]
+        assert read[0].data == {'body': 'z' * 2048}
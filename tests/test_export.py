@@ -0,0 +1,60 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import gzip
+
+import orjson
+import pytest
+
+from eventide.messagedb import Procs
+from eventide.export import ExportError, CategoryExporter
+
+
+def read_ndjson(path, compress=True):
+    with (gzip.open(path, 'rb') if compress else open(path, 'rb')) as fh:
+        return [orjson.loads(line) for line in fh.read().splitlines()]
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ExportError):
+        CategoryExporter(None, tmp_path / 'out', fmt='csv')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('compress', [True, False])
+async def test_export_ndjson_resumes(
+    message_db, category, other_category, write, tmp_path, compress
+):
+    path = tmp_path / 'export.ndjson'
+    async with message_db() as db:
+        async with db.connection() as con:
+            start = (await con.fetchval(Procs.sql_head_position) or 0) + 1
+        for n in range(5):
+            await write(db, '%s-%d' % (category, n % 2), data={'n': n})
+            await write(db, '%s-1' % other_category, data={'n': n})
+
+        exporter = CategoryExporter(db, path, category, compress=compress, chunk_size=3)
+        assert await exporter.export(start) > 1
+        rows = read_ndjson(path, compress)
+        assert [row['data']['n'] for row in rows] == [0, 1, 2, 3, 4]
+        assert {row['stream_name'] for row in rows} == {category + '-0', category + '-1'}
+        saved = exporter.checkpoint.load()
+        assert saved['offset'] == path.stat().st_size
+
+        # a crashed window left a partial write behind, the resumed export drops it
+        with open(path, 'ab') as fh:
+            fh.write(b'\x1f\x8b torn window')
+        for n in range(5, 8):
+            await write(db, '%s-0' % category, data={'n': n})
+
+        resumed = CategoryExporter(db, path, category, compress=compress, chunk_size=3)
+        assert await resumed.export(start) >= 1
+        rows = read_ndjson(path, compress)
+        assert [row['data']['n'] for row in rows] == list(range(8))
+        positions = [row['global_position'] for row in rows]
+        assert positions == sorted(set(positions))
@@ -0,0 +1,106 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from eventide.utils import utc_timestamp
+from eventide.filters import FilterError, Where
+from eventide.messagedb import compile_select
+
+T0 = datetime(2020, 10, 1, 12, 0, 0)
+
+
+def test_chaining():
+    base = Where()
+    assert not base
+    where = base.types('Opened', ['Closed']).since(T0).metadata('source', 'api')
+    assert not base and where
+    conditions, args = where.compile()
+    assert len(conditions) == 3
+    assert args == [['Opened', 'Closed'], T0, '{"source":"api"}']
+    assert repr(where) == (
+        'Where(type = ANY(?::varchar[]) AND time >= ? AND metadata @> ?::jsonb)'
+    )
+    with pytest.raises(FilterError):
+        Where().types()
+
+
+def test_times_are_utc():
+    aware = T0.replace(tzinfo=timezone(timedelta(hours=-6)))
+    # aware times are converted, naive ones and timestamps are taken as UTC
+    assert Where().since(aware).args == (T0 + timedelta(hours=6),)
+    assert Where().until(T0).args == (T0,)
+    assert Where().since(utc_timestamp(T0)).args == (T0,)
+    assert Where().between(None, T0).compile() == Where().until(T0).compile()
+    assert len(Where().between(T0, T0).conditions) == 2
+
+
+def test_compile_select():
+    template = 'SELECT * FROM messages WHERE stream_name = $1 %s LIMIT $3;'
+    assert compile_select(template) == (
+        'SELECT * FROM messages WHERE stream_name = $1  LIMIT $3;'
+    )
+
+    conditions, _ = Where().types('Opened').metadata('source', 'api').compile()
+    query = compile_select(template, conditions, "type <> 'Closed'")
+    assert query == (
+        'SELECT * FROM messages WHERE stream_name = $1 '
+        'AND type = ANY($4::varchar[]) AND metadata @> $5::jsonb '
+        "AND (type <> 'Closed') LIMIT $3;"
+    )
+    # compiled once per shape
+    other, _ = Where().types('Closed').metadata('source', 'cli').compile()
+    assert compile_select(template, other, "type <> 'Closed'") is query
+
+
+@pytest.mark.asyncio
+async def test_filtered_reads(message_db, category, other_category, write):
+    async with message_db() as db:
+        async with db.connection() as con:
+            start = await con.fetchval("SELECT now() AT TIME ZONE 'utc';")
+        correlated = {'correlationStreamName': other_category + '-1'}
+        await write(db, category + '-1', 'Opened', metadata={'source': 'api'})
+        await write(db, category + '-1', 'Closed', metadata={'source': 'api', **correlated})
+        await write(db, category + '-2', 'Opened', metadata={'source': 1})
+        # this library writes the correlation snake_case, other clients camelCase
+        snake = {'correlation_stream_name': other_category + '-1'}
+        await write(db, category + '-2', 'Opened', metadata=snake)
+
+        async def types(where, stream=None, **kwargs):
+            if stream:
+                read = db.get_stream_messages(stream, where=where, **kwargs)
+            else:
+                read = db.get_category_messages(category, where=where, **kwargs)
+            return [(msg.stream_name, msg.type) async for msg in read]
+
+        assert await types(Where().types('Closed')) == [(category + '-1', 'Closed')]
+        # metadata values match on their JSON type as well
+        assert len(await types(Where().metadata('source', 'api'))) == 2
+        assert await types(Where().metadata('source', '1')) == []
+        assert await types(Where().metadata('source', 1)) == [(category + '-2', 'Opened')]
+        assert len(await types(Where().correlation(other_category))) == 2
+        assert await types(None, correlation=other_category) == await types(
+            Where().correlation(other_category)
+        )
+        batches = db.get_category_batches(category, correlation=other_category)
+        assert [len(batch) async for batch in batches] == [2]
+        assert len(await types(Where().since(start))) == 4
+        assert await types(Where().until(start)) == []
+        assert await types(Where().types('Opened'), category + '-2') == [
+            (category + '-2', 'Opened')
+        ] * 2
+        assert await types(
+            Where().types('Opened'), category + '-2', sql_condition="metadata ? 'source'"
+        ) == [(category + '-2', 'Opened')]
+
+        headers = db.get_category_headers(category, where=Where().types('Closed'))
+        assert [h.type async for h in headers] == ['Closed']
+        batches = db.get_category_batches(category, where=Where().types('Opened'))
+        assert [len(batch) async for batch in batches] == [3]
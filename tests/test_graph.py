@@ -0,0 +1,112 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from types import SimpleNamespace
+
+from eventide.graph import CausationIndex
+
+COUNTER = iter(range(1, 1000))
+
+
+def message(stream_name, position, caused_by=None, correlation=None, camel=False):
+    metadata = {}
+    if caused_by:
+        stream, pos = caused_by.rsplit('/', 1)
+        if camel:
+            metadata['causationMessageStreamName'] = stream
+            metadata['causationMessagePosition'] = int(pos)
+        else:
+            metadata['causation_message_stream_name'] = stream
+            metadata['causation_message_position'] = int(pos)
+    if correlation:
+        key = 'correlationStreamName' if camel else 'correlation_stream_name'
+        metadata[key] = correlation
+    return SimpleNamespace(
+        stream_name=stream_name,
+        position=position,
+        global_position=next(COUNTER),
+        type='Tested',
+        metadata=metadata,
+    )
+
+
+def workflow():
+    #   order-1/0 -> payment:command-1/0 -> payment-1/0 -> order-1/1
+    #             \-> shipping:command-1/0
+    return [
+        message('order-1', 0, correlation='order-1'),
+        message('payment:command-1', 0, 'order-1/0', 'order-1'),
+        message('shipping:command-1', 0, 'order-1/0', 'order-1', camel=True),
+        message('payment-1', 0, 'payment:command-1/0', 'order-1'),
+        message('order-1', 1, 'payment-1/0', 'order-1', camel=True),
+        message('order-2', 0),
+    ]
+
+
+def identifiers(nodes):
+    return [node.identifier for node in nodes]
+
+
+def test_walks():
+    index = CausationIndex()
+    messages = workflow()
+    index.observe_all(messages)
+    index.observe(messages[0])
+    assert len(index) == 6 and 'order-2/0' in index
+    assert index.position == messages[-1].global_position + 1
+
+    assert identifiers(index.chain('order-1/1')) == [
+        'order-1/0', 'payment:command-1/0', 'payment-1/0', 'order-1/1'
+    ]
+    assert identifiers(index.children('order-1/0')) == [
+        'payment:command-1/0', 'shipping:command-1/0'
+    ]
+    assert identifiers(index.descendants('order-1/0')) == [
+        'payment:command-1/0', 'shipping:command-1/0', 'payment-1/0', 'order-1/1'
+    ]
+    assert identifiers(index.workflow('payment-1/0')) == identifiers(
+        index.chain('order-1/0') + index.descendants('order-1/0')
+    )
+    assert identifiers(index.correlated('order-1')) == [
+        '%s/%d' % (m.stream_name, m.position) for m in messages[:5]
+    ]
+    assert index.chain('missing-1/0') == index.workflow('missing-1/0') == []
+    assert index.node('order-2/0').causation is None
+
+
+def test_cycle_terminates():
+    index = CausationIndex()
+    index.observe(message('a-1', 0, 'b-1/0'))
+    index.observe(message('b-1', 0, 'a-1/0'))
+    assert identifiers(index.chain('a-1/0')) == ['b-1/0', 'a-1/0']
+    assert identifiers(index.descendants('a-1/0')) == ['b-1/0']
+
+
+def test_persistence(tmp_path, caplog):
+    path = tmp_path / 'causation.jsonl'
+    index = CausationIndex(path)
+    messages = workflow()
+    index.observe_all(messages[:4])
+    index.close()
+
+    index = CausationIndex(path)
+    assert len(index) == 4
+    assert index.position == messages[3].global_position + 1
+    index.observe_all(messages)
+    index.close()
+    assert len(path.read_bytes().splitlines()) == 6
+
+    # a torn last line is cut off, corrupt lines in the middle are skipped
+    lines = path.read_bytes().splitlines(keepends=True)
+    path.write_bytes(lines[0] + b'not json\n' + b''.join(lines[1:]) + lines[0][:10])
+    index = CausationIndex(path)
+    assert identifiers(index.chain('order-1/1'))[0] == 'order-1/0'
+    assert len(index) == 6
+    assert 'corrupt line' in caplog.text and 'torn line' in caplog.text
+    index.close()
+    assert path.read_bytes().endswith(b'\n')
@@ -0,0 +1,80 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import pytest
+
+from eventide.messagedb import MessageDBError
+
+
+def envelope(msg):
+    return (
+        str(msg.id),
+        msg.type,
+        msg.stream_name,
+        msg.position,
+        msg.global_position,
+        msg.metadata,
+        msg.time,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stream_headers(message_db, category, write):
+    stream = category + '-1'
+    async with message_db() as db:
+        for n in range(5):
+            await write(db, stream, 'Opened' if n else 'Created', {'n': n}, {'n': n})
+        messages = [msg async for msg in db.get_stream_messages(stream)]
+        headers = [h async for h in db.get_stream_headers(stream)]
+        assert list(map(envelope, headers)) == list(map(envelope, messages))
+        assert headers[1].category == category
+        assert not hasattr(headers[0], 'data')
+
+        paged = [h.position async for h in db.get_stream_headers(stream, 1, 2)]
+        assert paged == [1, 2]
+        created = [
+            h.position
+            async for h in db.get_stream_headers(stream, sql_condition="type = 'Created'")
+        ]
+        assert created == [0]
+
+
+@pytest.mark.asyncio
+async def test_category_headers(message_db, category, other_category, write):
+    async with message_db() as db:
+        for n in range(6):
+            metadata = {'correlationStreamName': other_category + '-1'} if n % 2 else {}
+            await write(db, '%s-%d' % (category, n % 3), metadata=metadata)
+        messages = [msg async for msg in db.get_category_messages(category)]
+        headers = [h async for h in db.get_category_headers(category)]
+        assert list(map(envelope, headers)) == list(map(envelope, messages))
+
+        start = messages[2].global_position
+        paged = db.get_category_headers(category, start, 2)
+        assert [h.global_position async for h in paged] == [
+            m.global_position for m in messages[2:4]
+        ]
+
+        correlated = [
+            h.global_position
+            async for h in db.get_category_headers(category, correlation=other_category)
+        ]
+        assert correlated == [m.global_position for m in messages[1::2]]
+
+        # the same members as message-db's own consumer groups
+        for member in range(2):
+            kwargs = {'consumer_group_member': member, 'consumer_group_size': 2}
+            messages = db.get_category_messages(category, **kwargs)
+            headers = db.get_category_headers(category, **kwargs)
+            assert [h.global_position async for h in headers] == [
+                m.global_position async for m in messages
+            ]
+
+        with pytest.raises(MessageDBError):
+            async for _ in db.get_category_headers(category, consumer_group_member=0):
+                pass
@@ -0,0 +1,121 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+import logging
+from uuid import uuid4
+from datetime import datetime
+
+import pytest
+
+from eventide.hub import SubscriptionHub
+from eventide.batch import MessageBatch
+
+
+class FakeDB:
+    """Pages through an in-memory category, failing the first ``failures`` reads."""
+
+    def __init__(self, count: int, failures: int = 0):
+        self.records = []
+        self.failures = failures
+        self.reads = 0
+        self.extend(count)
+
+    def extend(self, count: int) -> None:
+        start = len(self.records) + 1
+        self.records.extend({
+            'id': str(uuid4()),
+            'stream_name': 'account-%d' % (n % 3),
+            'type': 'Deposited',
+            'position': n,
+            'global_position': n,
+            'data': '{"n": %d}' % n,
+            'metadata': None,
+            'time': datetime(2020, 10, 1),
+        } for n in range(start, start + count))
+
+    async def get_category_batches(self, category, position, batch_size):
+        self.reads += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('connection reset')
+        records = [r for r in self.records if r['global_position'] >= position]
+        for idx in range(0, len(records), batch_size):
+            yield MessageBatch.from_records(records[idx:idx + batch_size])
+
+
+async def collect(sub, count):
+    positions = []
+    async for batch in sub:
+        positions.extend(batch.global_positions)
+        if len(positions) >= count:
+            return positions
+
+
+@pytest.mark.asyncio
+async def test_fan_out():
+    db = FakeDB(10)
+    hub = SubscriptionHub(db, batch_size=4, poll_interval=0.01)
+    first, second = hub.subscribe('account'), hub.subscribe('account')
+    try:
+        seen = await asyncio.wait_for(
+            asyncio.gather(collect(first, 10), collect(second, 10)), 1
+        )
+        assert seen == [list(range(1, 11))] * 2
+        # attached subscribers were served by the hub's single reader
+        assert db.reads >= 1 and first.attached and second.attached
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_catches_up():
+    db = FakeDB(20)
+    hub = SubscriptionHub(db, batch_size=2, queue_size=1, poll_interval=0.01)
+    fast, slow = hub.subscribe('account'), hub.subscribe('account')
+    try:
+        assert await asyncio.wait_for(collect(fast, 20), 1) == list(range(1, 21))
+        assert not slow.attached
+        assert await asyncio.wait_for(collect(slow, 20), 1) == list(range(1, 21))
+
+        # caught up, it is attached again and keeps up with new messages
+        db.extend(3)
+        seen = await asyncio.wait_for(asyncio.gather(collect(fast, 3), collect(slow, 3)), 1)
+        assert seen == [[21, 22, 23]] * 2
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_read_failures_are_retried(caplog):
+    db = FakeDB(5, failures=3)
+    hub = SubscriptionHub(db, poll_interval=0.01, retry_interval=0.01)
+    sub = hub.subscribe('account')
+    try:
+        with caplog.at_level(logging.WARNING, 'eventide.SubscriptionHub'):
+            assert await asyncio.wait_for(collect(sub, 5), 1) == [1, 2, 3, 4, 5]
+        assert len([r for r in caplog.records if 'retrying' in r.getMessage()]) == 3
+    finally:
+        await hub.close()
+
+
+@pytest.mark.asyncio
+async def test_caught_up_subscriber_wakes_the_reader():
+    db = FakeDB(3)
+    hub = SubscriptionHub(db, poll_interval=0.01)
+    sub = hub.subscribe('account', position=10)
+    try:
+        # the hub is ahead of the subscriber, which has nothing left to read alone
+        sub.attached = False
+        hub._positions['account'] = 20
+        hub._wakeup['account'].clear()
+        assert await hub._read_alone(sub) is None
+        assert sub.attached
+        assert hub._wakeup['account'].is_set()
+    finally:
+        await hub.close()
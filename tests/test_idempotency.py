@@ -0,0 +1,110 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import logging
+from uuid import uuid4
+from types import SimpleNamespace
+
+import pytest
+
+from eventide.idempotency import BloomFilter, IdempotencyError, IdempotencyGuard
+
+
+def message(**metadata):
+    return SimpleNamespace(id=uuid4(), metadata=metadata)
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [str(uuid4()) for _ in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert len(bloom) == 1000
+    assert all(key in bloom for key in keys)
+    false_positives = sum(str(uuid4()) in bloom for _ in range(10_000))
+    assert false_positives < 300
+
+    copy = BloomFilter.from_bytes(bloom.to_bytes())
+    assert (copy.bits, copy.hashes, copy.count) == (bloom.bits, bloom.hashes, 1000)
+    assert all(key in copy for key in keys)
+
+    with pytest.raises(IdempotencyError):
+        BloomFilter.from_bytes(b'\x00' * 4)
+    with pytest.raises(IdempotencyError):
+        BloomFilter.from_bytes(bloom.to_bytes()[:-1])
+
+
+@pytest.mark.asyncio
+async def test_handle_once():
+    guard = IdempotencyGuard()
+    handled = []
+
+    async def handler(msg):
+        handled.append(msg)
+
+    guarded = guard.wrap(handler)
+    first, second = message(), message()
+    assert await guarded(first)
+    assert not await guarded(first)
+    assert await guard.handle(second, handled.append)
+    assert handled == [first, second]
+    assert (len(guard), guard.hits) == (2, 1)
+
+
+def test_keys():
+    with pytest.raises(IdempotencyError):
+        IdempotencyGuard(key='position')
+
+    guard = IdempotencyGuard(key='causation')
+    cause = {'causation_message_stream_name': 'account-1', 'causation_message_position': 3}
+    guard.mark(message(**cause))
+    # another message with the same cause is a redelivery of the same effect
+    assert guard.seen(message(**cause))
+    assert not guard.seen(message(**dict(cause, causation_message_position=4)))
+    with pytest.raises(IdempotencyError):
+        guard.seen(message())
+
+    guard = IdempotencyGuard(key=lambda msg: msg.metadata.get('key'))
+    guard.mark(message(key='a'))
+    assert guard.seen(message(key='a'))
+
+
+def test_persistence(tmp_path, caplog):
+    path = str(tmp_path / 'processed')
+    guard = IdempotencyGuard(path, capacity=100)
+    messages = [message() for _ in range(10)]
+    for msg in messages[:5]:
+        guard.mark(msg)
+    guard.close()
+
+    with caplog.at_level(logging.INFO, 'eventide.IdempotencyGuard'):
+        guard = IdempotencyGuard(path, capacity=100)
+    assert not caplog.records
+    assert all(guard.seen(msg) for msg in messages[:5])
+    assert not any(guard.seen(msg) for msg in messages[5:])
+
+    # a crash after more keys were stored, before the filter was saved again
+    for msg in messages[5:]:
+        guard.mark(msg)
+    guard._store.close()
+    with caplog.at_level(logging.INFO, 'eventide.IdempotencyGuard'):
+        guard = IdempotencyGuard(path, capacity=100)
+    assert 'rebuilding stale' in caplog.text
+    assert all(guard.seen(msg) for msg in messages)
+    guard.close()
+
+    # a corrupt filter is rebuilt from the exact store as well
+    with open(guard.bloom_path, 'r+b') as fh:
+        fh.truncate(10)
+    caplog.clear()
+    with caplog.at_level(logging.INFO, 'eventide.IdempotencyGuard'):
+        guard = IdempotencyGuard(path, capacity=100)
+    assert 'rebuilding' in caplog.text
+    assert len(guard) == 10
+    assert all(guard.seen(msg) for msg in messages)
+    guard.close()
@@ -0,0 +1,125 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import time
+import asyncio
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+import pytest
+
+from eventide.lag import LagMonitor
+from eventide.utils import utc_timestamp
+
+T0 = datetime(2020, 10, 1, 12, 0, 0)
+# the message store keeps naive UTC times
+TS0 = utc_timestamp(T0)
+
+
+class FakeDB:
+    """Answers head lookups for one category, counting the queries; every
+    ``stride`` global positions belongs to the category."""
+
+    def __init__(self, global_position: int, delay: float = 0.0, stride: int = 1):
+        self.row = {'global_position': global_position, 'time': T0}
+        self.delay = delay
+        self.stride = stride
+        self.queries = 0
+
+    @asynccontextmanager
+    async def connection(self, name):
+        yield self
+
+    async def fetchrow(self, query, category):
+        self.queries += 1
+        await asyncio.sleep(self.delay)
+        return self.row
+
+    async def fetchval(self, query, category, position, head):
+        return sum(1 for p in range(position, head + 1) if p % self.stride == 0)
+
+
+@pytest.mark.asyncio
+async def test_head_is_cached_and_shared():
+    db = FakeDB(50, delay=0.05)
+    monitor = LagMonitor(db, head_ttl=60)
+    heads = await asyncio.gather(*(monitor.head('account') for _ in range(5)))
+    assert db.queries == 1
+    assert {head.global_position for head in heads} == {50}
+    assert heads[0].time == TS0
+    await monitor.head('account')
+    assert db.queries == 1
+
+    monitor.head_ttl = 0
+    await monitor.head('account')
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_lag_and_metrics():
+    # the category has every other global position
+    monitor = LagMonitor(FakeDB(50, stride=2))
+    assert await monitor.lag('projector') is None
+
+    monitor.track('projector', 'account', 41, TS0 - 30)
+    lag = await monitor.lag('projector')
+    assert lag.positions_behind == 10
+    assert lag.messages_behind == 5
+    assert lag.head == 50
+    assert lag.seconds == 30.0
+
+    metrics = await monitor.metrics()
+    labels = '{consumer="projector",category="account"}'
+    assert metrics['eventide_consumer_lag_positions' + labels] == 10
+    assert metrics['eventide_consumer_lag_messages' + labels] == 5
+    assert metrics['eventide_consumer_lag_seconds' + labels] == 30.0
+    assert metrics['eventide_consumer_position' + labels] == 41
+
+    # caught up, no lag in either unit
+    monitor.track('projector', 'account', 51, TS0 - 30)
+    lag = await monitor.lag('projector')
+    assert (lag.positions_behind, lag.messages_behind, lag.seconds) == (0, 0, 0.0)
+
+    monitor.forget('projector')
+    assert await monitor.snapshot() == {}
+
+
+def test_throughput(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    monitor = LagMonitor(FakeDB(0), throughput_window=1.0, smoothing=0.5)
+    monitor.track('projector', 'account', 1)
+    now[0] += 2.0
+    monitor.track('projector', 'account', 11, count=10)
+    assert monitor._consumers['projector'].throughput == 2.5
+    now[0] += 1.0
+    monitor.track('projector', 'account', 16, count=5)
+    assert monitor._consumers['projector'].throughput == 3.75
+    # positions only move forward
+    monitor.track('projector', 'account', 3)
+    assert monitor._consumers['projector'].position == 16
+
+
+@pytest.mark.asyncio
+async def test_database_head(message_db, category, other_category, write):
+    async with message_db() as db:
+        monitor = LagMonitor(db, head_ttl=0)
+        assert (await monitor.head(category)).global_position == 0
+
+        for n in range(3):
+            await write(db, '%s-%d' % (category, n))
+            await write(db, '%s-%d' % (other_category, n))
+        messages = [msg async for msg in db.get_category_messages(category)]
+        monitor.observe('projector', messages[0])
+        lag = await monitor.lag('projector')
+        assert lag.head == messages[-1].global_position
+        first, last = messages[0], messages[-1]
+        assert lag.positions_behind == last.global_position - first.global_position
+        # other categories' messages in between are not counted
+        assert lag.messages_behind == 2
+        assert lag.seconds == pytest.approx(last.time - first.time)
@@ -0,0 +1,113 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from uuid import uuid4
+from datetime import datetime
+from contextlib import asynccontextmanager
+
+import pytest
+
+from eventide.batch import MessageBatch
+from eventide.merged import MergedReader
+from eventide.messagedb import Procs
+from eventide.checkpoint import FileCheckpoint
+
+
+class FakeDB:
+    """Plays back what every pass of a reader sees: the head of the store, and
+    the global positions each category had committed when it was read."""
+
+    def __init__(self, passes):
+        self.passes = list(passes)
+        self.current = None
+
+    @asynccontextmanager
+    async def read_connection(self, name, position=None):
+        self.current = self.passes.pop(0)
+        yield self
+
+    async def fetchval(self, query):
+        return self.current['head']
+
+    async def get_category_batches(self, category, position, batch_size):
+        positions = [p for p in self.current[category] if p >= position]
+        for idx in range(0, len(positions), batch_size):
+            yield MessageBatch.from_records([{
+                'id': str(uuid4()),
+                'stream_name': category + '-1',
+                'type': 'Tested',
+                'position': 0,
+                'global_position': p,
+                'data': '{}',
+                'metadata': None,
+                'time': datetime(2020, 10, 1),
+            } for p in positions[idx:idx + batch_size]])
+
+
+@pytest.mark.asyncio
+async def test_late_commit_is_not_skipped():
+    db = FakeDB([
+        # a@5 commits after `a` was read, but before `b` was
+        {'head': 4, 'a': [1, 3], 'b': [2, 4, 6]},
+        {'head': 6, 'a': [1, 3, 5], 'b': [2, 4, 6]},
+    ])
+    reader = MergedReader(db, ['a', 'b'], batch_size=2)
+    assert [msg.global_position async for msg in reader] == [1, 2, 3, 4]
+    assert reader.position == 5
+    assert [msg.global_position async for msg in reader] == [5, 6]
+    assert reader.position == 7
+
+
+@pytest.mark.asyncio
+async def test_order_and_checkpoint(message_db, category, other_category, write, tmp_path):
+    async with message_db() as db:
+        async with db.connection() as con:
+            start = await con.fetchval(Procs.sql_head_position) or 0
+        for n in range(6):
+            await write(db, '%s-1' % (category if n % 3 else other_category), data={'n': n})
+
+        checkpoint = FileCheckpoint(tmp_path / 'merged.json', start + 1)
+        categories = [category, other_category]
+        reader = MergedReader(
+            db, categories, batch_size=2, checkpoint=checkpoint, checkpoint_every=4
+        )
+        seen, positions = [], []
+        async for msg in reader:
+            seen.append(msg.data['n'])
+            positions.append(msg.global_position)
+            if len(seen) == 5:
+                # saved after the consumer was done with four messages
+                assert checkpoint.position == positions[3] + 1
+                break
+        assert seen == [0, 1, 2, 3, 4]
+
+        # the fifth message was handed out, but the consumer never came back
+        resumed = MergedReader(db, categories, checkpoint=checkpoint)
+        assert [msg.data['n'] async for msg in resumed] == [4, 5]
+        assert checkpoint.position == resumed.position
+
+
+@pytest.mark.asyncio
+async def test_follow(message_db, category, other_category, write):
+    async with message_db() as db:
+        await write(db, category + '-1')
+        async with db.connection() as con:
+            head = await con.fetchval(Procs.sql_head_position)
+        reader = MergedReader(
+            db, [category, other_category], position=head, follow=True, poll_interval=0.01
+        ).__aiter__()
+        assert (await reader.__anext__()).global_position == head
+
+        pending = asyncio.ensure_future(reader.__anext__())
+        await asyncio.sleep(0.05)
+        assert not pending.done()
+        await write(db, other_category + '-1')
+        msg = await asyncio.wait_for(pending, 1)
+        assert msg.stream_name == other_category + '-1'
+        await reader.aclose()
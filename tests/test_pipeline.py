@@ -0,0 +1,161 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from eventide.pipeline import Window, Pipeline, PipelineError
+
+
+class Event(NamedTuple):
+    key: str
+    time: float
+
+
+async def source(items, delay=0.0, produced=None):
+    for item in items:
+        if produced is not None:
+            produced.append(item)
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+def events(*times):
+    return [Event('ab'[idx % 2], t) for idx, t in enumerate(times)]
+
+
+def starts(windows):
+    return [(w.start, [e.time for e in w.items]) for w in windows]
+
+
+@pytest.mark.asyncio
+async def test_map_and_filter():
+    async def double(n):
+        await asyncio.sleep(0.01 * (n % 3))
+        return n * 2
+
+    pipeline = Pipeline(source(range(10)))
+    pipeline = pipeline.filter(lambda n: n % 2).map(double, concurrency=4)
+    assert repr(pipeline) == 'Pipeline(source -> filter -> map)'
+    assert await pipeline.collect() == [2, 6, 10, 14, 18]
+
+    with ThreadPoolExecutor(2) as executor:
+        squares = Pipeline(source(range(20))).map(lambda n: n * n, executor, concurrency=3)
+        assert await squares.collect() == [n * n for n in range(20)]
+
+
+@pytest.mark.asyncio
+async def test_batch():
+    batches = await Pipeline(source(range(7))).batch(3).collect()
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+    # a partial batch is let through once the timeout passes
+    slow = Pipeline(source(range(4), delay=0.05)).batch(10, timeout=0.08)
+    batches = await slow.collect()
+    assert sum(batches, []) == [0, 1, 2, 3]
+    assert 1 < len(batches) < 4
+
+
+@pytest.mark.asyncio
+async def test_tumbling_windows():
+    items = events(0.5, 3.0, 9.9, 10.0, 25.0)
+    windows = await Pipeline(source(items)).tumbling(10.0).collect()
+    assert all(isinstance(w, Window) and w.end == w.start + 10.0 for w in windows)
+    assert starts(windows) == [(0.0, [0.5, 3.0, 9.9]), (10.0, [10.0]), (20.0, [25.0])]
+
+
+@pytest.mark.asyncio
+async def test_sliding_windows():
+    items = events(1.0, 6.0, 12.0)
+    windows = await Pipeline(source(items)).sliding(10.0, 5.0).collect()
+    assert starts(windows) == [
+        (-5.0, [1.0]),
+        (0.0, [1.0, 6.0]),
+        (5.0, [6.0, 12.0]),
+        (10.0, [12.0]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_late_items():
+    # 3.0 arrives after the window it belongs to was emitted, 14.0 is still on time
+    items = events(1.0, 12.0, 3.0, 14.0)
+    windows = await Pipeline(source(items)).tumbling(10.0).collect()
+    assert starts(windows) == [(0.0, [1.0]), (10.0, [12.0, 14.0])]
+
+    # a window that was never opened is closed all the same once time passes its
+    #  end; 25.0 closes [10, 20) before 12.0 arrives
+    windows = await Pipeline(source(events(1.0, 25.0, 12.0))).tumbling(10.0).collect()
+    assert starts(windows) == [(0.0, [1.0]), (20.0, [25.0])]
+
+    # with sliding windows a late item still lands in the windows that are open
+    windows = await Pipeline(source(events(1.0, 16.0, 12.0))).sliding(10.0, 5.0).collect()
+    assert starts(windows) == [
+        (-5.0, [1.0]), (0.0, [1.0]), (10.0, [16.0, 12.0]), (15.0, [16.0])
+    ]
+
+
+@pytest.mark.asyncio
+async def test_group_by():
+    pipeline = Pipeline(source(events(1.0, 2.0, 3.0))).tumbling(10.0).group_by('key')
+    windows = await pipeline.collect()
+    assert windows[0].items == {
+        'a': [Event('a', 1.0), Event('a', 3.0)],
+        'b': [Event('b', 2.0)],
+    }
+
+    groups = await Pipeline(source(range(6))).batch(3).group_by(lambda n: n % 2).collect()
+    assert groups == [{0: [0, 2], 1: [1]}, {1: [3, 5], 0: [4]}]
+
+
+@pytest.mark.asyncio
+async def test_errors():
+    with pytest.raises(PipelineError):
+        Pipeline(source([])).tumbling(0)
+    with pytest.raises(PipelineError):
+        Pipeline(source([])).sliding(10.0, 0)
+
+    pipeline = Pipeline(source(range(3)))
+    await pipeline.collect()
+    with pytest.raises(PipelineError):
+        pipeline.__aiter__()
+
+    # a failing stage raises to whoever iterates the pipeline
+    with pytest.raises(ZeroDivisionError):
+        await Pipeline(source([1, 0])).map(lambda n: 1 / n).collect()
+
+
+@pytest.mark.asyncio
+async def test_backpressure():
+    produced = []
+    pipeline = Pipeline(source(range(1000), produced=produced), buffer_size=2).map(str)
+    count = 0
+    async for _ in pipeline:
+        count += 1
+        if count == 3:
+            break
+    # the source is only ever a few buffers ahead of the consumer
+    assert len(produced) < 10
+    assert await Pipeline(source(range(5))).run(lambda item: None) == 5
+
+
+@pytest.mark.asyncio
+async def test_database_sources(message_db, category, write):
+    async with message_db() as db:
+        for n in range(5):
+            await write(db, '%s-%d' % (category, n % 2), data={'n': n})
+
+        pipeline = Pipeline.from_category(db, category, batch_size=2)
+        assert await pipeline.map(lambda m: m.data['n']).collect() == [0, 1, 2, 3, 4]
+
+        pipeline = Pipeline.from_stream(db, category + '-0', position=1, batch_size=1)
+        assert await pipeline.map(lambda m: m.data['n']).collect() == [2, 4]
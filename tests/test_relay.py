@@ -0,0 +1,105 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import uuid4
+from contextlib import asynccontextmanager
+
+import pytest
+
+from eventide.relay import Relay
+from eventide.messagedb import Procs, MessageDB
+from eventide.checkpoint import FileCheckpoint
+
+SQL_MESSAGES = """
+    SELECT id, stream_name, type, position, data, metadata, time
+    FROM messages
+    WHERE category(stream_name) = $1
+    ORDER BY stream_name, position;
+"""
+
+
+def test_build_query():
+    relay = Relay(None, None)
+    assert relay._filters == []
+    assert 'category(' not in relay._query
+
+    relay = Relay(None, None, category='account', streams=['account-1'])
+    assert relay._filters == ['account', ['account-1']]
+    assert 'AND category(stream_name) = $3' in relay._query
+    assert 'AND stream_name = ANY($4::varchar[])' in relay._query
+    assert 'type = ANY' not in relay._query
+
+
+@pytest.fixture
+def target(dsn):
+    """Returns a factory for a MessageDB whose ``messages`` table is an empty copy,
+    in a schema of its own that is dropped when the ``async with`` block exits."""
+
+    @asynccontextmanager
+    async def connect(db: MessageDB):
+        schema = 'relay' + uuid4().hex[:12]
+        async with db.connection() as con:
+            await con.execute(
+                'CREATE SCHEMA %s; '
+                'CREATE TABLE %s.messages (LIKE public.messages INCLUDING ALL);'
+                % (schema, schema)
+            )
+        copy = MessageDB({
+            'dsn': dsn,
+            'min_size': 1,
+            'max_size': 2,
+            'server_settings': {'search_path': schema + ',public'},
+        })
+        await copy.setup()
+        try:
+            yield copy
+        finally:
+            await copy.shutdown()
+            async with db.connection() as con:
+                await con.execute('DROP SCHEMA %s CASCADE;' % schema)
+
+    return connect
+
+
+@pytest.mark.asyncio
+async def test_relay(message_db, target, category, write, tmp_path):
+    async with message_db() as source, target(source) as copy:
+        async with source.connection() as con:
+            start = (await con.fetchval(Procs.sql_head_position) or 0) + 1
+        for n in range(7):
+            type_ = 'Opened' if n % 3 else 'Closed'
+            await write(source, '%s-%d' % (category, n % 2), type_, data={'n': n})
+        await write(source, 'other%s-1' % category)
+
+        # versions the target cached before the relay wrote to it are dropped
+        await copy.get_stream_versions([category + '-0'], cache=True)
+        checkpoint = FileCheckpoint(tmp_path / 'relay.json', start)
+        relay = Relay(
+            source,
+            copy,
+            category=category,
+            types=['Opened'],
+            batch_size=2,
+            checkpoint=checkpoint,
+        )
+        assert await relay.run(until_caught_up=True) == 4
+
+        async with source.connection() as con:
+            expected = await con.fetch(SQL_MESSAGES, category)
+        async with copy.connection() as con:
+            copied = await con.fetch(SQL_MESSAGES, category)
+        # ids, stream positions, payloads and times are kept as they were
+        assert copied == [r for r in expected if r['type'] == 'Opened']
+        assert checkpoint.position == relay.position > start
+        assert copy.cached_stream_version(category + '-0', -2) == -2
+
+        # relaying again from the start skips what the target already has
+        again = Relay(source, copy, category=category, position=start)
+        assert await again.run(until_caught_up=True) == 3
+        async with copy.connection() as con:
+            assert await con.fetch(SQL_MESSAGES, category) == expected
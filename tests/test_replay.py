@@ -0,0 +1,111 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+
+import pytest
+
+from eventide.replay import ReplayError, ReplayEngine
+from eventide.checkpoint import FileCheckpoint
+
+
+def record_position(message):
+    # runs in the worker processes, which inherit the environment
+    with open(os.environ['EVENTIDE_REPLAY_OUT'], 'a') as fh:
+        fh.write('%d\n' % message.global_position)
+
+
+def recorded(path):
+    with open(path) as fh:
+        return [int(line) for line in fh]
+
+
+def test_unknown_split():
+    with pytest.raises(ReplayError):
+        ReplayEngine({}, 'account', record_position, split='hash')
+
+
+def test_range_slices():
+    engine = ReplayEngine({}, 'account', record_position, workers=3, split='range')
+    assert engine._slices(10) == [
+        (1, 4, None, None),
+        (5, 8, None, None),
+        (9, 10, None, None),
+    ]
+    assert engine._slices(0) == []
+    member = ReplayEngine({}, 'account', record_position, workers=2)
+    assert member._slices(10) == [(1, 10, 0, 2), (1, 10, 1, 2)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('split', ['member', 'range'])
+async def test_rebuild(message_db, dsn, category, write, tmp_path, monkeypatch, split):
+    out = tmp_path / 'replayed'
+    monkeypatch.setenv('EVENTIDE_REPLAY_OUT', str(out))
+    async with message_db() as db:
+        for n in range(10):
+            await write(db, '%s-%d' % (category, n % 4))
+        expected = [msg.global_position async for msg in db.get_category_messages(category)]
+
+        engine = ReplayEngine(
+            {'dsn': dsn},
+            category,
+            record_position,
+            workers=2,
+            split=split,
+            checkpoint_dir=str(tmp_path),
+            batch_size=3,
+        )
+        position = await engine.rebuild(db)
+        assert position == expected[-1] + 1
+        assert sorted(recorded(out)) == expected
+        # only the engine's own checkpoint is left behind
+        assert sorted(os.listdir(tmp_path)) == sorted([
+            'replayed', os.path.basename(engine.checkpoint.path)
+        ])
+        assert engine.checkpoint.load() == {'position': position}
+
+        # a later rebuild starts over, instead of finding finished slices
+        out.unlink()
+        await write(db, category + '-9')
+        assert await engine.rebuild(db) == position + 1
+        assert len(recorded(out)) == 11
+
+
+@pytest.mark.asyncio
+async def test_rebuild_resumes(message_db, dsn, category, write, tmp_path, monkeypatch):
+    out = tmp_path / 'replayed'
+    monkeypatch.setenv('EVENTIDE_REPLAY_OUT', str(out))
+    async with message_db() as db:
+        for n in range(6):
+            await write(db, '%s-%d' % (category, n))
+        positions = [m.global_position async for m in db.get_category_messages(category)]
+
+        engine = ReplayEngine(
+            {'dsn': dsn},
+            category,
+            record_position,
+            workers=1,
+            checkpoint_dir=str(tmp_path),
+        )
+        # an interrupted rebuild, which got through the first four messages
+        head = positions[3]
+        engine.checkpoint.save(1, rebuilding=head)
+        FileCheckpoint(engine._slice_checkpoint_path(head, 0, 1)).save(positions[2])
+        # ... and a stale slice from a rebuild with another head
+        FileCheckpoint(engine._slice_checkpoint_path(head - 1, 0, 1)).save(head)
+
+        assert await engine.rebuild(db) == head + 1
+        assert recorded(out) == positions[2:4]
+        assert sorted(os.listdir(tmp_path)) == sorted([
+            'replayed', os.path.basename(engine.checkpoint.path)
+        ])
+
+        live = engine.live(db, poll_interval=0.01)
+        assert [(await live.__anext__()).global_position for _ in range(2)] == positions[4:]
+        await live.aclose()
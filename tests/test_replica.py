@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from uuid import UUID, uuid4
+from typing import Dict
+from dataclasses import field, dataclass
+from contextlib import asynccontextmanager
+
+import pytest
+
+from eventide.message import Message
+from eventide.replica import ReplicaRouter
+
+
+@dataclass
+class Written(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+
+
+class FakePool:
+    """Answers the head query with ``head``, slowly, counting the queries."""
+
+    def __init__(self, head, delay=0.01):
+        self.head = head
+        self.delay = delay
+        self.queries = 0
+
+    @asynccontextmanager
+    async def acquire(self):
+        yield self
+
+    async def fetchval(self, query):
+        self.queries += 1
+        await asyncio.sleep(self.delay)
+        if isinstance(self.head, Exception):
+            raise self.head
+        return self.head
+
+
+@pytest.mark.asyncio
+async def test_routes_to_caught_up_replica():
+    primary, replica = FakePool(10), FakePool(10)
+    router = ReplicaRouter(primary, replica, lag_interval=60.0)
+    assert await router.route() is replica
+    assert await router.route(5) is replica
+    assert router.lag == 0
+    # a position past the last sample is a reader at the head
+    assert await router.route(50) is replica
+
+
+@pytest.mark.asyncio
+async def test_routes_own_writes_to_primary():
+    primary, replica = FakePool(10), FakePool(8)
+    router = ReplicaRouter(primary, replica, lag_interval=60.0, resample_interval=60.0)
+    assert await router.route() is replica
+    assert await router.route(9) is primary
+    assert router.lag == 2
+
+    router.observe_write(11)
+    assert router.fence == 11
+    assert await router.route() is primary
+    replica.head = 11
+    router.resample_interval = 0.0
+    assert await router.route() is replica
+    assert router.stats()['replica_head'] == 11
+
+
+@pytest.mark.asyncio
+async def test_concurrent_reads_share_one_sample():
+    primary, replica = FakePool(10), FakePool(10)
+    router = ReplicaRouter(primary, replica, lag_interval=60.0)
+    pools = await asyncio.gather(*(router.route() for _ in range(20)))
+    assert all(pool is replica for pool in pools)
+    assert (primary.queries, replica.queries) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_failed_sample_uses_primary():
+    primary, replica = FakePool(10), FakePool(OSError('replica down'))
+    router = ReplicaRouter(primary, replica)
+    assert await router.route() is primary
+    assert router._inflight is None
+
+
+@pytest.mark.asyncio
+async def test_message_db_replica(message_db, dsn, category):
+    stream = category + '-1'
+    replica = {'dsn': dsn, 'min_size': 1, 'max_size': 2}
+    async with message_db(replica_config=replica) as db:
+        assert await db.write_message(stream, Written()) == 0
+        [msg] = [msg async for msg in db.get_stream_messages(stream)]
+        assert db.router.fence == msg.global_position
+        async with db.read_connection('test', msg.global_position) as con:
+            assert await con.fetchval('SELECT 1') == 1
@@ -0,0 +1,116 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+import pytest
+
+from eventide.segments import SegmentCache
+
+T0 = datetime(2020, 10, 1, 12, 0, 0)
+
+
+def page(stream, start, count, size=0):
+    return [
+        {
+            'id': str(uuid4()),
+            'stream_name': stream,
+            'type': 'Cached',
+            'position': n,
+            'global_position': 1000 + n,
+            'data': '{"n": %d, "pad": "%s"}' % (n, 'x' * size),
+            'metadata': None,
+            'time': T0 + timedelta(seconds=n),
+        } for n in range(start, start + count)
+    ]
+
+
+def test_contiguous_prefix(tmp_path):
+    cache = SegmentCache(str(tmp_path))
+    assert cache.tail('account-1') == -1
+    # a page that does not start at the beginning would leave a gap
+    assert not cache.append('account-1', page('account-1', 3, 2))
+    assert cache.append('account-1', page('account-1', 0, 3))
+    assert not cache.append('account-1', page('account-1', 4, 2))
+    assert cache.append('account-1', page('account-1', 3, 3))
+    assert cache.tail('account-1') == 5
+
+    records = cache.read('account-1', 2, 3)
+    assert [r['position'] for r in records] == [2, 3, 4]
+    assert records[0]['data'] == '{"n": 2, "pad": ""}'
+    assert records[0]['metadata'] is None
+    assert records[0]['time'] == T0 + timedelta(seconds=2)
+    assert [r['position'] for r in cache.read('account-1', 4, 10)] == [4, 5]
+    assert cache.read('account-1', 6, 10) == []
+    assert cache.read('account-2', 0, 10) == []
+
+
+def test_reload(tmp_path):
+    cache = SegmentCache(str(tmp_path))
+    cache.append('account-1', page('account-1', 0, 2))
+    cache.append('account-1', page('account-1', 2, 2))
+    cache.append('account-2', page('account-2', 0, 1))
+
+    reloaded = SegmentCache(str(tmp_path))
+    assert reloaded.tail('account-1') == 3
+    assert reloaded.tail('account-2') == 0
+    assert reloaded.read('account-1', 0, 10) == cache.read('account-1', 0, 10)
+    assert reloaded._size == cache._size
+
+
+def test_reload_drops_gaps(tmp_path):
+    cache = SegmentCache(str(tmp_path))
+    cache.append('account-1', page('account-1', 0, 2))
+    cache.append('account-1', page('account-1', 2, 2))
+    cache.append('account-1', page('account-1', 4, 2))
+    # losing a segment in the middle leaves only the prefix before it usable
+    (tmp_path / cache._stream_dir('account-1') / ('%020d.seg' % 2)).unlink()
+    assert SegmentCache(str(tmp_path)).tail('account-1') == 1
+
+
+def test_lru_eviction(tmp_path):
+    cache = SegmentCache(str(tmp_path))
+    cache.append('a-1', page('a-1', 0, 4, 100))
+    # room for two streams of this size, not three
+    cache.max_bytes = cache._size * 5 // 2
+    cache.append('a-2', page('a-2', 0, 4, 100))
+    # reading a-1 makes a-2 the least recently used stream
+    assert cache.read('a-1', 0, 1)
+    cache.append('a-3', page('a-3', 0, 4, 100))
+    assert cache.tail('a-1') == 3
+    assert cache.tail('a-2') == -1
+    assert cache.tail('a-3') == 3
+    assert not (tmp_path / cache._stream_dir('a-2')).exists()
+    # the stream being appended to is never evicted, even when it alone is too big
+    cache.append('a-3', page('a-3', 4, 20, 100))
+    assert cache.tail('a-3') == 23
+    assert list(cache._streams) == ['a-3']
+
+
+@pytest.mark.asyncio
+async def test_cached_stream_reads(message_db, category, write, tmp_path):
+    stream = category + '-1'
+    cache = SegmentCache(str(tmp_path))
+    async with message_db(segment_cache=cache) as db:
+        for n in range(5):
+            await write(db, stream, data={'n': n})
+
+        first = [msg async for msg in db.get_stream_messages(stream, 0, 3)]
+        assert [msg.data['n'] for msg in first] == [0, 1, 2]
+        assert cache.tail(stream) == 2
+
+        # the cached part comes from disk, the rest from the database
+        everything = [msg async for msg in db.get_stream_messages(stream, 0, 10)]
+        assert [msg.data['n'] for msg in everything] == list(range(5))
+        assert [msg.time for msg in everything[:3]] == [msg.time for msg in first]
+        assert cache.tail(stream) == 4
+
+        await write(db, stream, data={'n': 5})
+        tail = [msg async for msg in db.get_stream_messages(stream, 4, 10)]
+        assert [msg.data['n'] for msg in tail] == [4, 5]
@@ -0,0 +1,139 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import uuid4
+from datetime import datetime, timedelta
+
+import pytest
+
+from eventide.batch import MessageBatch
+from eventide.sharding import ShardingError, ShardedMessageDB
+
+T0 = datetime(2020, 10, 1)
+
+
+class FakeShard:
+    """Pages through ``(global_position, seconds after T0)`` pairs per category."""
+
+    def __init__(self, categories):
+        self.categories = categories
+
+    async def get_category_batches(self, category, position, batch_size):
+        rows = [r for r in self.categories[category] if r[0] >= position]
+        for idx in range(0, len(rows), batch_size):
+            yield MessageBatch.from_records([{
+                'id': str(uuid4()),
+                'stream_name': category + '-1',
+                'type': 'Tested',
+                'position': global_position,
+                'global_position': global_position,
+                'data': '{}',
+                'metadata': None,
+                'time': T0 + timedelta(seconds=seconds),
+            } for global_position, seconds in rows[idx:idx + batch_size]])
+
+
+def test_config_errors():
+    with pytest.raises(ShardingError):
+        ShardedMessageDB([])
+    with pytest.raises(ShardingError):
+        ShardedMessageDB([object(), object()], category_map={'account': 2})
+
+
+def test_routing():
+    shards = [object(), object(), object()]
+    sharded = ShardedMessageDB(shards, category_map={'account': 2})
+    assert sharded.shard('account-123') is shards[2]
+    assert sharded.shard('account-123+456') is shards[2]
+    # every stream of a category goes to the same shard
+    idx = sharded.shard_index('transfer')
+    assert sharded.shard_index('transfer-1') == sharded.shard_index('transfer-2') == idx
+    assert idx == ShardedMessageDB.hash64('transfer') % 3
+    assert sharded.consumer_group_member('account-123', 2) in (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_no_single_global_index():
+    with pytest.raises(ShardingError):
+        await ShardedMessageDB([object()]).get_last_global_index()
+
+
+@pytest.mark.asyncio
+async def test_merged_keeps_position_order():
+    # a@2 was written by a transaction that started before a@1's
+    sharded = ShardedMessageDB(
+        [FakeShard({'a': [(1, 10), (2, 5), (3, 11)]}), FakeShard({'b': [(1, 6), (2, 8)]})],
+        category_map={'a': 0, 'b': 1},
+    )
+    merged = sharded.get_merged_messages(['a', 'b'], batch_size=2)
+    assert [(m.category, m.global_position) async for m in merged] == [
+        ('b', 1), ('b', 2), ('a', 1), ('a', 2), ('a', 3)
+    ]
+
+    positions = {}
+    async for msg in sharded.get_merged_messages(['a', 'b'], positions, batch_size=2):
+        if msg.category == 'a':
+            break
+    assert positions == {'a': 2, 'b': 3}
+    # resuming from the checkpoint skips nothing
+    resumed = sharded.get_merged_messages(['a', 'b'], positions)
+    assert [(m.category, m.global_position) async for m in resumed] == [('a', 2), ('a', 3)]
+
+
+@pytest.mark.asyncio
+async def test_sharded_reads(message_db, category, other_category, write):
+    async with message_db() as first, message_db() as second:
+        sharded = ShardedMessageDB(
+            [first, second], category_map={category: 0, other_category: 1}
+        )
+        for n in range(3):
+            await write(first, category + '-1', data={'n': n})
+        await write(second, other_category + '-1', type_='Other')
+
+        headers = [h async for h in sharded.get_stream_headers(category + '-1')]
+        assert [h.position for h in headers] == [0, 1, 2]
+        headers = [h async for h in sharded.get_category_headers(other_category)]
+        assert [h.type for h in headers] == ['Other']
+
+        heads = await sharded.get_last_global_indexes()
+        assert len(heads) == 2 and min(heads) >= headers[0].global_position
+
+        versions = await sharded.get_stream_versions(
+            [category + '-1', other_category + '-1'], cache=True
+        )
+        assert versions == {category + '-1': 2, other_category + '-1': 0}
+        assert sharded.cached_stream_version(category + '-1') == 2
+        assert first.cached_stream_version(category + '-1') == 2
+        assert second.cached_stream_version(category + '-1') is None
+        sharded.forget_stream_versions([category + '-1'])
+        assert sharded.cached_stream_version(category + '-1', -1) == -1
+        assert sharded.cached_stream_version(other_category + '-1') == 0
+        sharded.forget_stream_versions()
+        assert sharded.cached_stream_version(other_category + '-1') is None
+
+
+@pytest.mark.asyncio
+async def test_sharded_summaries(message_db, category, other_category, write):
+    async with message_db() as first, message_db() as second:
+        sharded = ShardedMessageDB([first, second])
+        await write(first, category + '-1', type_='Opened')
+        await write(first, category + '-2', type_='Opened')
+        await write(first, other_category + '-1', type_='Closed')
+
+        # both shards share one database here, so every message counts twice
+        summary = await sharded.category_type_summary(refresh=True)
+        assert summary[(category, 'Opened')]['count'] == 4
+        assert summary[(other_category, 'Closed')]['count'] == 2
+        assert sum(v['percent'] for v in summary.values()) == pytest.approx(100.0)
+
+        types = await sharded.type_summary()
+        assert types['Opened']['count'] >= 4
+        assert sum(v['percent'] for v in types.values()) == pytest.approx(100.0)
+
+        categories = await sharded.get_all_categories()
+        assert {category, other_category} <= categories
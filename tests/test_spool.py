@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import os
+from uuid import UUID, uuid4
+from dataclasses import field, dataclass
+from typing import Dict
+
+import pytest
+
+from eventide.spool import HEADER, Spool, SpoolError
+from eventide.message import Message, SerializedMessage
+
+
+@dataclass
+class Spooled(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+    n: int = 0
+
+
+def message(n):
+    data = '{"n": %d}' % n
+    return SerializedMessage(str(uuid4()), 'account-1', 'Spooled', data, '{}', None)
+
+
+def test_errors(tmp_path):
+    with pytest.raises(SpoolError):
+        Spool(tmp_path / 'spool', fsync='sometimes')
+    path = tmp_path / 'other'
+    path.write_bytes(b'not a spool file at all')
+    with pytest.raises(SpoolError):
+        Spool(path)
+
+
+def test_append_read_commit(tmp_path):
+    spool = Spool(tmp_path / 'spool', fsync='always')
+    messages = [message(n) for n in range(5)]
+    for msg in messages:
+        spool.append(msg)
+    assert len(spool) == 5
+    # reading does not consume
+    assert spool.read(2) == messages[:2]
+    assert spool.read(10) == messages
+
+    spool.commit(2)
+    assert len(spool) == 3
+    assert spool.read(10) == messages[2:]
+    spool.append(message(5))
+    spool.commit(4)
+    assert not spool
+    assert spool.read(10) == []
+    # drained, the file is back to just its header
+    assert os.path.getsize(spool.path) == HEADER.size
+    spool.close()
+
+
+def test_compaction(tmp_path):
+    spool = Spool(tmp_path / 'spool', fsync='never', compact_bytes=1024)
+    expected = [message(0)]
+    spool.append(expected[0])
+    appended = 1
+    # never drained, one record is always left behind
+    for _ in range(200):
+        for _ in range(5):
+            msg = message(appended)
+            spool.append(msg)
+            expected.append(msg)
+            appended += 1
+        assert spool.read(5) == expected[:5]
+        spool.commit(5)
+        del expected[:5]
+        assert os.path.getsize(spool.path) < 3 * 1024
+    assert spool.read(10) == expected
+    assert not os.path.exists(spool.path + '.tmp')
+    spool.close()
+
+    spool = Spool(tmp_path / 'spool')
+    assert spool.read(10) == expected
+    spool.close()
+
+
+def test_reopen(tmp_path):
+    spool = Spool(tmp_path / 'spool', fsync='never')
+    messages = [message(n) for n in range(4)]
+    for msg in messages:
+        spool.append(msg)
+    spool.commit(1)
+    spool.close()
+
+    reopened = Spool(tmp_path / 'spool')
+    assert len(reopened) == 3
+    assert reopened.read(10) == messages[1:]
+    reopened.close()
+
+
+@pytest.mark.parametrize('torn', [2, 7])
+def test_torn_record_is_discarded(tmp_path, torn):
+    spool = Spool(tmp_path / 'spool')
+    messages = [message(n) for n in range(3)]
+    for msg in messages:
+        spool.append(msg)
+    spool.close()
+    size = os.path.getsize(spool.path)
+
+    # a crash while appending: part of a length prefix, or of a payload
+    with open(spool.path, 'ab') as fh:
+        fh.write(b'\x40\x00\x00\x00{"id":'[:torn])
+    reopened = Spool(tmp_path / 'spool')
+    assert len(reopened) == 3
+    assert os.path.getsize(reopened.path) == size
+    assert reopened.read(10) == messages
+
+    reopened.append(message(3))
+    assert len(reopened.read(10)) == 4
+    reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_spilled_messages_are_written(message_db, category, tmp_path, monkeypatch):
+    stream = category + '-1'
+    spool = Spool(tmp_path / 'spool')
+    async with message_db(spool=spool, spill_threshold=2, max_pending=8) as db:
+        for n in range(5):
+            await db.queue_message(stream, Spooled(n=n))
+        assert len(spool) == 3
+
+        # a crash after a spooled bundle was written, before it was committed
+        commit = spool.commit
+
+        def crash(count):
+            monkeypatch.setattr(spool, 'commit', commit)
+            raise RuntimeError('crashed')
+
+        monkeypatch.setattr(spool, 'commit', crash)
+        with pytest.raises(RuntimeError):
+            await db.write_pending_messages()
+        assert len(spool) == 3
+
+        # the bundle is written again, without duplicating what made it through
+        assert await db.write_pending_messages() == 3
+        assert not spool
+        written = [msg.data['n'] async for msg in db.get_stream_messages(stream)]
+        assert written == [0, 1, 2, 3, 4]
@@ -0,0 +1,68 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import pickle
+
+import pytest
+
+from eventide.stream_name import StreamName, hash64
+
+SQL_MEMBER = 'SELECT MOD(@hash_64(cardinal_id($1)), $2);'
+
+NAMES = [
+    'account',
+    'account-123',
+    'account-123+456',
+    'account:command-123',
+    'account:command+position-1',
+    'account-1-2',
+]
+
+
+@pytest.mark.parametrize('value, category, id_, cardinal_id, command', [
+    ('account', 'account', None, None, None),
+    ('account-123', 'account', '123', '123', None),
+    ('account-123+456', 'account', '123+456', '123', None),
+    ('account:command-123', 'account:command', '123', '123', 'command'),
+    ('account-1-2', 'account', '1-2', '1-2', None),
+])
+def test_parts(value, category, id_, cardinal_id, command):
+    name = StreamName(value)
+    assert name == value
+    assert (name.category, name.id, name.cardinal_id, name.command) == (
+        category, id_, cardinal_id, command
+    )
+    assert name.is_category is (id_ is None)
+
+
+def test_interned():
+    name = StreamName('account-123')
+    assert StreamName('account-' + '123') is name
+    assert StreamName(name) is name
+    assert isinstance(name, str) and {name: 1}['account-123'] == 1
+    assert pickle.loads(pickle.dumps(name)) is name
+
+
+def test_hash64():
+    # the first 16 hex digits of md5('account')
+    assert hash64('account') == int('e268443e43d93dab', 16)
+    assert StreamName('account').consumer_group_member(4) is None
+    member = StreamName('account-123+456').consumer_group_member(4)
+    assert member == StreamName('account-123').consumer_group_member(4)
+    assert 0 <= member < 4
+
+
+@pytest.mark.asyncio
+async def test_consumer_group_member_matches_database(message_db):
+    async with message_db() as db:
+        async with db.connection() as con:
+            for value in NAMES[1:] + ['transfer-%d' % n for n in range(50)]:
+                for size in (1, 2, 3, 7):
+                    expected = await con.fetchval(SQL_MEMBER, value, size)
+                    assert StreamName(value).consumer_group_member(size) == expected
+                    assert db.consumer_group_member(value, size) == expected
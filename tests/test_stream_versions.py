@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import UUID, uuid4
+from typing import Dict
+from dataclasses import field, dataclass
+
+import pytest
+
+from eventide.bulk import BulkLoader
+from eventide.unit_of_work import UnitOfWork
+from eventide.messagedb import ExpectedVersionError
+from eventide.message import Message, SerializedMessage
+
+
+@dataclass
+class Versioned(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+
+
+@pytest.mark.asyncio
+async def test_get_stream_versions(message_db, category, write):
+    one, two, missing = ('%s-%d' % (category, n) for n in range(3))
+    async with message_db() as db:
+        for stream in (one, two, two, two):
+            await write(db, stream)
+        assert await db.get_stream_versions([]) == {}
+        versions = await db.get_stream_versions([two, missing, one, two])
+        assert versions == {two: 2, missing: None, one: 0}
+        assert list(versions) == [two, missing, one]
+        for stream, version in versions.items():
+            assert await db.get_stream_version(stream) == version
+        # nothing is cached unless asked for
+        assert db.cached_stream_version(one, -2) == -2
+
+
+@pytest.mark.asyncio
+async def test_version_cache(message_db, category, write):
+    one, two, missing = ('%s-%d' % (category, n) for n in range(3))
+    async with message_db() as db:
+        await write(db, one)
+        await write(db, two)
+        await db.get_stream_versions([one, two, missing], cache=True)
+        assert db.cached_stream_version(one) == 0
+        assert db.cached_stream_version(missing, -1) is None
+
+        # writes through this instance keep cached versions current
+        await db.write_message(one, Versioned(), expected_version=0)
+        await db.write_message(missing, Versioned(), expected_version=-1)
+        assert db.cached_stream_version(one) == 1
+        assert db.cached_stream_version(missing) == 0
+
+        # other writers are not seen; a rejected write drops the stale version
+        await write(db, two)
+        assert db.cached_stream_version(two) == 0
+        with pytest.raises(ExpectedVersionError):
+            await db.write_message(two, Versioned(), expected_version=0)
+        assert db.cached_stream_version(two) is None
+        await db.get_stream_versions([two], cache=True)
+        assert db.cached_stream_version(two) == 1
+
+        # streams never cached are not picked up by writes
+        await db.write_message(category + '-9', Versioned())
+        assert db.cached_stream_version(category + '-9', -2) == -2
+
+        db.forget_stream_versions([one])
+        assert db.cached_stream_version(one) is None
+        assert db.cached_stream_version(missing) == 0
+        db.forget_stream_versions()
+        assert db.cached_stream_version(missing) is None
+
+
+@pytest.mark.asyncio
+async def test_other_writes_drop_cached_versions(message_db, category, write):
+    streams = ['%s-%d' % (category, n) for n in range(4)]
+    async with message_db() as db:
+        for stream in streams:
+            await write(db, stream)
+        await db.get_stream_versions(streams, cache=True)
+
+        await db.queue_message(streams[0], Versioned())
+        await db.write_pending_messages()
+        async with UnitOfWork(db) as uow:
+            uow.add(streams[1], Versioned())
+        await BulkLoader(db).load([
+            SerializedMessage(str(uuid4()), streams[2], 'Loaded', '{}', None, None)
+        ])
+        assert [db.cached_stream_version(s, -2) for s in streams] == [-2, -2, -2, 0]
+
+        await db.get_stream_versions(streams, cache=True)
+        assert [db.cached_stream_version(s) for s in streams] == [1, 1, 1, 0]
@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import uuid4
+
+import pytest
+
+from eventide.utils import jdumps
+from eventide.messagedb import Procs
+
+
+async def counts(db, *keys, refresh=False):
+    summary = await db.category_type_summary(refresh)
+    return [summary.get(key, {}).get('count', 0) for key in keys]
+
+
+@pytest.mark.asyncio
+async def test_summary(message_db, category, other_category, write):
+    async with message_db(summary_ttl=60.0) as db:
+        for n in range(5):
+            await write(db, '%s-%d' % (category, n % 2), 'Opened' if n % 2 else 'Closed')
+        await write(db, other_category + '-1', 'Opened')
+
+        summary = await db.category_type_summary()
+        assert summary[(category, 'Opened')]['count'] == 2
+        assert summary[(category, 'Closed')]['count'] == 3
+        assert summary[(other_category, 'Opened')]['count'] == 1
+        assert sum(v['percent'] for v in summary.values()) == pytest.approx(100.0)
+        assert {category, other_category} <= await db.get_all_categories()
+
+        # cached until the ttl passes, or a refresh is asked for
+        await write(db, category + '-1', 'Opened')
+        assert await counts(db, (category, 'Opened')) == [2]
+        assert await counts(db, (category, 'Opened'), refresh=True) == [3]
+        types = await db.type_summary()
+        assert types['Opened']['count'] >= 4
+
+
+@pytest.mark.parametrize('window, late_counted', [(10_000, True), (1, False)])
+@pytest.mark.asyncio
+async def test_late_commit(
+    message_db, category, other_category, write, window, late_counted
+):
+    keys = (category, 'Late'), (other_category, 'Early')
+    async with message_db(summary_ttl=0.0, summary_window=window) as db:
+        await db.category_type_summary()
+
+        # the first message gets its global position before the second, but
+        #  commits after the summary was refreshed past the second one
+        async with db.connection() as con:
+            async with con.transaction():
+                await con.fetchval(
+                    Procs.write_message,
+                    str(uuid4()),
+                    category + '-1',
+                    'Late',
+                    jdumps({}),
+                    jdumps({}),
+                    None,
+                )
+                await write(db, other_category + '-1', 'Early')
+                assert await counts(db, *keys) == [0, 1]
+
+        # recounting the trailing window picks it up, without counting twice
+        assert await counts(db, *keys) == [int(late_counted), 1]
+        assert await counts(db, *keys) == [int(late_counted), 1]
+        # a full rescan always does
+        assert await counts(db, *keys, refresh=True) == [1, 1]
+        assert await counts(db, *keys) == [1, 1]
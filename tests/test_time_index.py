@@ -0,0 +1,82 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from types import SimpleNamespace
+from datetime import timezone
+
+import pytest
+
+from eventide.utils import utc_datetime
+from eventide.time_index import TimeIndex
+
+
+def test_samples(tmp_path):
+    path = tmp_path / 'times.json'
+    index = TimeIndex(None, path, sample_every=10, max_samples=5)
+    for position in (30, 10, 20, 10):
+        index.add(position, float(position))
+    assert index._positions == [10, 20, 30]
+
+    index.observe(SimpleNamespace(global_position=35, time=35.0))
+    index.observe(SimpleNamespace(global_position=40, time=40.0))
+    assert index._positions == [10, 20, 30, 40]
+
+    # past max_samples every other sample is dropped, the newest is kept
+    index.add(50, 50.0)
+    index.add(60, 60.0)
+    assert index._positions == [10, 30, 50, 60]
+    assert index._bracket(30.0) == (10, 30)
+    assert index._bracket(31.0) == (30, 50)
+    assert index._bracket(5.0) == (None, 10)
+    assert index._bracket(61.0) == (60, None)
+
+    index.save()
+    loaded = TimeIndex(None, path)
+    assert list(zip(loaded._positions, loaded._times)) == list(
+        zip(index._positions, index._times)
+    )
+
+
+async def write_spread(db, write, category, count):
+    """Writes messages a few milliseconds apart and returns them, as read back."""
+    for n in range(count):
+        await write(db, '%s-1' % category, data={'n': n})
+        await asyncio.sleep(0.005)
+    return [msg async for msg in db.get_stream_messages(category + '-1')]
+
+
+@pytest.mark.asyncio
+async def test_position_at(message_db, category, write):
+    async with message_db() as db:
+        messages = await write_spread(db, write, category, 12)
+
+        # a scan window of one position makes every lookup a binary search
+        index = TimeIndex(db, scan_window=1)
+        for msg in messages:
+            assert await index.position_at(msg.time) == msg.global_position
+        assert len(index) > 2
+
+        # times in between messages, as naive UTC or aware datetimes
+        for before, after in zip(messages, messages[1:]):
+            between = (before.time + after.time) / 2
+            assert await index.position_at(between) == after.global_position
+            aware = utc_datetime(between).replace(tzinfo=timezone.utc)
+            assert await index.position_at(aware.astimezone()) == after.global_position
+
+        # after the newest message, the position the next one will get
+        head = messages[-1]
+        assert await index.position_at(head.time + 60) == head.global_position + 1
+
+        # a fresh index with the default scan window finds the same positions
+        index = TimeIndex(db)
+        async with db.connection() as con:
+            first = await con.fetchval('SELECT min(global_position) FROM messages;')
+        assert await index.position_at(0.0) == first
+        for msg in messages[::3]:
+            assert await index.position_at(msg.time) == msg.global_position
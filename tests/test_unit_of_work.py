@@ -0,0 +1,87 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import asyncio
+from uuid import UUID, uuid4
+from dataclasses import field, dataclass
+from typing import Dict
+
+import pytest
+
+from eventide.message import Message
+from eventide.messagedb import Procs, ExpectedVersionError
+from eventide.unit_of_work import UnitOfWork
+
+
+@dataclass
+class Moved(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+    n: int = 0
+
+
+async def versions(db, *streams):
+    return [await db.get_stream_version(stream) for stream in streams]
+
+
+@pytest.mark.asyncio
+async def test_empty_commit(message_db):
+    async with message_db() as db:
+        uow = UnitOfWork(db)
+        assert await uow.commit() == []
+        assert uow.committed
+
+
+@pytest.mark.asyncio
+async def test_commit(message_db, category, other_category, write):
+    a, b = category + '-1', other_category + '-1'
+    async with message_db() as db:
+        await write(db, a)
+        async with UnitOfWork(db) as uow:
+            uow.add(a, Moved(n=1), expected_version=0)
+            uow.add(b, Moved(n=2))
+            uow.add(a, Moved(n=3))
+        assert uow.positions == [1, 0, 2]
+        assert [m.data.get('n') async for m in db.get_stream_messages(a)] == [None, 1, 3]
+        assert await versions(db, a, b) == [2, 0]
+
+
+@pytest.mark.asyncio
+async def test_expected_version_conflict(message_db, category, other_category, write):
+    a, b = category + '-1', other_category + '-1'
+    async with message_db() as db:
+        await write(db, a)
+        uow = UnitOfWork(db).add(b, Moved()).add(a, Moved(), expected_version=5)
+        with pytest.raises(ExpectedVersionError):
+            await uow.commit()
+        assert not uow.committed
+        # nothing from the unit of work was written
+        assert await versions(db, a, b) == [0, None]
+
+
+@pytest.mark.asyncio
+async def test_locks_in_key_order(message_db, category, other_category):
+    async with message_db() as db:
+        hashes = {c: await db.get_hash64(c) for c in (category, other_category)}
+        low, high = ['%s-1' % c for c in sorted(hashes, key=hashes.get)]
+
+        async with db.connection('test-lock') as con:
+            async with con.transaction():
+                await con.execute(Procs.acquire_lock, low)
+                # staged high before low, but the locks are taken low first, so
+                #  the unit of work waits here holding nothing ...
+                uow = UnitOfWork(db).add(high, Moved()).add(low, Moved())
+                task = asyncio.ensure_future(uow.commit())
+                await asyncio.sleep(0.2)
+                assert not task.done()
+                # ... and this lock is free, where taking them in staged order
+                #  would have deadlocked
+                await con.execute(Procs.acquire_lock, high)
+
+        assert await task == [0, 0]
+        assert await versions(db, low, high) == [0, 0]
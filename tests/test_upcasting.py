@@ -0,0 +1,97 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+from uuid import UUID, uuid4
+from dataclasses import field, dataclass
+from typing import Dict
+
+import pytest
+
+from eventide.message import Message, MessageData
+from eventide.upcasting import UpcastError, UpcasterRegistry
+
+
+@dataclass
+class Renamed(Message):
+    id: UUID = field(default_factory=uuid4)
+    metadata: Dict = field(default_factory=dict)
+    full_name: str = ''
+    active: bool = False
+
+
+def message_data(data, metadata=None, type_='Renamed'):
+    return MessageData(type_, 'person-1', data, metadata or {}, uuid4(), 0, 1, 0.0)
+
+
+@pytest.fixture
+def registry():
+    registry = UpcasterRegistry()
+
+    @registry.upcaster('Renamed', None, '2')
+    def split_name(data):
+        return {'full_name': '%s %s' % (data['first'], data['last'])}
+
+    registry.register('Renamed', '2', '3', lambda data: dict(data, active=True))
+    return registry
+
+
+def test_upcast_chain(registry):
+    assert 'Renamed' in registry
+    assert registry.upcast_data('Renamed', None, {'first': 'A', 'last': 'B'}) == (
+        '3', {'full_name': 'A B', 'active': True}
+    )
+    assert registry.upcast_data('Renamed', '2', {'full_name': 'C'}) == (
+        '3', {'full_name': 'C', 'active': True}
+    )
+    # newest version, unknown versions and unknown types are left alone
+    assert registry.upcast_data('Renamed', '3', {'x': 1}) == ('3', {'x': 1})
+    assert registry.upcast_data('Renamed', '9', {'x': 1}) == ('9', {'x': 1})
+    assert registry.upcast_data('Other', None, {'x': 1}) == (None, {'x': 1})
+
+
+def test_chains_are_cached(registry):
+    registry.upcast_data('Renamed', None, {'first': 'A', 'last': 'B'})
+    chain = registry._chains[('Renamed', None)]
+    registry.upcast_data('Renamed', None, {'first': 'C', 'last': 'D'})
+    assert registry._chains[('Renamed', None)] is chain
+    # registering a new step invalidates the type's chains
+    registry.register('Renamed', '3', '4', lambda data: data)
+    assert ('Renamed', None) not in registry._chains
+    assert registry.upcast_data('Renamed', None, {'first': 'A', 'last': 'B'})[0] == '4'
+
+
+def test_register_errors(registry):
+    with pytest.raises(UpcastError):
+        registry.register('Renamed', '2', '5', lambda data: data)
+    with pytest.raises(UpcastError):
+        registry.register('Other', '1', '1', lambda data: data)
+    registry.register('Looped', '1', '2', lambda data: data)
+    registry.register('Looped', '2', '1', lambda data: data)
+    with pytest.raises(UpcastError):
+        registry.upcast_data('Looped', '1', {})
+
+
+def test_upcast_message(registry):
+    old = message_data({'first': 'A', 'last': 'B'}, {'correlation_stream_name': 'x-1'})
+    new = registry.upcast(old)
+    assert new.data == {'full_name': 'A B', 'active': True}
+    assert new.metadata == {'correlation_stream_name': 'x-1', 'schema_version': '3'}
+    assert new.global_position == old.global_position
+    current = message_data({'full_name': 'A B'}, {'schema_version': '3'})
+    assert registry.upcast(current) is current
+    other = message_data({}, type_='Other')
+    assert registry.upcast(other) is other
+
+
+def test_from_messagedata(registry):
+    msg = Renamed.from_messagedata(
+        message_data({'first': 'A', 'last': 'B'}),
+        registry=registry,
+    )
+    assert msg.full_name == 'A B'
+    assert msg.active
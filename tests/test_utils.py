@@ -0,0 +1,70 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# >>
+#   python-eventide, 2020
+#   LiveViewTech
+# <<
+
+import time
+from uuid import uuid4
+from datetime import datetime, timezone, timedelta
+
+import pytest
+
+from eventide.utils import utc_datetime, utc_timestamp
+from eventide.batch import MessageBatch
+from eventide.message import MessageData, MessageHeader
+from eventide.segments import SegmentCache
+
+# 2020-10-01 12:00:00 UTC
+T0 = datetime(2020, 10, 1, 12, 0, 0)
+EPOCH = 1601553600.0
+
+
+@pytest.fixture
+def local_tz(monkeypatch):
+    """Runs a test with a local time zone far from UTC."""
+    monkeypatch.setenv('TZ', 'America/Denver')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def record(**extra):
+    return dict({
+        'id': str(uuid4()),
+        'stream_name': 'account-1',
+        'type': 'Opened',
+        'position': 0,
+        'global_position': 7,
+        'data': '{}',
+        'metadata': '{}',
+        'time': T0,
+    }, **extra)
+
+
+def test_utc_conversions(local_tz):
+    assert utc_timestamp(T0) == EPOCH
+    assert utc_datetime(EPOCH) == T0
+    assert utc_datetime(T0) is T0
+    aware = datetime(2020, 10, 1, 6, 0, 0, tzinfo=timezone(timedelta(hours=-6)))
+    assert utc_datetime(aware) == T0
+
+
+def test_stored_times_are_utc(local_tz, tmp_path):
+    assert MessageData.from_record(record()).time == EPOCH
+    assert MessageHeader.from_record(record()).time == EPOCH
+    assert MessageBatch.from_records([record()]).times[0] == EPOCH
+
+    # cached records come back with the time they were stored with
+    cache = SegmentCache(str(tmp_path))
+    cache.append('account-1', [record()])
+    assert cache.read('account-1', 0, 1)[0]['time'] == T0
+    assert SegmentCache(str(tmp_path)).read('account-1', 0, 1)[0]['time'] == T0
+
+
+def test_missing_time_is_now():
+    before = time.time()
+    assert before - 1 <= MessageData.from_record(record(time=None)).time <= time.time() + 1